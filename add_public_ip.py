@@ -1,64 +1,49 @@
 #!/usr/bin/env python3
 """
 Add Public IP to VM
+
+Attaches a Basic SKU public IP to each selected VM through bulk_public_ip, many VMs at once.
 """
 
-from azure.mgmt.network import NetworkManagementClient
-from azure.mgmt.compute import ComputeManagementClient
-from azure.identity import ClientSecretCredential
 import os
-from dotenv import load_dotenv
+import sys
+
+import click
+
+from bulk_public_ip import ATTACHED, FAILED, UNCHANGED, run_bulk, selection_options
+from run_command import parse_tags
 
-# Load environment variables
-load_dotenv()
 
-def add_public_ip():
+def add_public_ip(resource_group='avd-rg', vms=('avd-host-01',), match=None, tags=None, **options):
     print("🌐 Adding Public IP to VM...")
-    
-    credential = ClientSecretCredential(
-        tenant_id=os.getenv('AZURE_TENANT_ID'),
-        client_id=os.getenv('AZURE_CLIENT_ID'),
-        client_secret=os.getenv('AZURE_CLIENT_SECRET')
-    )
-    
-    network_client = NetworkManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    
+
     try:
-        # Create public IP
-        public_ip_name = 'avd-host-01-pip'
-        print(f"Creating public IP: {public_ip_name}")
-        
-        public_ip_params = {
-            'location': 'eastus',
-            'public_ip_allocation_method': 'Dynamic',
-            'idle_timeout_in_minutes': 4
-        }
-        
-        public_ip = network_client.public_ip_addresses.begin_create_or_update(
-            'avd-rg', public_ip_name, public_ip_params
-        ).result()
-        
-        print(f"✅ Public IP created: {public_ip.name}")
-        print(f"   IP Address: {public_ip.ip_address}")
-        
-        # Update NIC to use public IP
-        nic_name = 'avd-host-01-nic'
-        print(f"Updating NIC: {nic_name}")
-        
-        nic = network_client.network_interfaces.get('avd-rg', nic_name)
-        nic.ip_configurations[0].public_ip_address = public_ip
-        
-        updated_nic = network_client.network_interfaces.begin_create_or_update(
-            'avd-rg', nic_name, nic
-        ).result()
-        
-        print("✅ NIC updated with public IP")
-        print(f"   You can now connect to: {public_ip.ip_address}")
-        print(f"   Username: {os.getenv('AVD_ADMIN_USERNAME', 'avdadmin')}")
-        print(f"   Password: [HIDDEN - Set via AVD_ADMIN_PASSWORD env var]")
-        
+        results = run_bulk(resource_group, vms, match, tags, sku='Basic', **options)
+
+        for vm_name, result in results.items():
+            if result['status'] in (ATTACHED, UNCHANGED):
+                print(f"\n✅ {vm_name}: NIC {result['nic']} has public IP {', '.join(result['public_ips'])}")
+                print(f"   You can now connect to: {result['ip_address']}")
+        if any(result['status'] != FAILED for result in results.values()):
+            print(f"   Username: {os.getenv('AVD_ADMIN_USERNAME', 'avdadmin')}")
+            print(f"   Password: [HIDDEN - Set via AVD_ADMIN_PASSWORD env var]")
+        return bool(results) and all(result['status'] != FAILED for result in results.values())
+
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
+
+
+@click.command()
+@selection_options
+def main(resource_group, vms, match, tags, parallelism, attach_parallelism):
+    """Attach a public IP to session host VMs (default: avd-host-01); see bulk_public_ip.py to remove them"""
+    if not vms and not match and not tags:
+        vms = ('avd-host-01',)
+    if not add_public_ip(resource_group, vms, match, parse_tags(tags),
+                         parallelism=parallelism, attach_parallelism=attach_parallelism):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    add_public_ip()
+    main()
@@ -6,10 +6,16 @@ Flask-based web interface for Azure resource management
 
 import os
 import json
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+import time
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, g, Response, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
-from azure_manager import AzureManager
+from manager_pool import ManagerPool, CredentialReloader
+from config_store import ConfigStore, ConfigWatcher
+from price_sheet import get_price_sheet
+from telemetry import HTTP_REQUEST_LATENCY, SNAPSHOT_AGE, render_metrics
+from readiness import ReadinessProber
+import profiling
 import logging
 
 # Load environment variables
@@ -23,26 +29,68 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global Azure manager instance
-azure_manager = None
+# Read once at startup so the per-request check is a single boolean test
+PROFILING_ENABLED = profiling.profiling_enabled()
+
+# Authenticated Azure managers, keyed by credential identity
+manager_pool = ManagerPool()
 
 def get_azure_manager():
-    """Get or create Azure manager instance"""
-    global azure_manager
-    if azure_manager is None:
-        try:
-            azure_manager = AzureManager()
-            if not azure_manager.authenticate('service_principal'):
-                azure_manager = None
-        except Exception as e:
-            logger.error(f"Failed to initialize Azure manager: {e}")
-            azure_manager = None
-    return azure_manager
-
-def reset_azure_manager():
-    """Reset the Azure manager instance to force re-authentication"""
-    global azure_manager
-    azure_manager = None
+    """Get or create the Azure manager for the configured credentials"""
+    return manager_pool.get()
+
+def check_azure_readiness() -> bool:
+    """Readiness check run by the background prober, never on the request path"""
+    manager = get_azure_manager()
+    return manager is not None and manager.ping()
+
+readiness_prober = ReadinessProber(check_azure_readiness)
+readiness_prober.start()
+
+# Settings changes made by any worker reach this one through the versioned .env
+config_store = ConfigStore('.env')
+config_watcher = ConfigWatcher(config_store, lambda version, values: credential_reloader.apply(version, values))
+credential_reloader = CredentialReloader(
+    manager_pool,
+    active_version=config_watcher.version,
+    on_swap=lambda version: readiness_prober.trigger()
+)
+config_watcher.start()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def start_profiling():
+    """Profile this request when asked with ?profile=1 (or X-Profile: 1) and a valid admin token"""
+    if not PROFILING_ENABLED:
+        return
+    if request.args.get('profile') != '1' and request.headers.get('X-Profile') != '1':
+        return
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
+        return
+    g.profile = profiling.RequestProfile(f"{request.method}-{request.path}")
+    g.profile.start()
+
+@app.after_request
+def stop_profiling(response):
+    profile = g.pop('profile', None) if PROFILING_ENABLED else None
+    if profile is not None:
+        result = profile.stop()
+        response.headers['X-Profile-Name'] = result['name']
+    return response
+
+@app.after_request
+def record_request_latency(response):
+    """Record per-route latency using the URL rule so labels stay low-cardinality"""
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - start
+        )
+    return response
 
 @app.route('/')
 def index():
@@ -88,15 +136,6 @@ def update_azure_settings():
             if not data.get(field):
                 return jsonify({'error': f'{field.replace("_", " ").title()} is required'}), 400
         
-        # Read current .env file
-        env_file = '.env'
-        env_content = []
-        
-        if os.path.exists(env_file):
-            with open(env_file, 'r') as f:
-                env_content = f.readlines()
-        
-        # Update or add Azure configuration
         azure_config = {
             'AZURE_SUBSCRIPTION_ID': data['subscription_id'],
             'AZURE_TENANT_ID': data['tenant_id'],
@@ -106,51 +145,34 @@ def update_azure_settings():
             'AZURE_DEFAULT_RESOURCE_GROUP': data.get('default_resource_group', '')
         }
         
-        # Remove existing Azure config lines
-        env_content = [line for line in env_content if not line.startswith('AZURE_')]
-        
-        # Add new Azure configuration
-        for key, value in azure_config.items():
-            env_content.append(f'{key}={value}\n')
+        # Every worker (including this one) validates and swaps the new credentials in the
+        # background; the current manager keeps serving until then
+        version = config_store.write(azure_config)
+        config_watcher.poke()
         
-        # Write updated .env file
-        with open(env_file, 'w') as f:
-            f.writelines(env_content)
-        
-        # Reset Azure manager to force re-authentication with new credentials
-        reset_azure_manager()
-        
-        # Test the new configuration
-        try:
-            test_manager = AzureManager()
-            if test_manager.authenticate('service_principal'):
-                return jsonify({
-                    'success': True,
-                    'message': 'Azure configuration updated successfully and connection verified!'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Configuration updated but authentication failed. Please verify your credentials.'
-                }), 400
-        except Exception as auth_error:
-            return jsonify({
-                'success': False,
-                'error': f'Configuration updated but authentication failed: {str(auth_error)}'
-            }), 400
+        return jsonify({
+            'success': True,
+            'pending': True,
+            'version': version,
+            'message': f'Configuration saved (version {version}). Verifying connection...'
+        }), 202
             
     except Exception as e:
         logger.error(f"Error updating Azure settings: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/settings/status')
+def get_settings_status():
+    """Which config version this worker is using, and whether a newer one is pending or failed"""
+    return jsonify(credential_reloader.status())
+
 @app.route('/api/settings/test-connection')
 def test_azure_connection():
     """Test Azure connection with current settings"""
     try:
-        reset_azure_manager()  # Force fresh authentication
         manager = get_azure_manager()
         
-        if manager:
+        if manager and manager.ping():
             # Try to get subscription info to verify connection
             sub_info = manager.get_subscription_info()
             return jsonify({
@@ -208,12 +230,16 @@ def dashboard():
         # Get web apps
         web_apps = manager.list_web_apps()
         
+        # Offline price sheet estimate (no pricing API calls)
+        estimated_cost = manager.estimate_monthly_cost(vms, storage_accounts, web_apps)
+        
         return jsonify({
             'subscription': sub_info,
             'resource_groups': resource_groups,
             'virtual_machines': vms,
             'storage_accounts': storage_accounts,
-            'web_apps': web_apps
+            'web_apps': web_apps,
+            'estimated_cost': estimated_cost
         })
     except Exception as e:
         logger.error(f"Error getting dashboard data: {e}")
@@ -278,12 +304,127 @@ def get_resource_groups():
         logger.error(f"Error getting resource groups: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/metrics/vms')
+def get_vm_metrics():
+    """Get VM utilisation metrics (p50/p95/max per window)"""
+    manager = get_azure_manager()
+    if not manager:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        resource_group = request.args.get('resource_group')
+        hours = int(request.args.get('hours', 1))
+        window = int(request.args.get('window', 15))
+        summary = request.args.get('summary', 'true').lower() == 'true'
+        
+        vms = manager.list_virtual_machines(resource_group)
+        metrics = manager.get_vm_metrics(vms, hours=hours, window_minutes=window, summary=summary)
+        return jsonify({
+            'metrics': metrics,
+            'stats': manager.metrics_collector.stats() if manager.metrics_collector else {}
+        })
+    except Exception as e:
+        logger.error(f"Error getting VM metrics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/costs/summary')
+def get_cost_summary():
+    """Get month-to-date and forecast cost served from the local cost store"""
+    manager = get_azure_manager()
+    if not manager:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        return jsonify(manager.get_cost_summary())
+    except Exception as e:
+        logger.error(f"Error getting cost summary: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/costs/rollup')
+def get_cost_rollup():
+    """Get cost rolled up by resource group, type, location, resource or tag"""
+    manager = get_azure_manager()
+    if not manager:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        by = request.args.get('by', 'resource_group')
+        kind = request.args.get('kind', 'actual')
+        days = request.args.get('days', type=int)
+        tag_key = request.args.get('tag')
+        
+        engine = manager.get_cost_engine()
+        engine.refresh_in_background()
+        return jsonify({
+            'by': by,
+            'kind': kind,
+            'rollup': engine.rollup(by, kind=kind, days=days, tag_key=tag_key)
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting cost rollup: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint"""
+    # Snapshot ages are sampled at scrape time; never authenticate just to report them
+    manager = manager_pool.peek()
+    if manager is not None and manager.cost_engine is not None:
+        last = manager.cost_engine.last_refresh()
+        if last:
+            SNAPSHOT_AGE.labels('cost_store').set(time.time() - last)
+    sheet = get_price_sheet()
+    if sheet is not None:
+        SNAPSHOT_AGE.labels('price_sheet').set(time.time() - os.path.getmtime(sheet.source))
+    
+    body, content_type = render_metrics()
+    return Response(body, mimetype=content_type)
+
+def require_admin():
+    """Return an error response unless profiling is enabled and the admin token matches"""
+    if not PROFILING_ENABLED:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not profiling.is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Admin token required'}), 403
+    return None
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """List stored request profiles"""
+    error = require_admin()
+    if error:
+        return error
+    return jsonify({'profiles': profiling.list_artefacts()})
+
+@app.route('/admin/profiles/<path:filename>')
+def download_profile(filename):
+    """Download a .pstats or .collapsed profile artefact"""
+    error = require_admin()
+    if error:
+        return error
+    if not filename.endswith(('.pstats', '.collapsed')):
+        return jsonify({'error': 'Unknown artefact type'}), 400
+    return send_from_directory(os.path.abspath(profiling.PROFILE_DIR), filename, as_attachment=True)
+
+@app.route('/livez')
+def livez():
+    """Liveness: the process is serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: cached result of the background Azure connectivity check"""
+    state = readiness_prober.state()
+    return jsonify(state), 200 if state['ready'] else 503
+
 @app.route('/health')
 def health():
-    """Health check endpoint"""
+    """Health check endpoint (cached; use /livez and /readyz for probes)"""
     return jsonify({
         'status': 'healthy',
-        'azure_connected': get_azure_manager() is not None
+        'azure_connected': readiness_prober.state()['ready']
     })
 
 if __name__ == '__main__':
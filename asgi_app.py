@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Azure Management ASGI Application
+Async serving mode: the ARM-bound read routes await AsyncAzureManager, everything
+else is served by the Flask app mounted underneath
+
+    uvicorn asgi_app:app --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker -c gunicorn.conf.py asgi_app:app
+"""
+
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from dotenv import load_dotenv
+
+from async_azure_manager import AsyncAzureManager
+from manager_pool import AUTH_INITIAL_BACKOFF, AUTH_MAX_BACKOFF, credential_identity
+from telemetry import HTTP_REQUEST_LATENCY
+from app import app as flask_app
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SWAP_GRACE_SECONDS = 60
+
+# Global async Azure manager instance (one per worker process) and the credentials it uses
+azure_manager = None
+azure_manager_identity = None
+_manager_lock = asyncio.Lock()
+_swap_task = None
+# Authentication backoff, as in ManagerPool.get: failures in a row and when to try again
+_auth_failures = 0
+_auth_retry_at = 0.0
+_failed_identity = None
+_swap_failures = 0
+_swap_retry_at = 0.0
+
+def _retry_after(failures: int) -> float:
+    """Jittered exponential backoff (monotonic deadline) after failures in a row"""
+    delay = min(AUTH_INITIAL_BACKOFF * 2 ** (failures - 1), AUTH_MAX_BACKOFF)
+    return time.monotonic() + delay * random.uniform(0.5, 1.0)
+
+async def get_azure_manager():
+    """
+    Get or create the async Azure manager; concurrent first requests share one authentication
+
+    After a failure, requests return None without retrying until the backoff has elapsed.
+    """
+    global azure_manager, azure_manager_identity, _auth_failures, _auth_retry_at
+    identity = credential_identity()
+    if azure_manager is not None:
+        if identity != azure_manager_identity:
+            schedule_swap(identity)
+        return azure_manager
+    if time.monotonic() < _auth_retry_at:
+        return None
+    async with _manager_lock:
+        # Another request may have finished (or failed) authenticating while we waited
+        if azure_manager is not None or time.monotonic() < _auth_retry_at:
+            return azure_manager
+        try:
+            manager = AsyncAzureManager()
+            if await manager.authenticate('service_principal'):
+                azure_manager, azure_manager_identity = manager, identity
+                _auth_failures, _auth_retry_at = 0, 0.0
+                return azure_manager
+        except Exception as e:
+            logger.error(f"Failed to initialize async Azure manager: {e}")
+        _auth_failures += 1
+        _auth_retry_at = _retry_after(_auth_failures)
+        logger.warning(f"Azure authentication failed ({_auth_failures} in a row); "
+                       f"retrying after {_auth_retry_at - time.monotonic():.0f}s")
+    return None
+
+def schedule_swap(identity):
+    """Authenticate reloaded credentials in the background; the current manager keeps serving"""
+    global _swap_task
+    if identity == _failed_identity and time.monotonic() < _swap_retry_at:
+        return
+    if _swap_task is not None and not _swap_task.done():
+        return
+    _swap_task = asyncio.get_running_loop().create_task(_swap_manager(identity))
+
+async def _swap_manager(identity):
+    global azure_manager, azure_manager_identity, _failed_identity, _swap_failures, _swap_retry_at
+    try:
+        manager = AsyncAzureManager()
+        authenticated = await manager.authenticate('service_principal')
+    except Exception as e:
+        logger.error(f"Failed to initialize async Azure manager: {e}")
+        authenticated = False
+    if not authenticated:
+        _swap_failures = _swap_failures + 1 if identity == _failed_identity else 1
+        _failed_identity, _swap_retry_at = identity, _retry_after(_swap_failures)
+        logger.warning(f"Reloaded Azure credentials failed to authenticate ({_swap_failures} in a row); "
+                       f"still serving the previous ones")
+        return
+    _failed_identity, _swap_failures = None, 0
+    old = azure_manager
+    azure_manager, azure_manager_identity = manager, identity
+    if old is not None:
+        # Let requests already using the old clients finish before closing them
+        await asyncio.sleep(SWAP_GRACE_SECONDS)
+        await old.close()
+
+def not_authenticated():
+    return JSONResponse({'error': 'Not authenticated'}, status_code=401)
+
+async def dashboard(request):
+    """Get dashboard data"""
+    manager = await get_azure_manager()
+    if not manager:
+        return not_authenticated()
+    try:
+        return JSONResponse(await manager.get_dashboard())
+    except Exception as e:
+        logger.error(f"Error getting dashboard data: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+def listing(method_name: str, key: str):
+    """Build a /api/resources/* endpoint returning {key: manager.<method_name>(resource_group)}"""
+    async def endpoint(request):
+        manager = await get_azure_manager()
+        if not manager:
+            return not_authenticated()
+        try:
+            method = getattr(manager, method_name)
+            if key == 'resource_groups':
+                items = await method()
+            else:
+                items = await method(request.query_params.get('resource_group'))
+            return JSONResponse({key: items})
+        except Exception as e:
+            logger.error(f"Error getting {key}: {e}")
+            return JSONResponse({'error': str(e)}, status_code=500)
+    return endpoint
+
+async def auth_status(request):
+    """Check authentication status"""
+    manager = await get_azure_manager()
+    if manager:
+        return JSONResponse({'authenticated': True, 'subscription_id': manager.subscription_id})
+    return JSONResponse({'authenticated': False, 'error': 'Not authenticated'})
+
+class RequestLatencyMiddleware(BaseHTTPMiddleware):
+    """Record latency for the async routes (the mounted Flask app records its own)"""
+
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get('route')
+        if route is not None and not isinstance(route, Mount):
+            HTTP_REQUEST_LATENCY.labels(route.path, request.method, response.status_code).observe(
+                time.perf_counter() - start
+            )
+        return response
+
+async def reset_azure_manager():
+    global azure_manager, _auth_failures, _auth_retry_at
+    async with _manager_lock:
+        manager, azure_manager = azure_manager, None
+        _auth_failures, _auth_retry_at = 0, 0.0
+    if manager is not None:
+        await manager.close()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await reset_azure_manager()
+
+app = Starlette(
+    routes=[
+        Route('/api/dashboard', dashboard),
+        Route('/api/resources/vms', listing('list_virtual_machines', 'vms')),
+        Route('/api/resources/storage', listing('list_storage_accounts', 'storage_accounts')),
+        Route('/api/resources/webapps', listing('list_web_apps', 'web_apps')),
+        Route('/api/resources/resourcegroups', listing('list_resource_groups', 'resource_groups')),
+        Route('/api/auth/status', auth_status),
+        # Settings, pages, metrics, costs and admin routes run on the Flask app in a thread pool
+        Mount('/', WsgiToAsgi(flask_app))
+    ],
+    middleware=[Middleware(RequestLatencyMiddleware)],
+    lifespan=lifespan
+)
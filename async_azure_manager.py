@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Async Azure Manager
+asyncio counterpart of AzureManager's read paths, for the ASGI serving mode
+"""
+
+import os
+import asyncio
+import logging
+from typing import List, Dict, Optional, Any
+
+from azure.identity.aio import ClientSecretCredential, DefaultAzureCredential
+from azure.mgmt.resource.resources.aio import ResourceManagementClient
+from azure.mgmt.compute.aio import ComputeManagementClient
+from azure.mgmt.storage.aio import StorageManagementClient
+from azure.mgmt.web.aio import WebSiteManagementClient
+
+from azure_manager import (
+    arm_client_options,
+    format_resource_group,
+    format_virtual_machine,
+    format_storage_account,
+    format_web_app,
+    power_state_from_instance_view
+)
+from price_sheet import get_price_sheet, estimate_inventory
+from telemetry import arm_call, ThrottleCountingPolicy
+
+logger = logging.getLogger(__name__)
+
+CLIENT_TYPES = {
+    'resource': ResourceManagementClient,
+    'compute': ComputeManagementClient,
+    'storage': StorageManagementClient,
+    'web': WebSiteManagementClient
+}
+
+
+class AsyncAzureManager:
+    """
+    Async Azure resource listings sharing one aiohttp session per client
+
+    Output matches AzureManager's list methods, so both serving modes return the
+    same JSON. Each VM listing fetches instance views concurrently, at most
+    AZURE_ASYNC_CONCURRENCY at a time.
+    """
+
+    def __init__(self, subscription_id: Optional[str] = None):
+        self.subscription_id = subscription_id or os.getenv('AZURE_SUBSCRIPTION_ID')
+        self.credential = None
+        self.clients = {}
+        self.concurrency = int(os.getenv('AZURE_ASYNC_CONCURRENCY', '32'))
+
+        if not self.subscription_id:
+            raise ValueError("Azure subscription ID is required. Set AZURE_SUBSCRIPTION_ID environment variable or pass it to constructor.")
+
+    async def authenticate(self, auth_method: str = "auto") -> bool:
+        """Authenticate with a service principal (or DefaultAzureCredential) and test it"""
+        try:
+            await self.close()
+            if auth_method in ("service_principal", "auto") and all(
+                    os.getenv(k) for k in ('AZURE_TENANT_ID', 'AZURE_CLIENT_ID', 'AZURE_CLIENT_SECRET')):
+                self.credential = ClientSecretCredential(
+                    tenant_id=os.getenv('AZURE_TENANT_ID'),
+                    client_id=os.getenv('AZURE_CLIENT_ID'),
+                    client_secret=os.getenv('AZURE_CLIENT_SECRET')
+                )
+            else:
+                self.credential = DefaultAzureCredential()
+
+            with arm_call("resource_groups.list"):
+                async for _ in self._get_client("resource").resource_groups.list():
+                    break
+            return True
+
+        except Exception as e:
+            logger.error(f"Authentication error: {e}")
+            await self.close()
+            return False
+
+    def _get_client(self, client_type: str):
+        """Get or create an async Azure management client"""
+        if client_type not in self.clients:
+            options = {'per_retry_policies': [ThrottleCountingPolicy()], **arm_client_options()}
+            # Cassette transports are synchronous; async clients keep their aiohttp transport
+            options.pop('transport', None)
+            self.clients[client_type] = CLIENT_TYPES[client_type](self.credential, self.subscription_id, **options)
+        return self.clients[client_type]
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+        self.clients = {}
+        if self.credential is not None:
+            await self.credential.close()
+            self.credential = None
+
+    async def list_resource_groups(self) -> List[Dict[str, Any]]:
+        """List all resource groups in the subscription"""
+        try:
+            client = self._get_client("resource")
+            with arm_call("resource_groups.list"):
+                return [format_resource_group(rg) async for rg in client.resource_groups.list()]
+        except Exception as e:
+            logger.error(f"Error listing resource groups: {e}")
+            return []
+
+    async def list_virtual_machines(self, resource_group: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List virtual machines, fetching power states concurrently"""
+        try:
+            client = self._get_client("compute")
+            if resource_group:
+                with arm_call("virtual_machines.list"):
+                    vm_list = [vm async for vm in client.virtual_machines.list(resource_group)]
+            else:
+                with arm_call("virtual_machines.list_all"):
+                    vm_list = [vm async for vm in client.virtual_machines.list_all()]
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            power_states = await asyncio.gather(
+                *(self._get_vm_power_state(client, semaphore, vm.id.split('/')[4], vm.name) for vm in vm_list)
+            )
+
+            vms = []
+            for vm, power_state in zip(vm_list, power_states):
+                try:
+                    vms.append(format_virtual_machine(vm, power_state))
+                except Exception as vm_error:
+                    logger.warning(f"Error processing VM {getattr(vm, 'name', 'Unknown')}: {vm_error}")
+            return vms
+
+        except Exception as e:
+            logger.error(f"Error listing VMs: {e}")
+            return []
+
+    async def _get_vm_power_state(self, client, semaphore: asyncio.Semaphore, resource_group: str, vm_name: str) -> str:
+        try:
+            async with semaphore:
+                with arm_call("virtual_machines.get_instance_view"):
+                    vm_instance = await client.virtual_machines.get(resource_group, vm_name, expand='instanceView')
+            return power_state_from_instance_view(vm_instance)
+        except Exception:
+            return 'Unknown'
+
+    async def list_storage_accounts(self, resource_group: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List storage accounts"""
+        try:
+            client = self._get_client("storage")
+            if resource_group:
+                with arm_call("storage_accounts.list_by_resource_group"):
+                    return [format_storage_account(a) async for a in client.storage_accounts.list_by_resource_group(resource_group)]
+            with arm_call("storage_accounts.list"):
+                return [format_storage_account(a) async for a in client.storage_accounts.list()]
+        except Exception as e:
+            logger.error(f"Error listing storage accounts: {e}")
+            return []
+
+    async def list_web_apps(self, resource_group: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List web apps"""
+        try:
+            client = self._get_client("web")
+            if resource_group:
+                with arm_call("web_apps.list_by_resource_group"):
+                    return [format_web_app(a) async for a in client.web_apps.list_by_resource_group(resource_group)]
+            with arm_call("web_apps.list"):
+                return [format_web_app(a) async for a in client.web_apps.list()]
+        except Exception as e:
+            logger.error(f"Error listing web apps: {e}")
+            return []
+
+    def get_subscription_info(self) -> Dict[str, Any]:
+        return {
+            'id': self.subscription_id,
+            'name': 'Subscription',
+            'state': 'Enabled'
+        }
+
+    async def get_dashboard(self) -> Dict[str, Any]:
+        """All dashboard listings, fetched concurrently"""
+        resource_groups, vms, storage_accounts, web_apps = await asyncio.gather(
+            self.list_resource_groups(),
+            self.list_virtual_machines(),
+            self.list_storage_accounts(),
+            self.list_web_apps()
+        )
+
+        estimated_cost = None
+        sheet = get_price_sheet()
+        if sheet is not None:
+            estimated_cost = estimate_inventory(sheet, {'vm': vms, 'storage': storage_accounts, 'webapp': web_apps})
+
+        return {
+            'subscription': self.get_subscription_info(),
+            'resource_groups': resource_groups,
+            'virtual_machines': vms,
+            'storage_accounts': storage_accounts,
+            'web_apps': web_apps,
+            'estimated_cost': estimated_cost
+        }
@@ -1,40 +1,31 @@
 #!/usr/bin/env python3
 """
 Automated AVD Setup Script
+
+Installs the AVD agent on every selected session host at once; re-running retries only the hosts that failed.
 """
 
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.desktopvirtualization import DesktopVirtualizationMgmtClient
 from azure.identity import ClientSecretCredential
 import os
+import sys
+
+import click
 from dotenv import load_dotenv
-import time
+
+from azure_manager import arm_client_options
+from registration_token import RegistrationTokenManager
+from run_command import (RunCommandEngine, DEFAULT_PARALLELISM, SUCCEEDED, fleet_options, parse_tags,
+                         run_on_fleet, select_vms)
 
 # Load environment variables
 load_dotenv()
 
-def automated_avd_setup():
-    print("🤖 Automated AVD Setup Starting...")
-    
-    credential = ClientSecretCredential(
-        tenant_id=os.getenv('AZURE_TENANT_ID'),
-        client_id=os.getenv('AZURE_CLIENT_ID'),
-        client_secret=os.getenv('AZURE_CLIENT_SECRET')
-    )
-    
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    
-    try:
-        # Get registration token
-        registration_info = avd_client.host_pools.retrieve_registration_token('avd-rg', 'avd-host-pool')
-        token = registration_info.token
-        
-        print(f"✅ Registration Token Retrieved")
-        print(f"   Expires: {registration_info.expiration_time}")
-        
-        # PowerShell script to install AVD components
-        ps_script = f'''
+# The token and host name are run command parameters, so the script (and its report) is the same on every host
+SETUP_SCRIPT = '''
+param([string]$RegistrationToken, [string]$SessionHost, [string]$HostPoolName)
+
 # AVD Automated Installation Script
 Write-Host "Starting AVD Installation..." -ForegroundColor Green
 
@@ -60,12 +51,11 @@ Start-Process msiexec.exe -ArgumentList "/i $bootloaderPath /quiet /norestart" -
 
 # Register with Host Pool
 Write-Host "Registering with Host Pool..." -ForegroundColor Yellow
-$registrationToken = "{token}"
 $registrationScript = @"
-`$registrationToken = "$registrationToken"
+`$registrationToken = "$RegistrationToken"
 `$registrationPath = "C:\\Program Files\\Microsoft RDInfra\\PowershellModules\\Microsoft.RDInfra.RDPowerShell\\Microsoft.RDInfra.RDPowerShell.psd1"
 Import-Module `$registrationPath
-Add-RdsessionHost -HostPoolName "avd-host-pool" -SessionHost "avd-host-01" -RegistrationToken `$registrationToken
+Add-RdsessionHost -HostPoolName "$HostPoolName" -SessionHost "$SessionHost" -RegistrationToken `$registrationToken
 "@
 
 $registrationScriptPath = "$env:TEMP\\register-avd.ps1"
@@ -75,54 +65,83 @@ PowerShell -ExecutionPolicy Bypass -File $registrationScriptPath
 Write-Host "AVD Installation Complete!" -ForegroundColor Green
 Write-Host "Please restart the computer to complete setup." -ForegroundColor Yellow
 '''
+
+
+def automated_avd_setup(resource_group='avd-rg', host_pool='avd-host-pool', vms=(), match=None, tags=None,
+                        parallelism=DEFAULT_PARALLELISM, timeout=1200, resume=True):
+    print("🤖 Automated AVD Setup Starting...")
+    
+    credential = ClientSecretCredential(
+        tenant_id=os.getenv('AZURE_TENANT_ID'),
+        client_id=os.getenv('AZURE_CLIENT_ID'),
+        client_secret=os.getenv('AZURE_CLIENT_SECRET')
+    )
+    
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    
+    try:
+        session_hosts = select_vms(compute_client, resource_group, vms, match, tags)
+        if not session_hosts:
+            print(f"❌ No VMs selected in {resource_group}")
+            return {}
+        
+        # Get registration token; renewed if it has expired or is about to
+        tokens = RegistrationTokenManager(avd_client)
+        registration_info = tokens.get(resource_group, host_pool)
         
-        print(f"\n🔧 Running Automated Setup...")
+        print(f"✅ Registration Token Retrieved")
+        print(f"   Expires: {registration_info.expiration_time}")
+        
+        print(f"\n🔧 Running Automated Setup on {len(session_hosts)} session host(s)...")
         print(f"   This will:")
         print(f"   ✅ Download and install AVD Agent")
         print(f"   ✅ Download and install AVD Boot Loader")
         print(f"   ✅ Register VM with host pool")
         print(f"   ✅ Configure everything automatically")
         
-        # Run the script on the VM
-        script_params = {
-            'command_id': 'RunPowerShellScript',
-            'script': [ps_script],
-            'parameters': []
-        }
-        
-        print(f"\n🚀 Executing script on VM...")
-        poller = compute_client.virtual_machines.begin_run_command(
-            'avd-rg', 'avd-host-01', script_params
-        )
-        
+        print(f"\n🚀 Executing script on {min(parallelism, len(session_hosts))} VM(s) at a time...")
         print(f"   Script is running... (this may take 5-10 minutes)")
+        engine = RunCommandEngine(
+            compute_client, resource_group, SETUP_SCRIPT, name='automated-avd-setup',
+            # Each host asks the manager, so hosts that start late in a long rollout get a refreshed token
+            parameters=lambda vm_name: {'RegistrationToken': tokens.get(resource_group, host_pool).token,
+                                        'SessionHost': vm_name, 'HostPoolName': host_pool},
+            parallelism=parallelism, timeout=timeout
+        )
+        results = run_on_fleet(engine, session_hosts, resume=resume)
         
-        # Wait for completion
-        result = poller.result()
-        
-        if result.value and len(result.value) > 0:
-            for output in result.value:
-                print(f"   {output.message}")
-        else:
-            print(f"   ✅ Script completed successfully!")
-        
-        print(f"\n🎉 AVD Setup Complete!")
-        print(f"   VM: avd-host-01")
-        print(f"   Host Pool: avd-host-pool")
+        set_up = [vm for vm, result in results.items() if result['status'] == SUCCEEDED]
+        print(f"\n🎉 AVD Setup Complete on {len(set_up)}/{len(results)} session host(s)!")
+        print(f"   Host Pool: {host_pool}")
         print(f"   Status: Ready for AVD sessions")
         
         print(f"\n📋 Next Steps:")
-        print(f"   1. Restart the VM (recommended)")
+        print(f"   1. Restart the VMs (recommended)")
         print(f"   2. Add users to the application group")
         print(f"   3. Test AVD client connection")
+        return results
         
     except Exception as e:
         print(f"❌ Error: {e}")
         print(f"\n💡 Alternative: Use Azure Portal")
         print(f"   1. Go to Azure Portal → Azure Virtual Desktop")
-        print(f"   2. Click 'Host pools' → 'avd-host-pool'")
+        print(f"   2. Click 'Host pools' → '{host_pool}'")
         print(f"   3. Click 'Session hosts' → 'Add session hosts'")
-        print(f"   4. Select your VM: avd-host-01")
+        print(f"   4. Select your VMs")
+        return None
+
+
+@click.command()
+@click.option('--host-pool', default='avd-host-pool', help='Host pool to register with (default: avd-host-pool)')
+@fleet_options(default_timeout=1200)
+def main(host_pool, resource_group, vms, match, tags, parallelism, timeout, restart):
+    """Install the AVD agent and register session hosts"""
+    results = automated_avd_setup(resource_group, host_pool, vms, match, parse_tags(tags),
+                                  parallelism, timeout, resume=not restart)
+    if not results or any(result['status'] != SUCCEEDED for result in results.values()):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    automated_avd_setup()
+    main()
@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+AVD Autoscaler
+Sizes a host pool to its user sessions: starts (or provisions) session hosts as
+sessions approach capacity, and drains and deallocates idle ones once load drops
+"""
+
+import os
+import sys
+import re
+import json
+import math
+import time
+import random
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import click
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+DEFAULT_INTERVAL = 300
+DEFAULT_MIN_HOSTS = 1
+# Spare capacity kept free for new logons: a share of current sessions, but never less than a few slots
+DEFAULT_HEADROOM = 0.2
+DEFAULT_MIN_FREE_SESSIONS = 2
+# No scale-in this long after a scale-out, so a dip in a busy period doesn't bounce hosts
+DEFAULT_SCALE_IN_COOLDOWN = 1800
+# A started host that hasn't reported Available by then stops counting as capacity
+DEFAULT_BOOT_TIMEOUT = 900
+
+RUNNING_STATES = ('running', 'starting')
+STOPPED_STATES = ('deallocated', 'stopped')
+# Power states Azure bills compute for
+BILLED_STATES = ('running', 'starting', 'stopping', 'deallocating')
+AVAILABLE = 'Available'
+
+
+class ScalingConfig:
+    def __init__(self, min_hosts: int = DEFAULT_MIN_HOSTS, max_hosts: Optional[int] = None,
+                 headroom: float = DEFAULT_HEADROOM, min_free_sessions: int = DEFAULT_MIN_FREE_SESSIONS,
+                 scale_in_cooldown: float = DEFAULT_SCALE_IN_COOLDOWN, boot_timeout: float = DEFAULT_BOOT_TIMEOUT,
+                 provision: bool = False, max_sessions: Optional[int] = None):
+        if provision and max_hosts is None:
+            raise ValueError("Provisioning new hosts needs a maximum host count")
+        self.min_hosts = min_hosts
+        self.max_hosts = max_hosts
+        self.headroom = headroom
+        self.min_free_sessions = min_free_sessions
+        self.scale_in_cooldown = scale_in_cooldown
+        self.boot_timeout = boot_timeout
+        self.provision = provision
+        # Overrides the host pool's max_session_limit
+        self.max_sessions = max_sessions
+
+
+def required_hosts(sessions: int, max_sessions: int, config: ScalingConfig) -> int:
+    """Hosts needed for sessions plus headroom, within min_hosts..max_hosts"""
+    free = max(config.min_free_sessions, math.ceil(sessions * config.headroom))
+    hosts = max(config.min_hosts, math.ceil((sessions + free) / max(1, max_sessions)))
+    return min(hosts, config.max_hosts) if config.max_hosts is not None else hosts
+
+
+def plan_scaling(hosts: List[Dict[str, Any]], max_sessions: int, config: ScalingConfig, now: float,
+                 last_scale_out: Optional[float] = None, drained: Iterable[str] = (),
+                 started: Optional[Dict[str, float]] = None, provisioning: int = 0) -> Dict[str, Any]:
+    """
+    What to do to bring the pool to the capacity its sessions need
+
+    hosts are dicts with name, power_state, status (session host status),
+    sessions and allow_new_session. drained names the hosts this autoscaler
+    put in drain mode; hosts drained by anyone else are left alone. started
+    maps hosts this autoscaler started to when, so a booting host counts as
+    capacity until boot_timeout. provisioning is the number of new hosts still
+    being created, also counted as capacity.
+
+    Scale-out first re-enables logons on draining hosts (they are already up),
+    then starts stopped hosts, then provisions new ones if allowed. Scale-in
+    only drains hosts, emptiest first, and deallocates a drained host once its
+    last user has logged off; nobody is disconnected.
+
+    Returns:
+        sessions, required_hosts, serving_hosts, the host names to start,
+        undrain, drain and deallocate, provision (count), shortfall (hosts
+        needed but unavailable), cooldown (seconds until scale-in is allowed)
+        and unhealthy (running hosts not taking logons)
+    """
+    drained = set(drained)
+    started = started or {}
+
+    def booting(host):
+        return host['name'] in started and now - started[host['name']] < config.boot_timeout
+
+    running = [h for h in hosts if h['power_state'] in RUNNING_STATES]
+    serving = [h for h in running if h['allow_new_session'] and (h['status'] == AVAILABLE or booting(h))]
+    unhealthy = [h for h in running if h['allow_new_session'] and h not in serving]
+    draining = [h for h in running if not h['allow_new_session'] and h['name'] in drained]
+    # A host drained by someone else (e.g. for maintenance) is never started
+    stopped = [h for h in hosts if h['power_state'] in STOPPED_STATES
+               and (h['allow_new_session'] or h['name'] in drained)]
+
+    sessions = sum(h['sessions'] for h in hosts)
+    required = required_hosts(sessions, max_sessions, config)
+    capacity = len(serving) + provisioning
+    decision = {
+        'sessions': sessions, 'required_hosts': required, 'serving_hosts': capacity,
+        'start': [], 'undrain': [], 'drain': [], 'deallocate': [], 'provision': 0,
+        'shortfall': 0, 'cooldown': 0, 'unhealthy': [h['name'] for h in unhealthy]
+    }
+
+    if required > capacity:
+        need = required - capacity
+        # Hosts with the most sessions were drained most recently; their users are still warm
+        undrain = sorted(draining, key=lambda h: -h['sessions'])[:need]
+        need -= len(undrain)
+        start = sorted(stopped, key=lambda h: h['name'])[:need]
+        need -= len(start)
+        provision = 0
+        if need and config.provision:
+            provision = max(0, min(need, config.max_hosts - len(hosts) - provisioning))
+        decision.update(undrain=[h['name'] for h in undrain], start=[h['name'] for h in start],
+                        provision=provision, shortfall=need - provision)
+        draining = [h for h in draining if h not in undrain]
+    elif required < capacity:
+        since = now - last_scale_out if last_scale_out is not None else math.inf
+        if since < config.scale_in_cooldown:
+            decision['cooldown'] = round(config.scale_in_cooldown - since)
+        else:
+            # Emptiest first, and the highest-numbered among equals, so the pool shrinks from the end
+            candidates = sorted(sorted(serving, key=lambda h: h['name'], reverse=True), key=lambda h: h['sessions'])
+            drain = candidates[:min(capacity - required, len(serving))]
+            decision['drain'] = [h['name'] for h in drain]
+            draining = draining + drain
+
+    decision['deallocate'] = [h['name'] for h in draining if h['sessions'] == 0]
+    return decision
+
+
+def describe(decision: Dict[str, Any]) -> str:
+    """One line summarising a decision"""
+    parts = [f"{decision['sessions']} sessions, {decision['serving_hosts']}/{decision['required_hosts']} hosts"]
+    for action in ('undrain', 'start', 'drain', 'deallocate'):
+        if decision[action]:
+            parts.append(f"{action} {', '.join(decision[action])}")
+    if decision['provision']:
+        parts.append(f"provision {decision['provision']}")
+    if decision['shortfall']:
+        parts.append(f"⚠️  {decision['shortfall']} host(s) short")
+    if decision['cooldown']:
+        parts.append(f"scale-in in {decision['cooldown'] // 60}m")
+    if decision['unhealthy']:
+        parts.append(f"not available: {', '.join(decision['unhealthy'])}")
+    return '; '.join(parts)
+
+
+class Autoscaler:
+    """
+    Control loop around plan_scaling for one host pool
+
+    pool is a host pool backend (AzureHostPool or SimulatedHostPool) with
+    read(), start(names), deallocate(names), set_allow_new_session(name, allow)
+    and provision(count). clock supplies the current time in seconds, so the
+    loop can run on a simulated clock. Which hosts it drained and when it last
+    scaled out are kept in state_file, so a restarted autoscaler picks up where
+    the last one left off ('' keeps them in memory only).
+    """
+
+    def __init__(self, pool, config: ScalingConfig, state_file: str = '',
+                 clock: Callable[[], float] = time.time, dry_run: bool = False):
+        self.pool = pool
+        self.config = config
+        self.state_file = state_file
+        self.clock = clock
+        self.dry_run = dry_run
+        self.drained = set()
+        self.started: Dict[str, float] = {}
+        self.last_scale_out: Optional[float] = None
+        self._load_state()
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable autoscaler state {self.state_file}: {e}")
+            return
+        if state.get('version') != STATE_VERSION:
+            return
+        self.drained = set(state.get('drained', []))
+        self.started = state.get('started', {})
+        self.last_scale_out = state.get('last_scale_out')
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        state = {'version': STATE_VERSION, 'drained': sorted(self.drained), 'started': self.started,
+                 'last_scale_out': self.last_scale_out}
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.avd-autoscale.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def tick(self) -> Dict[str, Any]:
+        """Read the pool, decide, and (unless dry_run) act; returns the decision plus any errors"""
+        now = self.clock()
+        snapshot = self.pool.read()
+        hosts = snapshot['hosts']
+        names = {h['name'] for h in hosts}
+        # Forget hosts that were deleted, and boots that finished
+        self.drained &= names
+        available = {h['name'] for h in hosts if h['status'] == AVAILABLE}
+        self.started = {name: at for name, at in self.started.items()
+                        if name in names and name not in available and now - at < self.config.boot_timeout}
+
+        decision = plan_scaling(hosts, self.config.max_sessions or snapshot['max_sessions'], self.config, now,
+                                self.last_scale_out, self.drained, self.started, snapshot.get('provisioning', 0))
+        decision['errors'] = []
+        if not self.dry_run:
+            self._apply(decision, {h['name']: h for h in hosts}, now)
+            self._save_state()
+        return decision
+
+    def _apply(self, decision: Dict[str, Any], hosts: Dict[str, Dict[str, Any]], now: float):
+        def attempt(action, name, call):
+            try:
+                call()
+                return True
+            except Exception as e:
+                # One host failing shouldn't stop the rest; the next tick sees the pool as it really is
+                error = str(e).splitlines()[0] if str(e) else repr(e)
+                logger.warning(f"Could not {action} {name}: {error}")
+                decision['errors'].append(f"{action} {name}: {error}")
+                return False
+
+        for name in decision['undrain']:
+            if attempt('undrain', name, lambda: self.pool.set_allow_new_session(name, True)):
+                self.drained.discard(name)
+        # Hosts this autoscaler drained before deallocating them take logons again once started
+        to_start = [name for name in decision['start']
+                    if hosts[name]['allow_new_session']
+                    or attempt('undrain', name, lambda: self.pool.set_allow_new_session(name, True))]
+        if to_start and attempt('start', ', '.join(to_start), lambda: self.pool.start(to_start)):
+            self.drained -= set(to_start)
+            self.started.update({name: now for name in to_start})
+        if decision['provision']:
+            attempt('provision', f"{decision['provision']} host(s)", lambda: self.pool.provision(decision['provision']))
+        if decision['undrain'] or decision['start'] or decision['provision']:
+            self.last_scale_out = now
+
+        for name in decision['drain']:
+            if attempt('drain', name, lambda: self.pool.set_allow_new_session(name, False)):
+                self.drained.add(name)
+        to_deallocate = [name for name in decision['deallocate'] if name in self.drained]
+        if to_deallocate:
+            attempt('deallocate', ', '.join(to_deallocate), lambda: self.pool.deallocate(to_deallocate))
+
+    def run(self, interval: float = DEFAULT_INTERVAL, iterations: Optional[int] = None):
+        """tick() every interval seconds, printing each decision, iterations times or until interrupted"""
+        count = 0
+        while iterations is None or count < iterations:
+            started = time.monotonic()
+            try:
+                decision = self.tick()
+                prefix = '🔍 (dry run) ' if self.dry_run else ''
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] {prefix}{describe(decision)}", flush=True)
+                for error in decision['errors']:
+                    print(f"   ❌ {error}")
+            except Exception as e:
+                # A failed read (e.g. ARM unavailable) skips this tick, it doesn't stop the service
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] ❌ Reading the host pool failed: {e}", flush=True)
+            count += 1
+            if iterations is None or count < iterations:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+class AzureHostPool:
+    """
+    A real host pool: session hosts from the AVD API, power state from compute
+
+    One read costs three list calls whatever the pool size: the host pool, its
+    session hosts, and (via AzureManager.poll_vm_states) the VMs with their
+    instance views. Start and deallocate return once Azure accepts them; the
+    next read sees the result.
+    """
+
+    def __init__(self, manager, avd_client, resource_group: str, host_pool: str,
+                 vm_size: str = 'Standard_B1s'):
+        self.manager = manager
+        self.compute_client = manager.get_client("compute")
+        self.avd_client = avd_client
+        self.resource_group = resource_group
+        self.host_pool = host_pool
+        self.vm_size = vm_size
+        self.location = None
+        self.provisioning = 0
+        self._vm_groups: Dict[str, str] = {}
+        self._session_hosts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def read(self) -> Dict[str, Any]:
+        pool = self.avd_client.host_pools.get(self.resource_group, self.host_pool)
+        self.location = pool.location
+        session_hosts = list(self.avd_client.session_hosts.list(self.resource_group, self.host_pool))
+
+        vms = {}
+        for session_host in session_hosts:
+            # Names are "<pool>/<fqdn>"; the VM behind it comes from its resource ID
+            short_name = session_host.name.split('/')[-1]
+            if session_host.resource_id:
+                parts = session_host.resource_id.split('/')
+                vm = (parts[4], parts[-1])
+            else:
+                vm = (self.resource_group, short_name.split('.')[0])
+            vms[vm] = (short_name, session_host)
+        states = self.manager.poll_vm_states(list(vms))
+
+        hosts = []
+        for (resource_group, vm_name), (short_name, session_host) in vms.items():
+            state = states.get((resource_group, vm_name), {'power_state': 'Unknown'})
+            self._vm_groups[vm_name] = resource_group
+            self._session_hosts[vm_name] = short_name
+            hosts.append({
+                'name': vm_name,
+                'power_state': state['power_state'],
+                'status': session_host.status,
+                'sessions': session_host.sessions or 0,
+                'allow_new_session': session_host.allow_new_session is not False
+            })
+        return {'hosts': hosts, 'max_sessions': pool.max_session_limit or 1, 'provisioning': self.provisioning}
+
+    def _each(self, names: List[str], operation: Callable[[str, str], Any]):
+        errors = []
+        def call(name):
+            try:
+                operation(self._vm_groups.get(name, self.resource_group), name)
+            except Exception as e:
+                errors.append(f"{name}: {str(e).splitlines()[0] if str(e) else repr(e)}")
+        with ThreadPoolExecutor(max_workers=min(8, len(names) or 1)) as executor:
+            list(executor.map(call, names))
+        if errors:
+            raise RuntimeError('; '.join(errors))
+
+    def start(self, names: List[str]):
+        self._each(names, self.compute_client.virtual_machines.begin_start)
+
+    def deallocate(self, names: List[str]):
+        self._each(names, self.compute_client.virtual_machines.begin_deallocate)
+
+    def set_allow_new_session(self, name: str, allow: bool):
+        from azure.mgmt.desktopvirtualization.models import SessionHostPatch
+        self.avd_client.session_hosts.update(self.resource_group, self.host_pool, self._session_hosts[name],
+                                             session_host=SessionHostPatch(allow_new_session=allow))
+
+    def provision(self, count: int):
+        """Create count more session hosts and register them, in the background"""
+        with self._lock:
+            if self.provisioning:
+                return
+            self.provisioning = count
+        numbers = [int(m.group(1)) for m in (re.match(r'avd-host-(\d+)$', name) for name in self._vm_groups) if m]
+        first_index = max(numbers, default=0) + 1
+
+        def provision():
+            from deploy_vms_sdk import deploy_session_hosts
+            from automated_avd_setup import automated_avd_setup
+            try:
+                results = deploy_session_hosts(count, resource_group=self.resource_group,
+                                               location=self.location or 'eastus', vm_size=self.vm_size,
+                                               first_index=first_index)
+                created = [r['vm_name'] for r in results if r['status'] == 'succeeded']
+                if created:
+                    automated_avd_setup(self.resource_group, self.host_pool, vms=created)
+            except Exception as e:
+                logger.warning(f"Provisioning {count} session host(s) failed: {e}")
+            finally:
+                with self._lock:
+                    self.provisioning = 0
+
+        threading.Thread(target=provision, daemon=True, name='autoscale-provision').start()
+
+
+def office_day_load(peak: int) -> Callable[[float], float]:
+    """Sessions over a working day (seconds since midnight): quiet night, morning ramp, lunch dip, evening tail"""
+    points = [(0, 0.02), (6, 0.02), (7, 0.2), (9, 1.0), (12, 1.0), (12.5, 0.8), (13.5, 1.0),
+              (17, 1.0), (19, 0.25), (22, 0.05), (24, 0.02)]
+
+    def load(t):
+        hour = (t / 3600) % 24
+        for (h0, v0), (h1, v1) in zip(points, points[1:]):
+            if h0 <= hour <= h1:
+                return peak * (v0 + (v1 - v0) * (hour - h0) / (h1 - h0))
+        return 0
+    return load
+
+
+class SimulatedHostPool:
+    """
+    An in-memory host pool on a virtual clock, for running the Autoscaler without Azure
+
+    advance(t) moves the clock: boots and deallocations finish after
+    boot_seconds / deallocate_seconds (provision_seconds for new hosts), a
+    share of users log off and back on each hour (churn_per_hour), and the
+    session count follows load(t). New logons go to the least loaded available
+    host (BreadthFirst); logons with nowhere to go are counted as waiting.
+    """
+
+    def __init__(self, hosts: int = 4, max_sessions: int = 10, load: Optional[Callable[[float], float]] = None,
+                 running: Optional[int] = None, boot_seconds: float = 240, deallocate_seconds: float = 90,
+                 provision_seconds: float = 1200, churn_per_hour: float = 0.3, seed: int = 0):
+        self.max_sessions = max_sessions
+        self.load = load or office_day_load(hosts * max_sessions // 2)
+        self.boot_seconds = boot_seconds
+        self.deallocate_seconds = deallocate_seconds
+        self.provision_seconds = provision_seconds
+        self.churn_per_hour = churn_per_hour
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+        for i in range(hosts):
+            self._add_host(running is None or i < running)
+        self.waiting = 0
+        # Totals over the simulated time
+        self.host_seconds = 0.0
+        self.waiting_session_seconds = 0.0
+        self.peak_waiting = 0
+
+    def _add_host(self, running: bool, power_state: Optional[str] = None, until: float = 0.0):
+        name = f"avd-host-{len(self.hosts) + 1:02d}"
+        self.hosts[name] = {'name': name, 'power_state': power_state or ('running' if running else 'deallocated'),
+                            'status': AVAILABLE if running else 'Shutdown', 'sessions': 0,
+                            'allow_new_session': True, 'until': until}
+
+    def advance(self, now: float):
+        elapsed = now - self.now
+        self.host_seconds += elapsed * sum(h['power_state'] in BILLED_STATES for h in self.hosts.values())
+        self.waiting_session_seconds += elapsed * self.waiting
+        self.now = now
+
+        for host in self.hosts.values():
+            if host['until'] and host['until'] <= now:
+                if host['power_state'] in ('starting', 'provisioning'):
+                    host.update(power_state='running', status=AVAILABLE, until=0.0)
+                elif host['power_state'] == 'deallocating':
+                    host.update(power_state='deallocated', status='Shutdown', sessions=0, until=0.0)
+
+        # Churn: some users log off and straight back on, possibly onto another host
+        leave_chance = min(1.0, self.churn_per_hour * elapsed / 3600)
+        for host in self.hosts.values():
+            host['sessions'] -= sum(self.rng.random() < leave_chance for _ in range(host['sessions']))
+
+        demand = round(self.load(now))
+        placed = sum(h['sessions'] for h in self.hosts.values())
+        if placed > demand:
+            seats = [h for h in self.hosts.values() for _ in range(h['sessions'])]
+            for host in self.rng.sample(seats, placed - demand):
+                host['sessions'] -= 1
+            placed = demand
+        available = [h for h in self.hosts.values()
+                     if h['power_state'] == 'running' and h['status'] == AVAILABLE and h['allow_new_session']]
+        while placed < demand:
+            open_hosts = [h for h in available if h['sessions'] < self.max_sessions]
+            if not open_hosts:
+                break
+            min(open_hosts, key=lambda h: (h['sessions'], h['name']))['sessions'] += 1
+            placed += 1
+        self.waiting = demand - placed
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def read(self) -> Dict[str, Any]:
+        hosts = [{k: v for k, v in h.items() if k != 'until'}
+                 for h in self.hosts.values() if h['power_state'] != 'provisioning']
+        provisioning = sum(h['power_state'] == 'provisioning' for h in self.hosts.values())
+        return {'hosts': hosts, 'max_sessions': self.max_sessions, 'provisioning': provisioning}
+
+    def start(self, names: List[str]):
+        for name in names:
+            host = self.hosts[name]
+            if host['power_state'] in STOPPED_STATES:
+                host.update(power_state='starting', status='Unavailable', until=self.now + self.boot_seconds)
+
+    def deallocate(self, names: List[str]):
+        for name in names:
+            host = self.hosts[name]
+            if host['power_state'] in RUNNING_STATES:
+                host.update(power_state='deallocating', status='Unavailable', sessions=0,
+                            until=self.now + self.deallocate_seconds)
+
+    def set_allow_new_session(self, name: str, allow: bool):
+        self.hosts[name]['allow_new_session'] = allow
+
+    def provision(self, count: int):
+        for _ in range(count):
+            self._add_host(False, 'provisioning', self.now + self.provision_seconds)
+
+    def running_hosts(self) -> int:
+        return sum(h['power_state'] in BILLED_STATES for h in self.hosts.values())
+
+
+def simulate(pool: SimulatedHostPool, config: ScalingConfig, hours: float = 24, step: float = 60,
+             report_every: float = 3600) -> Dict[str, Any]:
+    """Run an Autoscaler against pool for hours of simulated time, printing the pool every report_every seconds"""
+    autoscaler = Autoscaler(pool, config, clock=lambda: pool.now)
+    actions = {'start': 0, 'undrain': 0, 'drain': 0, 'deallocate': 0, 'provision': 0}
+    print(f"{'Time':>5}  {'Sessions':>8}  {'Waiting':>7}  {'Hosts on':>8}  {'Serving':>7}  Actions")
+    since_report = {key: 0 for key in actions}
+    t = 0.0
+    while t <= hours * 3600:
+        pool.advance(t)
+        decision = autoscaler.tick()
+        for key in actions:
+            count = decision[key] if key == 'provision' else len(decision[key])
+            actions[key] += count
+            since_report[key] += count
+        if t % report_every < step:
+            done = ', '.join(f"{key} {count}" for key, count in since_report.items() if count) or '-'
+            print(f"{int(t // 3600) % 24:02d}:{int(t % 3600 // 60):02d}  {decision['sessions']:>8}  {pool.waiting:>7}  "
+                  f"{pool.running_hosts():>8}  {decision['serving_hosts']:>7}  {done}")
+            since_report = {key: 0 for key in actions}
+        t += step
+    return {'host_hours': pool.host_seconds / 3600, 'waiting_session_minutes': pool.waiting_session_seconds / 60,
+            'peak_waiting': pool.peak_waiting, 'actions': actions}
+
+
+def scaling_options(command):
+    """Click options shared by run and simulate"""
+    options = [
+        click.option('--min-hosts', default=DEFAULT_MIN_HOSTS, help=f'Hosts kept running at all times (default: {DEFAULT_MIN_HOSTS})'),
+        click.option('--max-hosts', type=int, default=None, help='Most hosts to run (default: no limit)'),
+        click.option('--headroom', default=DEFAULT_HEADROOM,
+                     help=f'Spare capacity as a share of current sessions (default: {DEFAULT_HEADROOM})'),
+        click.option('--min-free-sessions', default=DEFAULT_MIN_FREE_SESSIONS,
+                     help=f'Spare session slots kept free at least (default: {DEFAULT_MIN_FREE_SESSIONS})'),
+        click.option('--cooldown', default=DEFAULT_SCALE_IN_COOLDOWN // 60,
+                     help=f'Minutes after a scale-out before scaling in (default: {DEFAULT_SCALE_IN_COOLDOWN // 60})'),
+        click.option('--provision', is_flag=True, help='Create new session hosts when every host is running (needs --max-hosts)')
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def _config(min_hosts, max_hosts, headroom, min_free_sessions, cooldown, provision, **extra) -> ScalingConfig:
+    try:
+        return ScalingConfig(min_hosts=min_hosts, max_hosts=max_hosts, headroom=headroom,
+                             min_free_sessions=min_free_sessions, scale_in_cooldown=cooldown * 60,
+                             provision=provision, **extra)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+
+@click.group()
+def cli():
+    """Scale an AVD host pool with its user sessions"""
+
+
+@cli.command()
+@click.option('--resource-group', default='avd-rg', help='Resource group of the host pool (default: avd-rg)')
+@click.option('--host-pool', default='avd-host-pool', help='Host pool to scale (default: avd-host-pool)')
+@click.option('--interval', default=DEFAULT_INTERVAL, help=f'Seconds between checks (default: {DEFAULT_INTERVAL})')
+@click.option('--once', is_flag=True, help='Check and act once, then exit')
+@click.option('--dry-run', is_flag=True, help='Print what would be done without doing it')
+@click.option('--vm-size', default='Standard_B1s', help='VM size for --provision (default: Standard_B1s)')
+@scaling_options
+def run(resource_group, host_pool, interval, once, dry_run, vm_size, **options):
+    """Run the autoscaler against a host pool"""
+    load_dotenv()
+    from azure.mgmt.desktopvirtualization import DesktopVirtualizationMgmtClient
+    from azure_manager import AzureManager, arm_client_options
+
+    config = _config(**options)
+    manager = AzureManager(os.getenv('AZURE_SUBSCRIPTION_ID'))
+    if not manager.authenticate('service_principal'):
+        sys.exit(1)
+    avd_client = DesktopVirtualizationMgmtClient(manager.credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+
+    pool = AzureHostPool(manager, avd_client, resource_group, host_pool, vm_size=vm_size)
+    autoscaler = Autoscaler(pool, config, state_file=state_path(resource_group, host_pool), dry_run=dry_run)
+    print(f"📈 Autoscaling {host_pool} every {interval}s (min {config.min_hosts}, max {config.max_hosts or 'all'} hosts)")
+    try:
+        autoscaler.run(interval, iterations=1 if once else None)
+    except KeyboardInterrupt:
+        print("\n👋 Autoscaler stopped")
+
+
+@cli.command('simulate')
+@click.option('--hosts', default=6, help='Session hosts in the pool (default: 6)')
+@click.option('--max-sessions', default=10, help='Sessions per host (default: 10)')
+@click.option('--peak', default=40, help='Sessions at the busiest time of day (default: 40)')
+@click.option('--hours', default=24.0, help='Simulated hours, from midnight (default: 24)')
+@click.option('--step', default=60, help='Simulated seconds between checks (default: 60)')
+@click.option('--boot-seconds', default=240, help='Simulated time for a host to start (default: 240)')
+@click.option('--seed', default=0, help='Random seed for logoffs (default: 0)')
+@scaling_options
+def simulate_pool(hosts, max_sessions, peak, hours, step, boot_seconds, seed, **options):
+    """Run the autoscaler against a simulated host pool over a working day"""
+    config = _config(**options)
+    pool = SimulatedHostPool(hosts, max_sessions, office_day_load(peak), running=hosts,
+                             boot_seconds=boot_seconds, seed=seed)
+    result = simulate(pool, config, hours, step)
+
+    # Hosts provisioned during the run count as if they had been there all along
+    always_on = len(pool.hosts) * hours
+    print(f"\n📊 {result['host_hours']:.1f} host-hours vs {always_on:.0f} with every host always on "
+          f"({100 * (1 - result['host_hours'] / always_on):.0f}% less)")
+    print(f"   Logons that found no free host: {result['waiting_session_minutes']:.0f} session-minutes waiting, "
+          f"at most {result['peak_waiting']} at once")
+    print(f"   Actions: " + ', '.join(f"{key} {count}" for key, count in result['actions'].items()))
+
+
+
+def state_path(resource_group: str, host_pool: str) -> str:
+    return f".avd-autoscale-{resource_group}-{host_pool}.json"
+
+
+if __name__ == "__main__":
+    cli()
@@ -7,6 +7,8 @@ Command-line interface for Azure resource management
 import os
 import sys
 import click
+from datetime import datetime
+from itertools import islice
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.panel import Panel
@@ -14,7 +16,11 @@ from rich.table import Table
 from rich.prompt import Prompt, Confirm
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+import azure_manager
 from azure_manager import AzureManager
+from stream_output import STREAM_FORMATS, parse_fields, stream_to_stdout
+from inventory_export import InventoryExporter, DEFAULT_PARALLELISM
+from cli_shell import AzureShell, CachingAzureManager
 
 # Load environment variables
 load_dotenv()
@@ -39,18 +45,24 @@ def cli(ctx, subscription_id, auth_method):
         console.print("Set AZURE_SUBSCRIPTION_ID environment variable or use --subscription-id option.")
         sys.exit(1)
 
+def get_manager(ctx):
+    """The shell's warm manager when it matches the subscription, otherwise a newly authenticated one (None on failure)"""
+    manager = ctx.obj.get('manager')
+    if manager is not None and manager.subscription_id == ctx.obj['subscription_id']:
+        return manager
+    manager = AzureManager(ctx.obj['subscription_id'])
+    return manager if manager.authenticate(ctx.obj['auth_method']) else None
+
 @cli.command()
 @click.pass_context
 def auth(ctx):
     """Test Azure authentication"""
-    subscription_id = ctx.obj['subscription_id']
-    auth_method = ctx.obj['auth_method']
     
     console.print(Panel.fit("[bold blue]Azure Authentication Test[/bold blue]", border_style="blue"))
     
     try:
-        manager = AzureManager(subscription_id)
-        if manager.authenticate(auth_method):
+        manager = get_manager(ctx)
+        if manager:
             console.print("[bold green]✓ Authentication successful![/bold green]")
             
             # Get subscription info
@@ -72,12 +84,10 @@ def auth(ctx):
 @click.pass_context
 def dashboard(ctx):
     """Display Azure resource dashboard"""
-    subscription_id = ctx.obj['subscription_id']
-    auth_method = ctx.obj['auth_method']
     
     try:
-        manager = AzureManager(subscription_id)
-        if manager.authenticate(auth_method):
+        manager = get_manager(ctx)
+        if manager:
             manager.display_dashboard()
         else:
             console.print("[bold red]Authentication failed![/bold red]")
@@ -93,17 +103,35 @@ def list(ctx):
     """List Azure resources"""
     pass
 
+def output_options(command):
+    """--format/--fields for list commands; jsonl, csv and tsv stream rows as ARM pages arrive"""
+    command = click.option('--fields', help='Comma-separated fields for jsonl/csv/tsv (dotted names for nested values)')(command)
+    command = click.option('--format', 'output_format', type=click.Choice(['table'] + STREAM_FORMATS), default='table',
+                           help='Output format (default: table)')(command)
+    return command
+
+def messages_to_stderr():
+    """Keep stdout for data when streaming, so output pipes cleanly into other tools"""
+    console.file = sys.stderr
+    azure_manager.console.file = sys.stderr
+
 @list.command()
+@output_options
 @click.option('--resource-group', help='Filter by resource group')
 @click.pass_context
-def vms(ctx, resource_group):
+def vms(ctx, resource_group, output_format, fields):
     """List virtual machines"""
-    subscription_id = ctx.obj['subscription_id']
-    auth_method = ctx.obj['auth_method']
     
     try:
-        manager = AzureManager(subscription_id)
-        if manager.authenticate(auth_method):
+        if output_format != 'table':
+            messages_to_stderr()
+        manager = get_manager(ctx)
+        if manager:
+            if output_format != 'table':
+                count = stream_to_stdout(manager.iter_virtual_machines(resource_group), output_format, parse_fields(fields, 'vms'))
+                console.print(f"[dim]Total VMs: {count}[/dim]")
+                return
+            
             with console.status("[bold green]Loading virtual machines..."):
                 vms = manager.list_virtual_machines(resource_group)
             
@@ -139,16 +167,22 @@ def vms(ctx, resource_group):
         sys.exit(1)
 
 @list.command()
+@output_options
 @click.option('--resource-group', help='Filter by resource group')
 @click.pass_context
-def storage(ctx, resource_group):
+def storage(ctx, resource_group, output_format, fields):
     """List storage accounts"""
-    subscription_id = ctx.obj['subscription_id']
-    auth_method = ctx.obj['auth_method']
     
     try:
-        manager = AzureManager(subscription_id)
-        if manager.authenticate(auth_method):
+        if output_format != 'table':
+            messages_to_stderr()
+        manager = get_manager(ctx)
+        if manager:
+            if output_format != 'table':
+                count = stream_to_stdout(manager.iter_storage_accounts(resource_group), output_format, parse_fields(fields, 'storage'))
+                console.print(f"[dim]Total storage accounts: {count}[/dim]")
+                return
+            
             with console.status("[bold green]Loading storage accounts..."):
                 accounts = manager.list_storage_accounts(resource_group)
             
@@ -184,16 +218,22 @@ def storage(ctx, resource_group):
         sys.exit(1)
 
 @list.command()
+@output_options
 @click.option('--resource-group', help='Filter by resource group')
 @click.pass_context
-def webapps(ctx, resource_group):
+def webapps(ctx, resource_group, output_format, fields):
     """List web apps"""
-    subscription_id = ctx.obj['subscription_id']
-    auth_method = ctx.obj['auth_method']
     
     try:
-        manager = AzureManager(subscription_id)
-        if manager.authenticate(auth_method):
+        if output_format != 'table':
+            messages_to_stderr()
+        manager = get_manager(ctx)
+        if manager:
+            if output_format != 'table':
+                count = stream_to_stdout(manager.iter_web_apps(resource_group), output_format, parse_fields(fields, 'webapps'))
+                console.print(f"[dim]Total web apps: {count}[/dim]")
+                return
+            
             with console.status("[bold green]Loading web apps..."):
                 apps = manager.list_web_apps(resource_group)
             
@@ -227,15 +267,21 @@ def webapps(ctx, resource_group):
         sys.exit(1)
 
 @list.command()
+@output_options
 @click.pass_context
-def resourcegroups(ctx):
+def resourcegroups(ctx, output_format, fields):
     """List resource groups"""
-    subscription_id = ctx.obj['subscription_id']
-    auth_method = ctx.obj['auth_method']
     
     try:
-        manager = AzureManager(subscription_id)
-        if manager.authenticate(auth_method):
+        if output_format != 'table':
+            messages_to_stderr()
+        manager = get_manager(ctx)
+        if manager:
+            if output_format != 'table':
+                count = stream_to_stdout(manager.iter_resource_groups(), output_format, parse_fields(fields, 'resourcegroups'))
+                console.print(f"[dim]Total resource groups: {count}[/dim]")
+                return
+            
             with console.status("[bold green]Loading resource groups..."):
                 resource_groups = manager.list_resource_groups()
             
@@ -247,7 +293,7 @@ def resourcegroups(ctx):
                 table.add_column("Tags", style="green")
                 
                 for rg in resource_groups:
-                    tags_str = ", ".join([f"{k}={v}" for k, v in list(rg['tags'].items())[:3]])
+                    tags_str = ", ".join([f"{k}={v}" for k, v in islice(rg['tags'].items(), 3)])
                     table.add_row(
                         rg['name'],
                         rg['location'],
@@ -267,6 +313,124 @@ def resourcegroups(ctx):
         console.print(f"[bold red]Error: {str(e)}[/bold red]")
         sys.exit(1)
 
+@cli.command()
+@click.option('--resource-group', help='Filter by resource group')
+@click.option('--hours', default=1, help='Lookback period in hours (default: 1)')
+@click.option('--window', default=15, help='Aggregation window in minutes (default: 15)')
+@click.pass_context
+def metrics(ctx, resource_group, hours, window):
+    """Show VM CPU, network and disk utilisation"""
+
+    try:
+        manager = get_manager(ctx)
+        if manager:
+            with console.status("[bold green]Loading VM metrics..."):
+                vms = manager.list_virtual_machines(resource_group)
+                vm_metrics = manager.get_vm_metrics(vms, hours=hours, window_minutes=window)
+
+            if vm_metrics:
+                table = Table(title=f"VM Utilisation (last {window} min window)")
+                table.add_column("Name", style="cyan")
+                table.add_column("Resource Group", style="blue")
+                table.add_column("CPU p50 %", style="green")
+                table.add_column("CPU p95 %", style="yellow")
+                table.add_column("CPU max %", style="red")
+                table.add_column("Net In p95", style="magenta")
+                table.add_column("Net Out p95", style="magenta")
+                table.add_column("Disk R/W p95", style="magenta")
+
+                def fmt(stats, key):
+                    return "-" if not stats or stats.get(key) is None else f"{stats[key]:,.1f}"
+
+                for vm in vms:
+                    data = vm_metrics.get(vm.get('id'), {})
+                    cpu = data.get('Percentage CPU')
+                    disk_read = fmt(data.get('Disk Read Bytes'), 'p95')
+                    disk_write = fmt(data.get('Disk Write Bytes'), 'p95')
+                    table.add_row(
+                        vm['name'],
+                        vm['resource_group'],
+                        fmt(cpu, 'p50'),
+                        fmt(cpu, 'p95'),
+                        fmt(cpu, 'max'),
+                        fmt(data.get('Network In Total'), 'p95'),
+                        fmt(data.get('Network Out Total'), 'p95'),
+                        f"{disk_read} / {disk_write}"
+                    )
+
+                console.print(table)
+                stats = manager.metrics_collector.stats()
+                console.print(f"\n[dim]VMs: {len(vms)} | ARM calls: {stats['arm_calls']} "
+                              f"({stats['arm_calls_per_1000_vms']} per 1,000 VMs)[/dim]")
+            else:
+                console.print("[yellow]No VM metrics found.[/yellow]")
+        else:
+            console.print("[bold red]Authentication failed![/bold red]")
+            sys.exit(1)
+
+    except Exception as e:
+        console.print(f"[bold red]Error: {str(e)}[/bold red]")
+        sys.exit(1)
+
+@cli.command()
+@click.option('--output-dir', help='Directory for the export (default: inventory-export-<timestamp>)')
+@click.option('--subscription', 'subscriptions', multiple=True, help='Subscription to export (repeatable; default: current)')
+@click.option('--parallelism', default=DEFAULT_PARALLELISM, help=f'Concurrent listings (default: {DEFAULT_PARALLELISM})')
+@click.option('--power-state', is_flag=True, help='Include VM power state (one extra ARM call per VM)')
+@click.option('--format', 'export_format', type=click.Choice(['parquet', 'jsonl']),
+              help='File format (default: parquet if pyarrow is installed, else gzip JSONL)')
+@click.pass_context
+def export(ctx, output_dir, subscriptions, parallelism, power_state, export_format):
+    """Export the full inventory to Parquet (or gzip JSONL) files"""
+    output_dir = output_dir or f"inventory-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    try:
+        manager = get_manager(ctx)
+        if manager:
+            exporter = InventoryExporter(manager, output_dir, subscription_ids=subscriptions or None,
+                                         parallelism=parallelism, power_state=power_state, fmt=export_format)
+            with console.status(f"[bold green]Exporting inventory to {output_dir} ({exporter.format})..."):
+                result = exporter.run()
+
+            table = Table(title=f"Inventory Export ({result['format']})")
+            table.add_column("Resource Type", style="cyan")
+            table.add_column("Rows", style="green", justify="right")
+            table.add_column("File", style="blue")
+            for resource_type, count in result['counts'].items():
+                table.add_row(resource_type, f"{count:,}", result['files'][resource_type])
+
+            console.print(table)
+            peak_rss = f"peak RSS {result['peak_rss_mb']} MB, " if result['peak_rss_mb'] is not None else ""
+            console.print(f"\n[dim]{sum(result['counts'].values()):,} resources in {result['elapsed_seconds']}s, "
+                          f"{peak_rss}written to {output_dir}[/dim]")
+            for error in result['errors']:
+                console.print(f"[yellow]Warning: {error}[/yellow]")
+        else:
+            console.print("[bold red]Authentication failed![/bold red]")
+            sys.exit(1)
+
+    except Exception as e:
+        console.print(f"[bold red]Error: {str(e)}[/bold red]")
+        sys.exit(1)
+
+@cli.command()
+@click.pass_context
+def shell(ctx):
+    """Interactive shell that authenticates once and keeps clients and listings warm"""
+    try:
+        with console.status("[bold green]Authenticating..."):
+            manager = CachingAzureManager(ctx.obj['subscription_id'])
+            authenticated = manager.authenticate(ctx.obj['auth_method'])
+        if not authenticated:
+            console.print("[bold red]Authentication failed![/bold red]")
+            sys.exit(1)
+    except Exception as e:
+        console.print(f"[bold red]Error: {str(e)}[/bold red]")
+        sys.exit(1)
+
+    ctx.obj['manager'] = manager
+    AzureShell(cli, ctx.obj, console).run()
+
 @cli.command()
 @click.pass_context
 def setup(ctx):
@@ -5,9 +5,13 @@ Provides comprehensive Azure resource management capabilities via API
 """
 
 import os
+import time
+import random
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterable, Iterator, Optional, Any, Callable, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 
 from azure.identity import (
     ClientSecretCredential, 
@@ -24,21 +28,145 @@ from azure.mgmt.sql import SqlManagementClient
 from azure.mgmt.monitor import MonitorManagementClient
 from azure.mgmt.costmanagement import CostManagementClient
 from azure.core.exceptions import AzureError, ClientAuthenticationError
+from azure.core.pipeline.policies import SansIOHTTPPolicy
 
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from vm_metrics import VMMetricsCollector, latest_summary
+from cost_engine import CostEngine
+from price_sheet import get_price_sheet, estimate_inventory
+from telemetry import arm_call, ThrottleCountingPolicy
+from cassette import cassette_transport, ReplayTransport
+
 console = Console()
 
+# Instance-view calls in flight per VM listing, and VMs handed to them at a time
+POWER_STATE_WORKERS = 10
+POWER_STATE_BATCH = 100
+
+# wait_for_state polls at once, then backs off from WAIT_INITIAL_INTERVAL to WAIT_MAX_INTERVAL
+# seconds (+/- WAIT_JITTER), dropping back to the initial interval whenever a VM's state changes
+WAIT_INITIAL_INTERVAL = 2.0
+WAIT_MAX_INTERVAL = 30.0
+WAIT_BACKOFF = 1.5
+WAIT_JITTER = 0.2
+
+def arm_client_options() -> Dict[str, Any]:
+    """
+    Extra management client kwargs for non-default ARM endpoints and cassettes
+    
+    A plain-http localhost endpoint (such as fake_arm.py) gets a no-op authentication
+    policy, since azure-core refuses to send bearer tokens over http. Replaying a
+    cassette (AZURE_CASSETTE_MODE=replay) needs no token at all.
+    """
+    options = {}
+    endpoint = os.getenv('AZURE_ARM_ENDPOINT')
+    if endpoint:
+        options['base_url'] = endpoint
+        parsed = urlparse(endpoint)
+        if parsed.scheme == 'http' and parsed.hostname in ('localhost', '127.0.0.1'):
+            options['authentication_policy'] = SansIOHTTPPolicy()
+    
+    transport = cassette_transport()
+    if transport is not None:
+        options['transport'] = transport
+        if isinstance(transport, ReplayTransport):
+            options['authentication_policy'] = SansIOHTTPPolicy()
+    return options
+
+def format_resource_group(rg) -> Dict[str, Any]:
+    return {
+        'name': rg.name,
+        'location': rg.location,
+        'tags': rg.tags or {},
+        'properties': {
+            'provisioning_state': rg.properties.provisioning_state
+        }
+    }
+
+def format_virtual_machine(vm, power_state: str) -> Dict[str, Any]:
+    # Handle os_type properly - it can be a string or an object
+    os_type = 'Unknown'
+    if vm.storage_profile.os_disk.os_type:
+        if hasattr(vm.storage_profile.os_disk.os_type, 'value'):
+            os_type = vm.storage_profile.os_disk.os_type.value
+        else:
+            os_type = str(vm.storage_profile.os_disk.os_type)
+    
+    return {
+        'id': vm.id,
+        'name': vm.name,
+        'resource_group': vm.id.split('/')[4],
+        'location': vm.location,
+        'vm_size': vm.hardware_profile.vm_size,
+        'os_type': os_type,
+        'power_state': power_state,
+        'tags': vm.tags or {}
+    }
+
+def power_state_from_instance_view(vm_instance) -> str:
+    if vm_instance.instance_view and vm_instance.instance_view.statuses:
+        for status in vm_instance.instance_view.statuses:
+            if status.code.startswith('PowerState/'):
+                return status.code.split('/')[1]
+    return 'Unknown'
+
+def vm_state_from_instance_view(instance_view) -> Dict[str, Any]:
+    """power_state, provisioning_state and agent_status ('Ready', 'Not Ready' or None) of a VM instance view"""
+    state = {'power_state': 'Unknown', 'provisioning_state': None, 'agent_status': None}
+    for status in (instance_view.statuses or []) if instance_view else []:
+        if status.code.startswith('PowerState/'):
+            state['power_state'] = status.code.split('/')[1]
+        elif status.code.startswith('ProvisioningState/'):
+            state['provisioning_state'] = status.code.split('/')[1]
+    vm_agent = instance_view.vm_agent if instance_view else None
+    if vm_agent and vm_agent.statuses:
+        state['agent_status'] = vm_agent.statuses[0].display_status
+    return state
+
+def vm_running(state: Dict[str, Any]) -> bool:
+    return state['power_state'] == 'running'
+
+def vm_ready(state: Dict[str, Any]) -> bool:
+    """Running with the guest agent reporting Ready, i.e. booted far enough to take run commands and logons"""
+    return state['power_state'] == 'running' and state['agent_status'] == 'Ready'
+
+def format_storage_account(account) -> Dict[str, Any]:
+    return {
+        'name': account.name,
+        'resource_group': account.id.split('/')[4],
+        'location': account.location,
+        'sku': account.sku.name,
+        'kind': account.kind,
+        'status': account.status_of_primary,
+        'tags': account.tags or {}
+    }
+
+def format_web_app(app) -> Dict[str, Any]:
+    return {
+        'name': app.name,
+        'resource_group': app.id.split('/')[4],
+        'location': app.location,
+        'state': app.state,
+        'host_names': app.host_names,
+        'default_host_name': app.default_host_name,
+        'tags': app.tags or {}
+    }
+
 class AzureManager:
     """Main class for Azure resource management"""
     
-    def __init__(self, subscription_id: Optional[str] = None):
-        self.subscription_id = subscription_id or os.getenv('AZURE_SUBSCRIPTION_ID')
+    def __init__(self, subscription_id: Optional[str] = None, settings: Optional[Dict[str, str]] = None):
+        # Explicit settings (e.g. a config version being validated) take precedence over the environment
+        self.settings = settings or {}
+        self.subscription_id = subscription_id or self._setting('AZURE_SUBSCRIPTION_ID')
         self.credential = None
         self.clients = {}
+        self.metrics_collector = None
+        self.cost_engine = None
         
         # Setup logging
         logging.basicConfig(level=logging.INFO)
@@ -69,6 +197,9 @@ class AzureManager:
                     # Try default credential (includes managed identity, environment variables, etc.)
                     self.credential = DefaultAzureCredential()
                 
+                # Clients are bound to a credential, so drop any built for a previous one
+                self.clients = {}
+                
                 # Test the credential
                 self._test_credential()
                 console.print("[bold green]✓ Authentication successful![/bold green]")
@@ -79,108 +210,139 @@ class AzureManager:
             self.logger.error(f"Authentication error: {e}")
             return False
     
+    def _setting(self, key: str) -> Optional[str]:
+        if key in self.settings:
+            return self.settings[key] or None
+        return os.getenv(key)
+    
     def _has_service_principal_creds(self) -> bool:
         """Check if service principal credentials are available"""
         return all([
-            os.getenv('AZURE_TENANT_ID'),
-            os.getenv('AZURE_CLIENT_ID'),
-            os.getenv('AZURE_CLIENT_SECRET')
+            self._setting('AZURE_TENANT_ID'),
+            self._setting('AZURE_CLIENT_ID'),
+            self._setting('AZURE_CLIENT_SECRET')
         ])
     
     def _get_service_principal_credential(self) -> ClientSecretCredential:
         """Get service principal credential"""
         return ClientSecretCredential(
-            tenant_id=os.getenv('AZURE_TENANT_ID'),
-            client_id=os.getenv('AZURE_CLIENT_ID'),
-            client_secret=os.getenv('AZURE_CLIENT_SECRET')
+            tenant_id=self._setting('AZURE_TENANT_ID'),
+            client_id=self._setting('AZURE_CLIENT_ID'),
+            client_secret=self._setting('AZURE_CLIENT_SECRET')
         )
     
     def _test_credential(self):
         """Test the credential by making a simple API call"""
-        client = ResourceManagementClient(self.credential, self.subscription_id)
-        # Try to list resource groups to test the credential
-        list(client.resource_groups.list())
+        client = self._get_client("resource")
+        # One page of one resource group is enough to prove the credential works
+        with arm_call("resource_groups.list"):
+            list(next(client.resource_groups.list(top=1).by_page(), []))
+    
+    def ping(self) -> bool:
+        """Cheap connectivity check (a single ARM request) for readiness probes"""
+        try:
+            self._test_credential()
+            return True
+        except Exception as e:
+            self.logger.warning(f"Azure connectivity check failed: {e}")
+            return False
+    
+    def get_client(self, client_type: str):
+        """The management client of client_type ("compute", "network", ...), for calls this class does not wrap"""
+        return self._get_client(client_type)
     
     def _get_client(self, client_type: str):
         """Get or create an Azure management client"""
         if client_type not in self.clients:
+            # Count every 429, including the ones the SDK retries transparently
+            options = {'per_retry_policies': [ThrottleCountingPolicy()], **arm_client_options()}
             if client_type == "resource":
-                self.clients[client_type] = ResourceManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = ResourceManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "compute":
-                self.clients[client_type] = ComputeManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = ComputeManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "network":
-                self.clients[client_type] = NetworkManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = NetworkManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "storage":
-                self.clients[client_type] = StorageManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = StorageManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "web":
-                self.clients[client_type] = WebSiteManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = WebSiteManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "sql":
-                self.clients[client_type] = SqlManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = SqlManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "monitor":
-                self.clients[client_type] = MonitorManagementClient(self.credential, self.subscription_id)
+                self.clients[client_type] = MonitorManagementClient(self.credential, self.subscription_id, **options)
             elif client_type == "cost":
-                self.clients[client_type] = CostManagementClient(self.credential, self.subscription_id)
+                # Cost Management is scope-based; the subscription goes in the query scope
+                self.clients[client_type] = CostManagementClient(self.credential, **options)
         
         return self.clients[client_type]
     
+    def _iter_pages(self, operation: str, pager) -> Iterator[Any]:
+        """Yield items page by page, timing each page request as one ARM call"""
+        pages = pager.by_page()
+        while True:
+            with arm_call(operation):
+                page = next(pages, None)
+                items = [] if page is None else [item for item in page]
+            if page is None:
+                return
+            yield from items
+            if not pages.continuation_token:
+                return
+    
+    def iter_resource_groups(self) -> Iterator[Dict[str, Any]]:
+        """Stream resource groups as ARM pages arrive"""
+        client = self._get_client("resource")
+        for rg in self._iter_pages("resource_groups.list", client.resource_groups.list()):
+            yield format_resource_group(rg)
+    
     def list_resource_groups(self) -> List[Dict[str, Any]]:
         """List all resource groups in the subscription"""
         try:
-            client = self._get_client("resource")
-            resource_groups = []
-            
-            for rg in client.resource_groups.list():
-                resource_groups.append({
-                    'name': rg.name,
-                    'location': rg.location,
-                    'tags': rg.tags or {},
-                    'properties': {
-                        'provisioning_state': rg.properties.provisioning_state
-                    }
-                })
-            
-            return resource_groups
-            
+            return list(self.iter_resource_groups())
         except Exception as e:
             console.print(f"[bold red]Error listing resource groups: {str(e)}[/bold red]")
             return []
     
+    def iter_virtual_machines(self, resource_group: Optional[str] = None,
+                              power_state: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Stream virtual machines a page at a time, fetching each page's power states concurrently
+        
+        With power_state=False no instance views are fetched and power_state is None.
+        """
+        client = self._get_client("compute")
+        if resource_group:
+            items = self._iter_pages("virtual_machines.list", client.virtual_machines.list(resource_group))
+        else:
+            items = self._iter_pages("virtual_machines.list_all", client.virtual_machines.list_all())
+        
+        if not power_state:
+            for vm in items:
+                yield format_virtual_machine(vm, None)
+            return
+        
+        def with_power_state(vm):
+            try:
+                power_state = self._get_vm_power_state(client, vm.id.split('/')[4], vm.name)
+                return format_virtual_machine(vm, power_state)
+            except Exception as vm_error:
+                console.print(f"[yellow]Warning: Error processing VM {vm.name if hasattr(vm, 'name') else 'Unknown'}: {str(vm_error)}[/yellow]")
+                return None
+        
+        # Matches the requests connection pool size, so no connection is discarded
+        with ThreadPoolExecutor(max_workers=POWER_STATE_WORKERS) as executor:
+            page = []
+            for vm in items:
+                page.append(vm)
+                if len(page) >= POWER_STATE_BATCH:
+                    yield from filter(None, executor.map(with_power_state, page))
+                    page = []
+            yield from filter(None, executor.map(with_power_state, page))
+    
     def list_virtual_machines(self, resource_group: Optional[str] = None) -> List[Dict[str, Any]]:
         """List virtual machines"""
         try:
-            client = self._get_client("compute")
-            vms = []
-            
-            if resource_group:
-                vm_list = client.virtual_machines.list(resource_group)
-            else:
-                vm_list = client.virtual_machines.list_all()
-            
-            for vm in vm_list:
-                try:
-                    # Handle os_type properly - it can be a string or an object
-                    os_type = 'Unknown'
-                    if vm.storage_profile.os_disk.os_type:
-                        if hasattr(vm.storage_profile.os_disk.os_type, 'value'):
-                            os_type = vm.storage_profile.os_disk.os_type.value
-                        else:
-                            os_type = str(vm.storage_profile.os_disk.os_type)
-                    
-                    vms.append({
-                        'name': vm.name,
-                        'resource_group': vm.id.split('/')[4],
-                        'location': vm.location,
-                        'vm_size': vm.hardware_profile.vm_size,
-                        'os_type': os_type,
-                        'power_state': self._get_vm_power_state(client, vm.id.split('/')[4], vm.name),
-                        'tags': vm.tags or {}
-                    })
-                except Exception as vm_error:
-                    console.print(f"[yellow]Warning: Error processing VM {vm.name if hasattr(vm, 'name') else 'Unknown'}: {str(vm_error)}[/yellow]")
-                    continue
-            
-            return vms
-            
+            return list(self.iter_virtual_machines(resource_group))
         except Exception as e:
             console.print(f"[bold red]Error listing VMs: {str(e)}[/bold red]")
             return []
@@ -188,70 +350,198 @@ class AzureManager:
     def _get_vm_power_state(self, client, resource_group: str, vm_name: str) -> str:
         """Get VM power state"""
         try:
-            vm_instance = client.virtual_machines.get(resource_group, vm_name, expand='instanceView')
-            if vm_instance.instance_view and vm_instance.instance_view.statuses:
-                for status in vm_instance.instance_view.statuses:
-                    if status.code.startswith('PowerState/'):
-                        return status.code.split('/')[1]
-            return 'Unknown'
+            with arm_call("virtual_machines.get_instance_view"):
+                vm_instance = client.virtual_machines.get(resource_group, vm_name, expand='instanceView')
+            return power_state_from_instance_view(vm_instance)
         except:
             return 'Unknown'
     
+    def poll_vm_states(self, vms: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Current state of each (resource_group, vm_name), one ARM call per resource group
+
+        A resource group with several VMs is listed once with instance views instead
+        of reading each VM's instance view. Groups that fail are left out of the result.
+        """
+        client = self._get_client("compute")
+        groups: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        for resource_group, vm_name in vms:
+            groups.setdefault(resource_group.lower(), {})[vm_name.lower()] = (resource_group, vm_name)
+        
+        def poll(members):
+            (resource_group, vm_name), *others = members.values()
+            if not others:
+                with arm_call("virtual_machines.get_instance_view"):
+                    vm = client.virtual_machines.get(resource_group, vm_name, expand='instanceView')
+                return {(resource_group, vm_name): vm_state_from_instance_view(vm.instance_view)}
+            states = {}
+            pager = client.virtual_machines.list(resource_group, expand='instanceView')
+            for vm in self._iter_pages("virtual_machines.list_instance_view", pager):
+                key = members.get(vm.name.lower())
+                if key is not None:
+                    states[key] = vm_state_from_instance_view(vm.instance_view)
+            return states
+        
+        def poll_safely(members):
+            try:
+                return poll(members)
+            except Exception as e:
+                self.logger.warning(f"Polling VM state failed: {e}")
+                return {}
+        
+        states = {}
+        with ThreadPoolExecutor(max_workers=min(POWER_STATE_WORKERS, len(groups) or 1)) as executor:
+            for result in executor.map(poll_safely, groups.values()):
+                states.update(result)
+        return states
+    
+    def wait_for_state(self, vms: Iterable[Tuple[str, str]],
+                       predicate: Union[str, Callable[[Dict[str, Any]], bool]] = vm_running,
+                       timeout: float = 600,
+                       on_change: Optional[Callable[[Tuple[str, str], Dict[str, Any]], None]] = None
+                       ) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Wait until every (resource_group, vm_name) satisfies predicate, or timeout seconds pass
+        
+        predicate gets a state dict (power_state, provisioning_state, agent_status) and
+        may also be a power state name such as 'deallocated'. Each VM stops being polled
+        as soon as it matches; on_change is called whenever a VM's observed state changes.
+        
+        Returns:
+            (resource_group, vm_name) -> last state plus ready (bool) and seconds
+            (time until it matched, None if it never did)
+        """
+        check = (lambda state: state['power_state'] == predicate) if isinstance(predicate, str) else predicate
+        pending = {*vms}
+        start = time.monotonic()
+        deadline = start + timeout
+        interval = WAIT_INITIAL_INTERVAL
+        states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        
+        while pending:
+            changed = False
+            for key, state in self.poll_vm_states([*pending]).items():
+                if states.get(key) != state:
+                    changed = True
+                    states[key] = state
+                    if on_change is not None:
+                        on_change(key, state)
+                if check(state):
+                    results[key] = dict(state, ready=True, seconds=round(time.monotonic() - start, 2))
+                    pending.discard(key)
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            if changed:
+                # Something is moving; the next transition is likely close
+                interval = WAIT_INITIAL_INTERVAL
+            time.sleep(min(interval * random.uniform(1 - WAIT_JITTER, 1 + WAIT_JITTER), remaining))
+            interval = min(interval * WAIT_BACKOFF, WAIT_MAX_INTERVAL)
+        
+        unknown = {'power_state': 'Unknown', 'provisioning_state': None, 'agent_status': None}
+        for key in pending:
+            results[key] = dict(states.get(key, unknown), ready=False, seconds=None)
+        return results
+    
+    def iter_storage_accounts(self, resource_group: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream storage accounts as ARM pages arrive"""
+        client = self._get_client("storage")
+        if resource_group:
+            items = self._iter_pages("storage_accounts.list_by_resource_group",
+                                     client.storage_accounts.list_by_resource_group(resource_group))
+        else:
+            items = self._iter_pages("storage_accounts.list", client.storage_accounts.list())
+        for account in items:
+            yield format_storage_account(account)
+    
     def list_storage_accounts(self, resource_group: Optional[str] = None) -> List[Dict[str, Any]]:
         """List storage accounts"""
         try:
-            client = self._get_client("storage")
-            accounts = []
-            
-            if resource_group:
-                account_list = client.storage_accounts.list_by_resource_group(resource_group)
-            else:
-                account_list = client.storage_accounts.list()
-            
-            for account in account_list:
-                accounts.append({
-                    'name': account.name,
-                    'resource_group': account.id.split('/')[4],
-                    'location': account.location,
-                    'sku': account.sku.name,
-                    'kind': account.kind,
-                    'status': account.status_of_primary,
-                    'tags': account.tags or {}
-                })
-            
-            return accounts
-            
+            return list(self.iter_storage_accounts(resource_group))
         except Exception as e:
             console.print(f"[bold red]Error listing storage accounts: {str(e)}[/bold red]")
             return []
     
+    def iter_web_apps(self, resource_group: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream web apps as ARM pages arrive"""
+        client = self._get_client("web")
+        if resource_group:
+            items = self._iter_pages("web_apps.list_by_resource_group", client.web_apps.list_by_resource_group(resource_group))
+        else:
+            items = self._iter_pages("web_apps.list", client.web_apps.list())
+        for app in items:
+            yield format_web_app(app)
+    
     def list_web_apps(self, resource_group: Optional[str] = None) -> List[Dict[str, Any]]:
         """List web apps"""
         try:
-            client = self._get_client("web")
-            apps = []
-            
-            if resource_group:
-                app_list = client.web_apps.list_by_resource_group(resource_group)
-            else:
-                app_list = client.web_apps.list()
+            return list(self.iter_web_apps(resource_group))
+        except Exception as e:
+            console.print(f"[bold red]Error listing web apps: {str(e)}[/bold red]")
+            return []
+    
+    def get_vm_metrics(self, vms: Optional[List[Dict[str, Any]]] = None, hours: int = 1,
+                       window_minutes: int = 15, summary: bool = True) -> Dict[str, Any]:
+        """
+        Get CPU, network and disk metrics for virtual machines
+
+        Args:
+            vms: VM dicts from list_virtual_machines (listed if omitted)
+            hours: lookback period
+            window_minutes: aggregation window for p50/p95/max
+            summary: return only the most recent window per metric
+
+        Returns:
+            dict keyed by VM ID
+        """
+        try:
+            if self.metrics_collector is None:
+                self.metrics_collector = VMMetricsCollector(
+                    self._get_client("monitor"),
+                    ttl_seconds=int(os.getenv('AZURE_METRICS_TTL', '300'))
+                )
             
-            for app in app_list:
-                apps.append({
-                    'name': app.name,
-                    'resource_group': app.id.split('/')[4],
-                    'location': app.location,
-                    'state': app.state,
-                    'host_names': app.host_names,
-                    'default_host_name': app.default_host_name,
-                    'tags': app.tags or {}
-                })
+            if vms is None:
+                vms = self.list_virtual_machines()
+            vm_ids = [vm['id'] for vm in vms if vm.get('id')]
             
-            return apps
+            results = self.metrics_collector.collect(vm_ids, hours=hours, window_minutes=window_minutes)
+            return latest_summary(results) if summary else results
             
         except Exception as e:
-            console.print(f"[bold red]Error listing web apps: {str(e)}[/bold red]")
-            return []
+            console.print(f"[bold red]Error getting VM metrics: {str(e)}[/bold red]")
+            return {}
+    
+    def get_cost_engine(self) -> CostEngine:
+        """Get or create the cost engine backed by the local cost store"""
+        if self.cost_engine is None:
+            self.cost_engine = CostEngine(self._get_client("cost"), self.subscription_id)
+        return self.cost_engine
+    
+    def get_cost_summary(self) -> Dict[str, Any]:
+        """Get month-to-date and forecast cost from the local store"""
+        try:
+            return self.get_cost_engine().summary()
+        except Exception as e:
+            console.print(f"[bold red]Error getting cost summary: {str(e)}[/bold red]")
+            return {}
+    
+    def estimate_monthly_cost(self, vms: List[Dict[str, Any]], storage_accounts: List[Dict[str, Any]],
+                              web_apps: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Estimate monthly cost from the local price sheet (None if no sheet is configured)"""
+        try:
+            sheet = get_price_sheet()
+            if sheet is None:
+                return None
+            return estimate_inventory(sheet, {
+                'vm': vms,
+                'storage': storage_accounts,
+                'webapp': web_apps
+            })
+        except Exception as e:
+            console.print(f"[bold red]Error estimating cost: {str(e)}[/bold red]")
+            return None
     
     def get_subscription_info(self) -> Dict[str, Any]:
         """Get subscription information"""
@@ -373,6 +663,15 @@ class AzureManager:
             console.print(table)
             if len(web_apps) > 10:
                 console.print(f"[dim]... and {len(web_apps) - 10} more web apps[/dim]")
+        
+        # Estimated cost from the offline price sheet
+        estimate = self.estimate_monthly_cost(vms, storage_accounts, web_apps)
+        if estimate:
+            console.print(f"\n[bold]Estimated Monthly Cost:[/bold] {estimate['total']:,.2f} {estimate['currency']} "
+                          f"(VMs {estimate['by_type']['vm']:,.2f}, Storage {estimate['by_type']['storage']:,.2f}, "
+                          f"Web Apps {estimate['by_type']['webapp']:,.2f})")
+            if estimate['unpriced']:
+                console.print(f"[dim]{estimate['unpriced']} resources have no price sheet entry[/dim]")
 
 if __name__ == "__main__":
     # Example usage
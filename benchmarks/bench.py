@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Runs AzureManager, the web API, the CLI listings and the AVD deploy scripts against
+fake_arm.py, reporting wall time, ARM call count and peak RSS against stored baselines
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import subprocess
+import urllib.request
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_arm
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Synthetic tenant sizes
+PROFILES = {
+    'small': {'resource_groups': 5, 'vms': 100, 'storage_accounts': 20, 'web_apps': 20},
+    'medium': {'resource_groups': 20, 'vms': 1000, 'storage_accounts': 200, 'web_apps': 200},
+    'large': {'resource_groups': 100, 'vms': 10000, 'storage_accounts': 2000, 'web_apps': 2000}
+}
+
+# Cases run in a fresh interpreter so peak RSS is per case; 'cli' cases run the real entry point
+CASES = {
+    'list_vms': {'kind': 'inprocess'},
+    'api_dashboard': {'kind': 'inprocess'},
+    'cli_list_vms': {'kind': 'cli', 'args': ['azure_cli.py', 'list', 'vms']},
+    'cli_list_storage': {'kind': 'cli', 'args': ['azure_cli.py', 'list', 'storage']},
+    'cli_list_webapps': {'kind': 'cli', 'args': ['azure_cli.py', 'list', 'webapps']},
+    'cli_list_resourcegroups': {'kind': 'cli', 'args': ['azure_cli.py', 'list', 'resourcegroups']},
+    # Before the deploy cases, whose NICs reference VNets they never create
+    'network_topology': {'kind': 'inprocess'},
+    'avd_deploy': {'kind': 'inprocess'},
+    'avd_deploy_converged': {'kind': 'inprocess'},
+    'avd_deploy_template': {'kind': 'inprocess'},
+    'session_hosts_serial': {'kind': 'inprocess'},
+    'session_hosts': {'kind': 'inprocess'},
+    'run_command_serial': {'kind': 'inprocess'},
+    'run_command_fleet': {'kind': 'inprocess'},
+    'public_ip_serial': {'kind': 'inprocess'},
+    'public_ip_bulk': {'kind': 'inprocess'}
+}
+
+# Session host cases deploy this many hosts; use --provision-ms to make VM creation take time
+SESSION_HOSTS = 8
+
+# Regression thresholds relative to the baseline
+WALL_TOLERANCE = 0.5
+RSS_TOLERANCE = 0.25
+
+console = Console()
+
+
+def _fake_env(endpoint: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'AZURE_ARM_ENDPOINT': endpoint,
+        'AZURE_SUBSCRIPTION_ID': fake_arm.DEFAULT_SUBSCRIPTION_ID,
+        'AZURE_TENANT_ID': 'fake',
+        'AZURE_CLIENT_ID': 'fake',
+        'AZURE_CLIENT_SECRET': 'fake',
+        'AZURE_PRICE_SHEET': os.path.join(ROOT, 'price_sheet.example.csv'),
+        'AZURE_COST_DB': os.path.join(ROOT, 'benchmarks', '.bench_cost_cache.db'),
+        'PYTHONUNBUFFERED': '1'
+    })
+    return env
+
+
+def _reset_fake_stats():
+    urllib.request.urlopen(f"{os.environ['AZURE_ARM_ENDPOINT']}/_fake/reset", data=b'').read()
+
+
+def _quiet_logging():
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('azure').setLevel(logging.WARNING)
+
+
+def run_inprocess_case(name: str) -> float:
+    """Run one in-process case inside this (child) interpreter and return its wall time"""
+    if name == 'list_vms':
+        from azure_manager import AzureManager
+        manager = AzureManager()
+        _quiet_logging()
+        manager.authenticate('service_principal')
+        _reset_fake_stats()
+        start = time.perf_counter()
+        manager.list_virtual_machines()
+        return time.perf_counter() - start
+
+    if name == 'api_dashboard':
+        import app as web_app
+        _quiet_logging()
+        # Let the readiness prober's first check (authentication + ping) finish before counting
+        while web_app.readiness_prober.state()['checked_at'] is None:
+            time.sleep(0.01)
+        _reset_fake_stats()
+        client = web_app.app.test_client()
+        start = time.perf_counter()
+        response = client.get('/api/dashboard')
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/dashboard returned {response.status_code}")
+        return elapsed
+
+    if name in ('avd_deploy', 'avd_deploy_converged'):
+        from deploy_avd import AVDDeployer
+        _quiet_logging()
+        deployer = AVDDeployer()
+        deployer.resource_group_name = f"bench-{name}"
+        if name == 'avd_deploy_converged':
+            # Only the second, already converged run is measured; it should make no writes
+            deployer.deploy_avd_infrastructure()
+        _reset_fake_stats()
+        start = time.perf_counter()
+        deployer.deploy_avd_infrastructure()
+        return time.perf_counter() - start
+
+    if name == 'avd_deploy_template':
+        from deploy_avd import AVDDeployer
+        _quiet_logging()
+        deployer = AVDDeployer()
+        deployer.resource_group_name = f"bench-{name}"
+        _reset_fake_stats()
+        start = time.perf_counter()
+        deployer.deploy_template()
+        return time.perf_counter() - start
+
+    if name in ('session_hosts_serial', 'session_hosts'):
+        from deploy_vms_sdk import deploy_session_hosts, DEFAULT_PARALLELISM
+        _quiet_logging()
+        _reset_fake_stats()
+        start = time.perf_counter()
+        # A resource group per case, so neither case finds the other's hosts already created
+        results = deploy_session_hosts(SESSION_HOSTS, 1 if name == 'session_hosts_serial' else DEFAULT_PARALLELISM,
+                                       resource_group=f"bench-{name}")
+        elapsed = time.perf_counter() - start
+        if any(result['status'] != 'succeeded' for result in results):
+            raise RuntimeError(f"{name}: session host deployment failed")
+        return elapsed
+
+    if name in ('run_command_serial', 'run_command_fleet'):
+        from azure_manager import AzureManager, arm_client_options
+        from azure.mgmt.compute import ComputeManagementClient
+        from run_command import RunCommandEngine, DEFAULT_PARALLELISM, select_vms
+        _quiet_logging()
+        manager = AzureManager()
+        manager.authenticate('service_principal')
+        compute_client = ComputeManagementClient(manager.credential, manager.subscription_id, **arm_client_options())
+        # Every VM of the first resource group, started so none is rejected for not running
+        vm_names = select_vms(compute_client, 'rg-0000', match='*')
+        for vm_name in vm_names:
+            compute_client.virtual_machines.begin_start('rg-0000', vm_name).result()
+        engine = RunCommandEngine(compute_client, 'rg-0000', 'Write-Output "bench"', name=name, report_file='',
+                                  parallelism=1 if name == 'run_command_serial' else DEFAULT_PARALLELISM)
+        _reset_fake_stats()
+        start = time.perf_counter()
+        results = engine.run(vm_names)
+        elapsed = time.perf_counter() - start
+        if any(result['status'] != 'succeeded' for result in results.values()):
+            raise RuntimeError(f"{name}: run command failed")
+        return elapsed
+
+    if name == 'network_topology':
+        from azure_manager import AzureManager, arm_client_options
+        from azure.mgmt.compute import ComputeManagementClient
+        from azure.mgmt.network import NetworkManagementClient
+        from network_topology import load_topology
+        _quiet_logging()
+        manager = AzureManager()
+        manager.authenticate('service_principal')
+        compute_client = ComputeManagementClient(manager.credential, manager.subscription_id, **arm_client_options())
+        network_client = NetworkManagementClient(manager.credential, manager.subscription_id, **arm_client_options())
+        _reset_fake_stats()
+        start = time.perf_counter()
+        # The whole subscription, and every VM's network resolved from it
+        topology = load_topology(compute_client, network_client)
+        networks = [topology.vm_network(key) for key in topology.vms]
+        elapsed = time.perf_counter() - start
+        if any(nic.get('missing') for network in networks for nic in network['nics']):
+            raise RuntimeError(f"{name}: unresolved NICs")
+        return elapsed
+
+    if name in ('public_ip_serial', 'public_ip_bulk'):
+        from azure_manager import AzureManager, arm_client_options
+        from azure.mgmt.network import NetworkManagementClient
+        from bulk_public_ip import BulkPublicIp, DEFAULT_ATTACH_PARALLELISM, DEFAULT_PARALLELISM, FAILED
+        _quiet_logging()
+        manager = AzureManager()
+        manager.authenticate('service_principal')
+        network_client = NetworkManagementClient(manager.credential, manager.subscription_id, **arm_client_options())
+        # A resource group per case, so neither finds the other's public IPs; VMs without one get one
+        resource_group = 'rg-0001' if name == 'public_ip_serial' else 'rg-0002'
+        vm_names = sorted(nic.virtual_machine.id.split('/')[-1]
+                          for nic in network_client.network_interfaces.list(resource_group) if nic.virtual_machine)
+        serial = name == 'public_ip_serial'
+        bulk = BulkPublicIp(network_client, resource_group, parallelism=1 if serial else DEFAULT_PARALLELISM,
+                            attach_parallelism=1 if serial else DEFAULT_ATTACH_PARALLELISM)
+        _reset_fake_stats()
+        start = time.perf_counter()
+        results = bulk.allocate(vm_names)
+        elapsed = time.perf_counter() - start
+        if any(result['status'] == FAILED for result in results.values()):
+            raise RuntimeError(f"{name}: public IP allocation failed")
+        return elapsed
+
+    raise ValueError(f"Unknown case: {name}")
+
+
+def measure(name: str, server: fake_arm.FakeArmServer) -> dict:
+    """Run a case in a child process and collect wall time, ARM calls and peak RSS"""
+    case = CASES[name]
+    env = _fake_env(server.endpoint)
+    result_file = os.path.join(ROOT, 'benchmarks', f".result-{name}.json")
+    env['BENCH_RESULT_FILE'] = result_file
+    server.reset_stats()
+
+    if case['kind'] == 'cli':
+        command = [sys.executable] + case['args']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--run-case', name]
+
+    # stderr goes to a file: SDK logging can fill a pipe and block the child while we wait4()
+    with tempfile.TemporaryFile() as stderr_file:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=stderr_file)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+
+    if process.returncode != 0:
+        raise RuntimeError(f"{name} failed with exit code {process.returncode}:\n{stderr[-2000:]}")
+
+    if case['kind'] != 'cli':
+        with open(result_file) as f:
+            wall = json.load(f)['wall_seconds']
+        os.remove(result_file)
+
+    stats = server.snapshot_stats()
+    return {
+        'wall_seconds': round(wall, 3),
+        'arm_calls': stats['requests'],
+        'throttled': stats['throttled'],
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1)
+    }
+
+
+def compare(result: dict, baseline: dict) -> list:
+    """Return human-readable regressions of result against baseline"""
+    regressions = []
+    if result['arm_calls'] > baseline['arm_calls']:
+        regressions.append(f"ARM calls {baseline['arm_calls']} -> {result['arm_calls']}")
+    if result['wall_seconds'] > baseline['wall_seconds'] * (1 + WALL_TOLERANCE):
+        regressions.append(f"wall {baseline['wall_seconds']}s -> {result['wall_seconds']}s")
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + RSS_TOLERANCE):
+        regressions.append(f"RSS {baseline['peak_rss_mb']}MB -> {result['peak_rss_mb']}MB")
+    return regressions
+
+
+@click.command()
+@click.option('--profile', type=click.Choice(list(PROFILES)), default='small', help='Synthetic tenant size')
+@click.option('--case', 'cases', multiple=True, type=click.Choice(list(CASES)), help='Cases to run (default: all)')
+@click.option('--latency-ms', default=0.0, help='Latency injected by the fake ARM server')
+@click.option('--throttle-rate', default=0.0, help='Fraction of fake ARM requests answered with 429')
+@click.option('--provision-ms', default=0.0, help='Time the fake ARM server keeps new resources provisioning')
+@click.option('--check', is_flag=True, help='Exit non-zero if a case regresses against the baseline')
+@click.option('--update-baselines', is_flag=True, help='Store these results as the new baselines')
+@click.option('--run-case', hidden=True, help='Internal: run one in-process case in this interpreter')
+def main(profile, cases, latency_ms, throttle_rate, provision_ms, check, update_baselines, run_case):
+    """Benchmark the tool against a local fake ARM server"""
+    if run_case:
+        wall = run_inprocess_case(run_case)
+        with open(os.environ['BENCH_RESULT_FILE'], 'w') as f:
+            json.dump({'wall_seconds': wall}, f)
+        return
+
+    server = fake_arm.start_server(latency_ms=latency_ms, throttle_rate=throttle_rate, provision_ms=provision_ms,
+                                   **PROFILES[profile])
+    baselines = {}
+    if os.path.exists(BASELINES_FILE):
+        with open(BASELINES_FILE) as f:
+            baselines = json.load(f)
+    # Baselines are only comparable for the same tenant shape and injection settings
+    baseline_key = f"{profile}/latency={latency_ms:g}ms/throttle={throttle_rate:g}"
+    if provision_ms:
+        baseline_key += f"/provision={provision_ms:g}ms"
+    profile_baselines = baselines.get(baseline_key, {})
+
+    table = Table(title=f"Benchmarks ({baseline_key}, {PROFILES[profile]['vms']} VMs)")
+    table.add_column("Case", style="cyan")
+    table.add_column("Wall (s)", style="green", justify="right")
+    table.add_column("ARM calls", style="magenta", justify="right")
+    table.add_column("429s", style="yellow", justify="right")
+    table.add_column("Peak RSS (MB)", style="blue", justify="right")
+    table.add_column("vs baseline", style="red")
+
+    results = {}
+    failed = False
+    try:
+        for name in cases or CASES:
+            with console.status(f"[bold green]Running {name}..."):
+                result = measure(name, server)
+            results[name] = result
+            regressions = compare(result, profile_baselines[name]) if name in profile_baselines else []
+            failed = failed or bool(regressions)
+            table.add_row(
+                name,
+                f"{result['wall_seconds']:.3f}",
+                str(result['arm_calls']),
+                str(result['throttled']),
+                f"{result['peak_rss_mb']:.1f}",
+                "; ".join(regressions) if regressions else ("ok" if name in profile_baselines else "no baseline")
+            )
+    finally:
+        server.shutdown()
+
+    console.print(table)
+
+    if update_baselines:
+        baselines.setdefault(baseline_key, {}).update(results)
+        with open(BASELINES_FILE, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        console.print(f"[green]✓ Baselines updated: {BASELINES_FILE}[/green]")
+
+    if check and failed:
+        console.print("[bold red]✗ Benchmark regression detected[/bold red]")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
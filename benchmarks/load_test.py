@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Serving Mode Load Test
+Hammers /api/dashboard on the sync (gunicorn + Flask) and async (uvicorn + ASGI)
+serving modes, both backed by the same fake ARM server, and compares throughput and latency
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import subprocess
+import urllib.request
+
+import aiohttp
+import click
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_arm
+
+# Each mode is given the same number of processes
+MODES = {
+    'sync': lambda workers: ['gunicorn', '--workers', str(workers), 'app:app'],
+    'async': lambda workers: ['gunicorn', '--workers', str(workers), '-k', 'uvicorn.workers.UvicornWorker', 'asgi_app:app']
+}
+
+console = Console()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=timeout).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def _user(session: aiohttp.ClientSession, url: str, deadline: float, latencies: list, errors: list):
+    """One simulated user issuing dashboard requests back to back until the deadline"""
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors.append(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            errors.append(type(e).__name__)
+
+
+async def _run_load(url: str, users: int, duration: float, timeout: float):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(_user(session, url, deadline, latencies, errors) for _ in range(users)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def run_mode(mode: str, workers: int, arm_endpoint: str, users: int, duration: float, timeout: float) -> dict:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        'AZURE_ARM_ENDPOINT': arm_endpoint,
+        'AZURE_SUBSCRIPTION_ID': fake_arm.DEFAULT_SUBSCRIPTION_ID,
+        'AZURE_TENANT_ID': 'fake',
+        'AZURE_CLIENT_ID': 'fake',
+        'AZURE_CLIENT_SECRET': 'fake',
+        'AZURE_PRICE_SHEET': os.path.join(ROOT, 'price_sheet.example.csv')
+    })
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    command = MODES[mode](workers) + ['--bind', f"127.0.0.1:{port}", '--timeout', str(int(timeout) + 30)]
+
+    with open(os.devnull, 'w') as devnull:
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=devnull, stderr=devnull)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            _wait_for(f"{base}/dashboard")
+            # Warm up: authenticate every worker's manager before measuring
+            for _ in range(workers):
+                urllib.request.urlopen(f"{base}/api/dashboard", timeout=timeout).read()
+            latencies, errors, elapsed = asyncio.run(_run_load(f"{base}/api/dashboard", users, duration, timeout))
+        finally:
+            server.terminate()
+            server.wait()
+
+    result = {'requests': len(latencies), 'errors': len(errors), 'rps': len(latencies) / elapsed}
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        result.update({'p50': p50, 'p95': p95, 'max': max(latencies)})
+    return result
+
+
+@click.command()
+@click.option('--users', default=200, help='Concurrent simulated users')
+@click.option('--duration', default=30.0, help='Seconds of load per mode')
+@click.option('--workers', default=4, help='Server processes per mode')
+@click.option('--vms', default=10, help='VMs in the fake tenant (one instance-view call each)')
+@click.option('--latency-ms', default=200.0, help='Latency injected by the fake ARM server')
+@click.option('--timeout', default=60.0, help='Client timeout per request in seconds')
+@click.option('--mode', 'modes', multiple=True, type=click.Choice(list(MODES)), help='Modes to run (default: both)')
+def main(users, duration, workers, vms, latency_ms, timeout, modes):
+    """Compare dashboard throughput of the sync and async serving modes"""
+    # The fake ARM server gets its own process so it doesn't compete with the load generator for the GIL
+    arm_port = _free_port()
+    arm_endpoint = f"http://127.0.0.1:{arm_port}"
+    arm = subprocess.Popen(
+        [sys.executable, 'fake_arm.py', '--port', str(arm_port), '--vms', str(vms), '--storage-accounts', '5',
+         '--web-apps', '5', '--latency-ms', str(latency_ms)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _wait_for(f"{arm_endpoint}/_fake/stats")
+
+    table = Table(title=f"/api/dashboard, {users} users, {workers} workers, {vms} VMs, ARM latency {latency_ms:g}ms")
+    table.add_column("Mode", style="cyan")
+    table.add_column("Requests", justify="right")
+    table.add_column("Errors", style="red", justify="right")
+    table.add_column("Req/s", style="green", justify="right")
+    table.add_column("p50 (s)", justify="right")
+    table.add_column("p95 (s)", justify="right")
+    table.add_column("Max (s)", justify="right")
+
+    try:
+        for mode in modes or MODES:
+            with console.status(f"[bold green]Loading {mode} mode for {duration:g}s..."):
+                result = run_mode(mode, workers, arm_endpoint, users, duration, timeout)
+            table.add_row(
+                mode,
+                str(result['requests']),
+                str(result['errors']),
+                f"{result['rps']:.1f}",
+                f"{result.get('p50', 0):.2f}",
+                f"{result.get('p95', 0):.2f}",
+                f"{result.get('max', 0):.2f}"
+            )
+    finally:
+        arm.terminate()
+        arm.wait()
+
+    console.print(table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Bulk Public IP
+Creates public IPs for many VMs at once and attaches them to the VMs' NICs, or
+detaches and deletes them, retrying the NIC updates ARM turns away while another
+operation on the NIC or its VNet is in flight
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import click
+from azure.core.exceptions import HttpResponseError
+from azure.identity import ClientSecretCredential
+from azure.mgmt.compute import ComputeManagementClient
+from azure.mgmt.network import NetworkManagementClient
+from azure.mgmt.network.models import PublicIPAddress
+from dotenv import load_dotenv
+
+from azure_manager import arm_client_options
+from run_command import parse_tags, select_vms
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Public IP creates and deletes don't contend with each other
+DEFAULT_PARALLELISM = 20
+# NIC updates in one VNet do: ARM serialises them and turns the rest away with AnotherOperationInProgress
+DEFAULT_ATTACH_PARALLELISM = 5
+MAX_ATTEMPTS = 6
+BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+
+# Public IP settings of add_public_ip.py (Basic) and add_standard_public_ip.py (Standard)
+SKUS = {
+    'Basic': {'public_ip_allocation_method': 'Dynamic', 'idle_timeout_in_minutes': 4},
+    'Standard': {'sku': {'name': 'Standard'}, 'public_ip_allocation_method': 'Static', 'idle_timeout_in_minutes': 4}
+}
+
+# Errors that clear up once the competing operation finishes (412: the NIC changed since it was read)
+RETRYABLE_CODES = {'AnotherOperationInProgress', 'RetryableError', 'ReferencedResourceNotProvisioned',
+                   'PreconditionFailed'}
+# A public IP is still "in use" for a moment after its NIC lets go of it
+DELETE_RETRYABLE_CODES = RETRYABLE_CODES | {'PublicIPAddressCannotBeDeleted', 'InUseCannotBeDeleted'}
+
+ATTACHED = 'attached'
+DETACHED = 'detached'
+DELETED = 'deleted'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+
+def public_ip_name(vm_name: str) -> str:
+    return f"{vm_name}-pip"
+
+
+def _resource_group(resource_id: str) -> str:
+    return resource_id.split('/')[4]
+
+
+def is_retryable(error: Exception, codes: set = RETRYABLE_CODES) -> bool:
+    if not isinstance(error, HttpResponseError):
+        return False
+    return error.status_code in (412, 429) or (getattr(error.error, 'code', None) or '') in codes
+
+
+def _primary_config(nic):
+    configs = nic.ip_configurations or []
+    return next((config for config in configs if config.primary), configs[0] if configs else None)
+
+
+class BulkPublicIp:
+    """
+    Attaches a public IP to the primary NIC of many VMs, or removes them again
+
+    Each VM is handled by one of parallelism workers: its public IP is created
+    (or deleted) straight away, while NIC updates, which ARM serialises per
+    VNet, are limited to attach_parallelism at a time. A NIC update re-reads
+    the NIC on every retry and sends its etag, so a concurrent change is never
+    overwritten. Conflicts (AnotherOperationInProgress, 412, 429) are retried
+    with jittered exponential backoff, up to max_attempts per step.
+
+    Both directions are idempotent: a NIC that already has a public IP is
+    left alone, and an unattached {vm}-pip from an earlier run is reused by
+    allocate() or deleted by release(), so re-running after a partial
+    failure only does what is left.
+    """
+
+    def __init__(self, network_client, resource_group: str, sku: str = 'Standard',
+                 parallelism: int = DEFAULT_PARALLELISM, attach_parallelism: int = DEFAULT_ATTACH_PARALLELISM,
+                 max_attempts: int = MAX_ATTEMPTS, backoff: float = BACKOFF_SECONDS,
+                 sleep: Callable[[float], None] = time.sleep):
+        if sku not in SKUS:
+            raise ValueError(f"Unknown public IP SKU: {sku} (expected {', '.join(SKUS)})")
+        self.network_client = network_client
+        self.resource_group = resource_group
+        self.sku = sku
+        self.parallelism = max(1, parallelism)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.sleep = sleep
+        self._nic_slots = threading.BoundedSemaphore(max(1, attach_parallelism))
+        # VMs the current allocate() or release() is working on
+        self.pending = []
+
+    def nics_for(self, vm_names: Iterable[str]) -> Dict[str, Any]:
+        """Primary NIC of each VM in vm_names, from one listing of the resource group's NICs"""
+        wanted = {name.lower(): name for name in vm_names}
+        nics = {}
+        for nic in self.network_client.network_interfaces.list(self.resource_group):
+            if nic.virtual_machine is None:
+                continue
+            vm_name = wanted.get(nic.virtual_machine.id.split('/')[-1].lower())
+            if vm_name and (vm_name not in nics or nic.primary):
+                nics[vm_name] = nic
+        return nics
+
+    # Retries
+
+    def _retry(self, operation: Callable[[], Any], codes: set = RETRYABLE_CODES) -> Tuple[Any, int]:
+        """(result of operation(), retries it took)"""
+        attempt = 1
+        while True:
+            try:
+                return operation(), attempt - 1
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_retryable(e, codes):
+                    raise
+                delay = min(MAX_BACKOFF_SECONDS, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                retry_after = e.response.headers.get('Retry-After') if e.response is not None else None
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                logger.info(f"Retrying in {delay:.1f}s after {getattr(e.error, 'code', None) or e.status_code}")
+                self.sleep(delay)
+                attempt += 1
+
+    def _update_nic(self, nic, change: Callable[[Any], bool]) -> Tuple[Any, int]:
+        """
+        PUT the NIC after change(nic) edits it; the listed NIC is used first
+        and re-read before each retry. Returns (NIC, retries); no PUT is made
+        if change returns False.
+        """
+        latest = [nic]
+
+        def update():
+            current = latest[0] or self.network_client.network_interfaces.get(_resource_group(nic.id), nic.name)
+            latest[0] = None
+            if not change(current):
+                return current
+            headers = {'If-Match': current.etag} if current.etag else {}
+            return self.network_client.network_interfaces.begin_create_or_update(
+                _resource_group(nic.id), current.name, current, headers=headers
+            ).result()
+
+        with self._nic_slots:
+            return self._retry(update)
+
+    # Operations
+
+    def _run(self, vm_names: Iterable[str], handle: Callable[[Any, Dict[str, Any]], None],
+             on_result: Optional[Callable[[str, Dict[str, Any]], None]]) -> Dict[str, Dict[str, Any]]:
+        vm_names = [*dict.fromkeys(vm_names)]
+        self.pending = vm_names
+        nics = self.nics_for(vm_names)
+
+        def run(vm_name):
+            result = {'status': FAILED, 'nic': None, 'public_ips': [], 'kept': [], 'ip_address': None,
+                      'retries': 0, 'error': None, 'seconds': None}
+            start = time.perf_counter()
+            try:
+                nic = nics.get(vm_name)
+                if nic is None:
+                    raise LookupError(f"No NIC attached to {vm_name} in {self.resource_group}")
+                result['nic'] = nic.name
+                handle(nic, result)
+            except Exception as e:
+                # SDK errors repeat the code and message on extra lines; the first line has both
+                result['error'] = str(e).splitlines()[0] if str(e) else repr(e)
+            result['seconds'] = round(time.perf_counter() - start, 2)
+            if on_result is not None:
+                on_result(vm_name, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.parallelism, len(vm_names) or 1),
+                                thread_name_prefix='public-ip') as executor:
+            return dict(zip(vm_names, executor.map(run, vm_names)))
+
+    def allocate(self, vm_names: Iterable[str],
+                 on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Give the primary NIC of every VM in vm_names a public IP named {vm}-pip
+
+        A NIC that already has a public IP is left unchanged, unless this
+        allocates Standard IPs and that one is Basic: then the VM fails, since
+        it would not get the Standard IP it was asked for.
+
+        Returns:
+            VM name -> status (attached, unchanged if the NIC already had a
+            public IP, or failed), nic, public_ips, ip_address, retries,
+            error and seconds
+        """
+        public_ips = self.network_client.public_ip_addresses
+        existing = {pip.name.lower(): pip for pip in public_ips.list(self.resource_group)}
+
+        def allocate_one(nic, result):
+            config = _primary_config(nic)
+            if config is None:
+                raise LookupError(f"NIC {nic.name} has no IP configuration")
+            if config.public_ip_address is not None:
+                pip_id = config.public_ip_address.id
+                name = pip_id.split('/')[-1]
+                pip = existing.get(name.lower()) if _resource_group(pip_id).lower() == self.resource_group.lower() \
+                    else public_ips.get(_resource_group(pip_id), name)
+                # Basic public IPs have no SKU set or sku.name Basic
+                pip_sku = pip.sku.name if pip is not None and pip.sku is not None else 'Basic'
+                if self.sku == 'Standard' and pip is not None and pip_sku != 'Standard':
+                    result['public_ips'] = [name]
+                    detach = 'bulk_public_ip.py detach' + (
+                        '' if name == public_ip_name(nic.virtual_machine.id.split('/')[-1]) else ' --all-public-ips')
+                    raise RuntimeError(f"NIC {nic.name} already has {pip_sku} SKU public IP {name}; "
+                                       f"detach it first ({detach})")
+                result.update(status=UNCHANGED, public_ips=[name], ip_address=pip.ip_address if pip else None)
+                return
+
+            name = public_ip_name(nic.virtual_machine.id.split('/')[-1])
+            pip = existing.get(name.lower())
+            if pip is not None and pip.ip_configuration is not None:
+                raise RuntimeError(f"Public IP {name} is already attached to {pip.ip_configuration.id}")
+            if pip is None:
+                pip, retries = self._retry(lambda: public_ips.begin_create_or_update(
+                    self.resource_group, name, {'location': nic.location, **SKUS[self.sku]}
+                ).result())
+                result['retries'] += retries
+
+            def attach(current):
+                current_config = _primary_config(current)
+                if current_config.public_ip_address is not None:
+                    raise RuntimeError(f"NIC {current.name} was given public IP "
+                                       f"{current_config.public_ip_address.id.split('/')[-1]} meanwhile; {name} left unattached")
+                current_config.public_ip_address = PublicIPAddress(id=pip.id)
+                return True
+
+            _, retries = self._update_nic(nic, attach)
+            result['retries'] += retries
+            # Dynamic addresses are only allocated once attached
+            address = pip.ip_address or public_ips.get(self.resource_group, name).ip_address
+            result.update(status=ATTACHED, public_ips=[name], ip_address=address)
+
+        return self._run(vm_names, allocate_one, on_result)
+
+    def release(self, vm_names: Iterable[str], delete: bool = True, all_public_ips: bool = False,
+                on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Detach {vm}-pip from the primary IP configuration of each VM's primary
+        NIC and, with delete, delete it
+
+        Public IPs this class didn't create (any other name, or on another IP
+        configuration) are left alone and listed under kept, unless
+        all_public_ips is set; then every public IP on the NIC is removed.
+        With delete, an unattached {vm}-pip is deleted too, so re-running after
+        a delete failed deletes what the earlier run already detached.
+
+        Returns:
+            as allocate(), with status deleted, detached (delete off),
+            unchanged (nothing to remove) or failed, and kept
+        """
+        public_ips = self.network_client.public_ip_addresses
+        existing = {pip.name.lower(): pip for pip in public_ips.list(self.resource_group)} if delete else {}
+
+        def release_one(nic, result):
+            name = public_ip_name(nic.virtual_machine.id.split('/')[-1])
+            detached = []
+
+            def detach(current):
+                primary = _primary_config(current)
+                detached[:], kept = [], []
+                for config in current.ip_configurations or []:
+                    if config.public_ip_address is None:
+                        continue
+                    pip_id = config.public_ip_address.id
+                    if all_public_ips or (config is primary and pip_id.split('/')[-1].lower() == name.lower()):
+                        detached.append(pip_id)
+                        config.public_ip_address = None
+                    else:
+                        kept.append(pip_id.split('/')[-1])
+                result['kept'] = kept
+                return bool(detached)
+
+            _, retries = self._update_nic(nic, detach)
+            result['retries'] += retries
+            released = [*detached]
+            # Left behind by an earlier run whose delete failed after the detach
+            leftover = existing.get(name.lower())
+            if leftover is not None and leftover.ip_configuration is None and \
+                    leftover.id.lower() not in {pip_id.lower() for pip_id in released}:
+                released.append(leftover.id)
+            result['public_ips'] = [pip_id.split('/')[-1] for pip_id in released]
+            if not released:
+                result['status'] = UNCHANGED
+                return
+            if delete:
+                for pip_id in released:
+                    _, retries = self._retry(lambda: public_ips.begin_delete(
+                        _resource_group(pip_id), pip_id.split('/')[-1]
+                    ).result(), DELETE_RETRYABLE_CODES)
+                    result['retries'] += retries
+            result['status'] = DELETED if delete else DETACHED
+
+        return self._run(vm_names, release_one, on_result)
+
+
+def print_summary(results: Dict[str, Dict[str, Any]], elapsed: float, action: str):
+    failed = {vm: r for vm, r in results.items() if r['status'] == FAILED}
+    unchanged = sum(1 for r in results.values() if r['status'] == UNCHANGED)
+    retries = sum(r['retries'] for r in results.values())
+    note = f" ({unchanged} unchanged, {retries} retried conflicts)" if unchanged or retries else ""
+    if failed:
+        print(f"⚠️  {len(results) - len(failed)}/{len(results)} VMs {action} in {elapsed:.1f}s{note}; failed:")
+        for vm, result in failed.items():
+            print(f"   - {vm}: {result['error']}")
+        print("   Run the same command again to retry only these VMs")
+    else:
+        print(f"🎉 All {len(results)} VMs {action} in {elapsed:.1f}s{note}")
+
+
+def run_bulk(resource_group: str = 'avd-rg', vms: Iterable[str] = (), match: Optional[str] = None,
+             tags: Optional[Dict[str, str]] = None, release: bool = False, delete: bool = True,
+             all_public_ips: bool = False, sku: str = 'Standard', parallelism: int = DEFAULT_PARALLELISM,
+             attach_parallelism: int = DEFAULT_ATTACH_PARALLELISM) -> Dict[str, Dict[str, Any]]:
+    """Select VMs and allocate (or release) their public IPs, printing each VM as it finishes and a summary"""
+    credential = ClientSecretCredential(
+        tenant_id=os.getenv('AZURE_TENANT_ID'),
+        client_id=os.getenv('AZURE_CLIENT_ID'),
+        client_secret=os.getenv('AZURE_CLIENT_SECRET')
+    )
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    network_client = NetworkManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+
+    vm_names = select_vms(compute_client, resource_group, vms, match, tags)
+    if not vm_names:
+        print(f"❌ No VMs selected in {resource_group}")
+        return {}
+    bulk = BulkPublicIp(network_client, resource_group, sku, parallelism, attach_parallelism)
+    print_lock = threading.Lock()
+    done = [0]
+
+    def report(vm_name, result):
+        # VMs report from worker threads; keep each line whole
+        with print_lock:
+            done[0] += 1
+            total = len(bulk.pending)
+            names = ', '.join(result['public_ips']) or '-'
+            if result['status'] == FAILED:
+                detail = f"❌ {result['error']}"
+            elif result['status'] == UNCHANGED:
+                detail = f"➖ unchanged ({names if not release else 'no public IP to remove'})"
+            else:
+                detail = f"✅ {result['status']} {names}" + (f" ({result['ip_address']})" if result['ip_address'] else '')
+            if release and result['kept']:
+                detail += f"; kept {', '.join(result['kept'])} (not created by this tool; see --all-public-ips)"
+            print(f"[{done[0]:>{len(str(total))}}/{total}] {vm_name}: {detail}", flush=True)
+
+    if release:
+        print(f"🌐 {'Detaching and deleting' if delete else 'Detaching'} public IPs of {len(vm_names)} VM(s) in {resource_group}...")
+    else:
+        print(f"🌐 Attaching {sku} SKU public IPs to {len(vm_names)} VM(s) in {resource_group}...")
+    start = time.perf_counter()
+    if release:
+        results = bulk.release(vm_names, delete=delete, all_public_ips=all_public_ips, on_result=report)
+    else:
+        results = bulk.allocate(vm_names, on_result=report)
+    print_summary(results, time.perf_counter() - start,
+                  ('released' if delete else 'detached') if release else 'have a public IP')
+    return results
+
+
+def selection_options(command):
+    """Click options shared by the public IP scripts"""
+    options = [
+        click.option('--resource-group', default='avd-rg', help='Resource group of the VMs (default: avd-rg)'),
+        click.option('--vm', 'vms', multiple=True, help='VM name (repeatable)'),
+        click.option('--match', default=None, help='VM name glob, e.g. avd-host-*'),
+        click.option('--tag', 'tags', multiple=True, help='Only VMs with this tag, as key=value (repeatable)'),
+        click.option('--parallelism', default=DEFAULT_PARALLELISM,
+                     help=f'VMs worked on at once (default: {DEFAULT_PARALLELISM})'),
+        click.option('--attach-parallelism', default=DEFAULT_ATTACH_PARALLELISM,
+                     help=f'NIC updates at once (default: {DEFAULT_ATTACH_PARALLELISM})')
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def _require_selection(vms, match, tags):
+    # Public IPs expose VMs to the internet, so there is no default selection
+    if not vms and not match and not tags:
+        raise click.UsageError('Choose VMs with --vm, --match or --tag')
+
+
+@click.group()
+def cli():
+    """Attach public IPs to many VMs at once, or detach and delete them"""
+
+
+@cli.command()
+@selection_options
+@click.option('--sku', default='Standard', type=click.Choice(list(SKUS)), help='Public IP SKU (default: Standard)')
+def attach(resource_group, vms, match, tags, parallelism, attach_parallelism, sku):
+    """Create {vm}-pip for each selected VM and attach it to the VM's primary NIC"""
+    _require_selection(vms, match, tags)
+    results = run_bulk(resource_group, vms, match, parse_tags(tags), sku=sku, parallelism=parallelism,
+                       attach_parallelism=attach_parallelism)
+    if not results or any(result['status'] == FAILED for result in results.values()):
+        sys.exit(1)
+
+
+@cli.command()
+@selection_options
+@click.option('--keep', is_flag=True, help='Only detach; keep the public IP resources')
+@click.option('--all-public-ips', is_flag=True,
+              help="Also remove public IPs this tool didn't create (other names, other IP configurations)")
+def detach(resource_group, vms, match, tags, parallelism, attach_parallelism, keep, all_public_ips):
+    """Detach {vm}-pip from each selected VM's primary NIC and delete it"""
+    _require_selection(vms, match, tags)
+    results = run_bulk(resource_group, vms, match, parse_tags(tags), release=True, delete=not keep,
+                       all_public_ips=all_public_ips, parallelism=parallelism, attach_parallelism=attach_parallelism)
+    if not results or any(result['status'] == FAILED for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+ARM Cassettes
+Record ARM responses made through the management clients into a gzip cassette, and
+replay them offline through a custom transport with optional latency simulation
+"""
+
+import io
+import os
+import re
+import gzip
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Optional, Any
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+from azure.core.pipeline.transport import RequestsTransport, RequestsTransportResponse
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+REDACTED = 'REDACTED'
+
+# JSON keys whose values (and everything beneath them) never reach the cassette
+SECRET_KEY_PATTERN = re.compile(
+    r'password|secret|token|connectionstring|sas|credential|^keys?$|accesskey|primarykey|secondarykey',
+    re.IGNORECASE
+)
+SECRET_QUERY_PARAMS = {'sig', 'code', 'token', 'skoid', 'sktid'}
+# Only headers the SDK needs for paging, polling and retries are kept
+KEPT_HEADERS = {'content-type', 'location', 'azure-asyncoperation', 'retry-after', 'x-ms-request-id'}
+SUBSCRIPTION_PATTERN = re.compile(r'/subscriptions/[^/]+', re.IGNORECASE)
+
+
+def scrub(value: Any, secret: bool = False) -> Any:
+    """Replace every string under a secret-looking key with REDACTED"""
+    if isinstance(value, dict):
+        return {k: scrub(v, secret or bool(SECRET_KEY_PATTERN.search(k))) for k, v in value.items()}
+    if isinstance(value, list):
+        return [scrub(v, secret) for v in value]
+    if secret and isinstance(value, str):
+        return REDACTED
+    return value
+
+
+def scrub_url(url: str) -> str:
+    parsed = urlparse(url)
+    query = [(k, REDACTED if k.lower() in SECRET_QUERY_PARAMS else v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)]
+    return parsed._replace(query=urlencode(query)).geturl()
+
+
+def scrub_body(body: str) -> str:
+    try:
+        return json.dumps(scrub(json.loads(body)))
+    except ValueError:
+        # Non-JSON bodies are not expected from ARM; drop rather than risk leaking them
+        return '' if body else body
+
+
+def match_key(method: str, url: str, exact: bool = True) -> str:
+    """
+    Key an interaction by method and path, ignoring host and subscription
+
+    Exact keys also include the sorted query string; loose keys (path only) let a
+    replay match requests whose query carries timestamps, such as metrics timespans.
+    """
+    parsed = urlparse(url)
+    path = SUBSCRIPTION_PATTERN.sub('/subscriptions/*', parsed.path.rstrip('/')).lower()
+    key = f"{method.upper()} {path}"
+    if exact:
+        key += '?' + urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return key
+
+
+class CassetteRecorder:
+    """Appends scrubbed interactions to a gzip JSON-lines cassette"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._file.write(json.dumps({'version': CASSETTE_VERSION, 'recorded': time.time()}) + '\n')
+        self.count = 0
+        atexit.register(self.close)
+
+    def record(self, method: str, url: str, status: int, reason: str,
+               headers: Dict[str, str], body: str, elapsed: float):
+        interaction = {
+            'method': method,
+            'url': scrub_url(url),
+            'status': status,
+            'reason': reason,
+            'headers': {k.lower(): v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            'body': scrub_body(body),
+            'elapsed': round(elapsed, 4)
+        }
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(json.dumps(interaction) + '\n')
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                logger.info(f"Recorded {self.count} ARM interactions to {self.path}")
+
+
+class Cassette:
+    """Recorded interactions queued per request key, consumed in recording order"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.exact = defaultdict(deque)
+        self.loose = defaultdict(deque)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version in {path}: {header.get('version')}")
+            for line in f:
+                interaction = json.loads(line)
+                self.exact[match_key(interaction['method'], interaction['url'])].append(interaction)
+                self.loose[match_key(interaction['method'], interaction['url'], exact=False)].append(interaction)
+        self.misses = 0
+
+    def _take(self, queue: deque) -> Optional[Dict[str, Any]]:
+        # Skip interactions already served through the other index
+        while len(queue) > 1 and queue[0].get('_used'):
+            queue.popleft()
+        if not queue:
+            return None
+        # The last recording of a key keeps answering once the queue is drained (e.g. polling)
+        interaction = queue.popleft() if len(queue) > 1 else queue[0]
+        interaction['_used'] = True
+        return interaction
+
+    def next(self, method: str, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for key, index in ((match_key(method, url), self.exact), (match_key(method, url, exact=False), self.loose)):
+                interaction = self._take(index.get(key, deque()))
+                if interaction is not None:
+                    return interaction
+            self.misses += 1
+            return None
+
+
+class RecordingTransport(RequestsTransport):
+    """Requests transport that also writes every response to a cassette"""
+
+    def __init__(self, recorder: CassetteRecorder, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        elapsed = time.perf_counter() - start
+        if not kwargs.get('stream'):
+            body = response.body().decode('utf-8', errors='replace')
+            self.recorder.record(request.method, request.url, response.status_code, response.reason or '',
+                                 dict(response.headers), body, elapsed)
+        return response
+
+
+class ReplayTransport(RequestsTransport):
+    """Serves responses from a cassette without touching the network"""
+
+    def __init__(self, cassette: Cassette, latency_scale: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.next(request.method, request.url)
+        if interaction is None:
+            logger.warning(f"No cassette entry for {request.method} {request.url}")
+            interaction = {
+                'status': 404,
+                'reason': 'Not Found',
+                'headers': {'content-type': 'application/json'},
+                'body': json.dumps({'error': {'code': 'CassetteMiss', 'message': f"Not recorded: {request.method} {request.url}"}}),
+                'elapsed': 0
+            }
+        elif self.latency_scale:
+            time.sleep(interaction['elapsed'] * self.latency_scale)
+
+        body = interaction['body'].encode('utf-8')
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction['reason']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        # A urllib3 response over the recorded bytes, so the SDK's streaming reads work unchanged
+        response.raw = HTTPResponse(body=io.BytesIO(body), headers=interaction['headers'],
+                                    status=interaction['status'], preload_content=False)
+        response.url = request.url
+        response.encoding = 'utf-8'
+
+        if hasattr(request, 'content'):
+            # azure.core.rest requests (newer generated clients) expect the rest response type
+            from azure.core.rest._requests_basic import RestRequestsTransportResponse
+            retval = RestRequestsTransportResponse(request=request, internal_response=response,
+                                                   block_size=self.connection_config.data_block_size)
+            if not kwargs.get('stream'):
+                retval.read()
+            return retval
+        return RequestsTransportResponse(request, response, self.connection_config.data_block_size)
+
+
+_recorders = {}
+_cassettes = {}
+_lock = threading.Lock()
+
+
+def cassette_transport() -> Optional[RequestsTransport]:
+    """
+    Transport selected by AZURE_CASSETTE_MODE (record or replay) and AZURE_CASSETTE
+
+    AZURE_CASSETTE_LATENCY_SCALE replays each response after its recorded latency
+    multiplied by the scale (0, the default, replays instantly).
+    """
+    mode = os.getenv('AZURE_CASSETTE_MODE', '').lower()
+    if not mode:
+        return None
+    path = os.getenv('AZURE_CASSETTE', 'arm_cassette.jsonl.gz')
+
+    with _lock:
+        if mode == 'record':
+            if path not in _recorders:
+                _recorders[path] = CassetteRecorder(path)
+            return RecordingTransport(_recorders[path])
+        if mode == 'replay':
+            if path not in _cassettes:
+                _cassettes[path] = Cassette(path)
+            return ReplayTransport(_cassettes[path], float(os.getenv('AZURE_CASSETTE_LATENCY_SCALE', '0')))
+    raise ValueError(f"AZURE_CASSETTE_MODE must be 'record' or 'replay', not {mode!r}")
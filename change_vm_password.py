@@ -1,25 +1,87 @@
 #!/usr/bin/env python3
 """
 Change VM Password Securely
+
+Changes the admin password on every selected VM at once; re-running retries only the VMs that failed.
 """
 
 from azure.mgmt.compute import ComputeManagementClient
 from azure.identity import ClientSecretCredential
 import os
+import sys
 import secrets
 import string
+from datetime import datetime
+
+import click
 from dotenv import load_dotenv
 
+from azure_manager import arm_client_options
+from run_command import (RunCommandEngine, DEFAULT_PARALLELISM, SUCCEEDED, TIMED_OUT, fleet_options, parse_tags,
+                         run_on_fleet, select_vms)
+
 # Load environment variables
 load_dotenv()
 
+PASSWORD_FILE = '.vm_password.txt'
+# Marks a password sent to a VM whose run command timed out: it may still have been set
+UNCONFIRMED = 'unconfirmed'
+
+# The password is a run command parameter, so it never appears in the script, its output or the report
+PASSWORD_SCRIPT = """
+param([string]$Username, [string]$NewPassword)
+
+try {
+    # Change the password for the specified user
+    $securePassword = ConvertTo-SecureString $NewPassword -AsPlainText -Force
+    Set-LocalUser -Name $Username -Password $securePassword
+    
+    Write-Output "Password changed successfully for user: $Username"
+} catch {
+    Write-Error "Failed to change password: $_"
+    exit 1
+}
+"""
+
 def generate_secure_password(length=16):
     """Generate a secure random password"""
     characters = string.ascii_letters + string.digits + "!@#$%^&*"
     password = ''.join(secrets.choice(characters) for _ in range(length))
     return password
 
-def change_vm_password():
+def _read_password_entries():
+    entries = {}
+    if os.path.exists(PASSWORD_FILE):
+        with open(PASSWORD_FILE) as f:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    entries[line.split()[0]] = line.rstrip('\n')
+    return entries
+
+def unconfirmed_passwords():
+    """VM -> password sent by a run that timed out; the VM may or may not have it now"""
+    passwords = {}
+    for vm_name, entry in _read_password_entries().items():
+        fields = entry.split()
+        if len(fields) >= 5 and fields[4] == UNCONFIRMED:
+            passwords[vm_name] = fields[2]
+    return passwords
+
+def save_passwords(username, passwords, confirmed=True):
+    """Record each VM's password (passwords: VM -> password), keeping entries for other VMs"""
+    entries = _read_password_entries()
+    generated = datetime.now().isoformat(timespec='seconds')
+    for vm_name, password in passwords.items():
+        entries[vm_name] = f"{vm_name} {username} {password} {generated}" + ("" if confirmed else f" {UNCONFIRMED}")
+    # Owner-only from the moment it is created
+    fd = os.open(PASSWORD_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(f"# VM Username Password Generated [{UNCONFIRMED}]\n")
+        for vm_name in sorted(entries):
+            f.write(entries[vm_name] + "\n")
+
+def change_vm_password(resource_group='avd-rg', vms=(), match=None, tags=None,
+                       parallelism=DEFAULT_PARALLELISM, timeout=300, resume=True):
     print("🔐 Changing VM Password Securely...")
     
     # Generate a new secure password
@@ -31,80 +93,80 @@ def change_vm_password():
         client_secret=os.getenv('AZURE_CLIENT_SECRET')
     )
     
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    username = os.getenv('AVD_ADMIN_USERNAME', 'avdadmin')
     
     try:
-        # VM details
-        resource_group = 'avd-rg'
-        vm_name = 'avd-host-01'
+        vm_names = select_vms(compute_client, resource_group, vms, match, tags)
+        if not vm_names:
+            print(f"❌ No VMs selected in {resource_group}")
+            return {}
         
-        print(f"🔄 Updating password for VM: {vm_name}")
+        print(f"🔄 Updating password for {len(vm_names)} VM(s): {', '.join(vm_names)}")
         
-        # PowerShell script to change password
-        username = os.getenv('AVD_ADMIN_USERNAME', 'avdadmin')
+        # A VM that timed out before may have its password already; send it the same one again
+        pending = unconfirmed_passwords()
+        passwords = {vm: pending.get(vm, new_password) for vm in vm_names}
         
-        powershell_script = f"""
-$username = "{username}"
-$newPassword = "{new_password}"
-
-try {{
-    # Change the password for the specified user
-    $securePassword = ConvertTo-SecureString $newPassword -AsPlainText -Force
-    Set-LocalUser -Name $username -Password $securePassword
-    
-    Write-Output "Password changed successfully for user: $username"
-    Write-Output "New password: $newPassword"
-}} catch {{
-    Write-Error "Failed to change password: $_"
-    exit 1
-}}
-"""
-        
-        # Execute the script on the VM
-        print("📡 Executing password change script on VM...")
+        # Execute the script on the VMs
+        print("📡 Executing password change script on VMs...")
+        engine = RunCommandEngine(
+            compute_client, resource_group, PASSWORD_SCRIPT, name='change-vm-password',
+            parameters=lambda vm_name: {'Username': username, 'NewPassword': passwords[vm_name]},
+            parallelism=parallelism, timeout=timeout
+        )
+        results = run_on_fleet(engine, vm_names, resume=resume)
         
-        result = compute_client.virtual_machines.begin_run_command(
-            resource_group,
-            vm_name,
-            {
-                'command_id': 'RunPowerShellScript',
-                'script': [powershell_script]
-            }
-        ).result()
+        timed_out = [vm for vm, result in results.items() if result['status'] == TIMED_OUT]
+        if timed_out:
+            save_passwords(username, {vm: passwords[vm] for vm in timed_out}, confirmed=False)
+            print(f"⚠️  {', '.join(timed_out)} timed out and may have the new password anyway; it is saved to "
+                  f"{PASSWORD_FILE} as {UNCONFIRMED} and will be reused when these VMs are retried")
         
-        if result.value and result.value[0].message:
+        changed = [vm for vm, result in results.items() if result['status'] == SUCCEEDED and not result.get('skipped')]
+        reused = [vm for vm in changed if passwords[vm] != new_password]
+        if changed:
+            # Save to a secure file (not committed to git) before anything else can fail
+            save_passwords(username, {vm: passwords[vm] for vm in changed})
             print("✅ Password changed successfully!")
             print(f"\n🔐 New Credentials:")
             print(f"   Username: {username}")
             print(f"   Password: {new_password}")
-            print(f"   VM: {vm_name}")
+            print(f"   VMs: {', '.join(changed)}")
             
-            # Update environment variable suggestion
-            print(f"\n💡 Update your .env file with:")
-            print(f"   AVD_ADMIN_PASSWORD={new_password}")
+            if reused:
+                print(f"   (except {', '.join(reused)}, which kept the password sent by the run that timed out)")
             
-            # Save to a secure file (not committed to git)
-            with open('.vm_password.txt', 'w') as f:
-                f.write(f"Username: {username}\n")
-                f.write(f"Password: {new_password}\n")
-                f.write(f"VM: {vm_name}\n")
-                f.write(f"Generated: {__import__('datetime').datetime.now()}\n")
-            
-            print(f"\n📝 Password saved to .vm_password.txt (not committed to git)")
+            if len(changed) == len(results) and not reused:
+                # Update environment variable suggestion
+                print(f"\n💡 Update your .env file with:")
+                print(f"   AVD_ADMIN_PASSWORD={new_password}")
+            else:
+                print(f"\n💡 VMs changed on other runs have other passwords; see {PASSWORD_FILE}")
             
+            print(f"\n📝 Passwords saved to {PASSWORD_FILE} (not committed to git)")
+        elif all(result['status'] == SUCCEEDED for result in results.values()):
+            print(f"✅ Nothing to do; see {PASSWORD_FILE} for the current passwords, or use --restart")
         else:
             print("❌ Failed to change password")
-            if result.value:
-                for output in result.value:
-                    if output.message:
-                        print(f"   Error: {output.message}")
+        return results
         
     except Exception as e:
         print(f"❌ Error: {e}")
         print(f"\n💡 Alternative: Change password manually via RDP")
         print(f"   1. Connect to VM via Azure Portal RDP")
         print(f"   2. Open Command Prompt as Administrator")
-        print(f"   3. Run: net user {os.getenv('AVD_ADMIN_USERNAME', 'avdadmin')} new_password")
+        print(f"   3. Run: net user {username} new_password")
+        return None
+
+@click.command()
+@fleet_options(default_timeout=300)
+def main(resource_group, vms, match, tags, parallelism, timeout, restart):
+    """Change the admin password on VMs"""
+    results = change_vm_password(resource_group, vms, match, parse_tags(tags), parallelism, timeout,
+                                 resume=not restart)
+    if not results or any(result['status'] != SUCCEEDED for result in results.values()):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    change_vm_password()
+    main()
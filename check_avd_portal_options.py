@@ -9,6 +9,9 @@ from azure.identity import ClientSecretCredential
 import os
 from dotenv import load_dotenv
 
+from azure_manager import arm_client_options
+from registration_token import RegistrationTokenManager
+
 # Load environment variables
 load_dotenv()
 
@@ -21,8 +24,8 @@ def check_avd_portal_options():
         client_secret=os.getenv('AZURE_CLIENT_SECRET')
     )
     
-    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
+    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
     
     try:
         # Get host pool details
@@ -30,8 +33,8 @@ def check_avd_portal_options():
         print(f"Host Pool: {host_pool.name}")
         print(f"Type: {host_pool.host_pool_type}")
         
-        # Get registration token
-        registration_info = avd_client.host_pools.retrieve_registration_token('avd-rg', 'avd-host-pool')
+        # Get registration token; renewed if it has expired or is about to
+        registration_info = RegistrationTokenManager(avd_client).get('avd-rg', 'avd-host-pool')
         print(f"\n🔑 Registration Token:")
         print(f"   Token: {registration_info.token}")
         print(f"   Expires: {registration_info.expiration_time}")
@@ -1,95 +1,133 @@
 #!/usr/bin/env python3
 """
 Check NSG Configuration for VM
+
+NIC and subnet NSGs come from the same in-memory topology as check_vm_network.py,
+and the effective result of both is worked out by nsg_engine, so every VM in a
+resource group or subscription can be checked in one pass.
 """
 
-from azure.mgmt.network import NetworkManagementClient
-from azure.mgmt.compute import ComputeManagementClient
-from azure.identity import ClientSecretCredential
-import os
-from dotenv import load_dotenv
+import sys
 
-# Load environment variables
-load_dotenv()
+import click
+
+from check_vm_network import load_scope, scope_options
+from network_topology import enum_value
+from nsg_engine import NsgEngine, to_cidrs
+
+
+def print_nsg_rules(nsg):
+    for rule in sorted(nsg.security_rules or [], key=lambda r: r.priority):
+        ports = rule.destination_port_range or ', '.join(rule.destination_port_ranges or [])
+        source = rule.source_address_prefix or ', '.join(rule.source_address_prefixes or [])
+        print(f"  - {rule.name} ({rule.priority}, {enum_value(rule.direction)}): "
+              f"{enum_value(rule.protocol)} {rule.source_port_range} -> {ports}")
+        print(f"    Source: {source}, Action: {enum_value(rule.access)}")
+
+
+def describe_access(result, port, protocol, source) -> str:
+    """One line for a NIC: allowed or blocked, and by which rules"""
+    decided = '; '.join(f"{nsg['scope'].upper() if nsg['scope'] == 'nic' else nsg['scope']} NSG {nsg['name']} "
+                        + ('unreadable, assumed open' if nsg['unreadable'] else
+                           f"{'allows' if nsg['allowed'] else 'blocks'} ({', '.join(nsg['rules']) or 'no rule'})")
+                        for nsg in result['nsgs']) or 'no NSGs'
+    if result['allowed']:
+        if source.lower() == 'internet' and not result['public_ips']:
+            return f"⚠️  {port}/{protocol} from {source} allowed, but there is no public IP ({decided})"
+        return f"✅ {port}/{protocol} from {source} allowed ({decided})"
+    return f"❌ {port}/{protocol} from {source} blocked ({decided})"
+
+
+def print_nsg_config(topology, engine, network, port, protocol, source):
+    print(f"VM Name: {network['name']}")
+    results = {result['nic']: result for result in engine.check(network['id'], port, protocol, source)}
+    for nic in network['nics']:
+        if nic.get('missing'):
+            print(f"❌ NIC {nic['name']} not found")
+            continue
+        print(f"NIC: {nic['name']}")
 
-def check_nsg_config():
-    print("🔒 Checking NSG Configuration...")
-    
-    credential = ClientSecretCredential(
-        tenant_id=os.getenv('AZURE_TENANT_ID'),
-        client_id=os.getenv('AZURE_CLIENT_ID'),
-        client_secret=os.getenv('AZURE_CLIENT_SECRET')
-    )
-    
-    network_client = NetworkManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    
-    try:
-        # Get VM details
-        vm = compute_client.virtual_machines.get('avd-rg', 'avd-host-01')
-        print(f"VM Name: {vm.name}")
-        
-        # Get NIC details
-        nic_name = 'avd-host-01-nic'
-        nic = network_client.network_interfaces.get('avd-rg', nic_name)
-        print(f"NIC: {nic.name}")
-        
         # Check if NSG is attached to NIC
-        if nic.network_security_group:
-            nsg_id = nic.network_security_group.id
-            nsg_name = nsg_id.split('/')[-1]
-            print(f"✅ NSG attached to NIC: {nsg_name}")
-            
-            # Get NSG details
-            nsg = network_client.network_security_groups.get('avd-rg', nsg_name)
+        nsg = topology.nsgs.get(nic['nsg_id'])
+        if nsg is not None:
+            print(f"✅ NSG attached to NIC: {nsg.name}")
             print(f"\n🔍 NSG Rules:")
-            
-            # Check inbound rules
-            print("Inbound Rules:")
-            rdp_rule_found = False
-            for rule in nsg.security_rules:
-                print(f"  - {rule.name}: {rule.protocol} {rule.source_port_range} -> {rule.destination_port_range}")
-                print(f"    Source: {rule.source_address_prefix}, Action: {rule.access}")
-                
-                # Check for RDP rule
-                if (rule.destination_port_range == '3389' and 
-                    rule.protocol == 'Tcp' and 
-                    rule.access == 'Allow'):
-                    rdp_rule_found = True
-                    print(f"    ✅ RDP Rule Found!")
-            
-            if not rdp_rule_found:
-                print("  ❌ No RDP rule found (port 3389)")
-                
+            print_nsg_rules(nsg)
+        elif nic['nsg_id']:
+            print(f"❌ NSG {nic['nsg']} attached to NIC could not be read")
         else:
             print("❌ No NSG attached to NIC")
-            
+
         # Check subnet NSG
-        print(f"\n🔍 Subnet NSG Check:")
-        subnet_name = 'avd-subnet'
-        vnet_name = 'avd-vnet'
-        
-        try:
-            subnet = network_client.subnets.get('avd-rg', vnet_name, subnet_name)
-            if subnet.network_security_group:
-                subnet_nsg_id = subnet.network_security_group.id
-                subnet_nsg_name = subnet_nsg_id.split('/')[-1]
-                print(f"✅ Subnet NSG: {subnet_nsg_name}")
-                
-                # Get subnet NSG details
-                subnet_nsg = network_client.network_security_groups.get('avd-rg', subnet_nsg_name)
-                print("Subnet NSG Inbound Rules:")
-                for rule in subnet_nsg.security_rules:
-                    print(f"  - {rule.name}: {rule.protocol} {rule.source_port_range} -> {rule.destination_port_range}")
-                    
-            else:
-                print("❌ No NSG attached to subnet")
-                
-        except Exception as e:
-            print(f"❌ Error checking subnet NSG: {e}")
-            
+        print(f"\n🔍 Subnet NSG Check ({nic['subnet']}):")
+        subnet_nsg = topology.nsgs.get(nic['subnet_nsg_id'])
+        if subnet_nsg is not None:
+            print(f"✅ Subnet NSG: {subnet_nsg.name}")
+            print("Subnet NSG Rules:")
+            print_nsg_rules(subnet_nsg)
+        elif nic['subnet_nsg_id']:
+            print(f"❌ Subnet NSG {nic['subnet_nsg']} could not be read")
+        else:
+            print("❌ No NSG attached to subnet")
+
+        result = results.get(nic['name'])
+        if result is not None:
+            print(f"\n🔒 Effective access: {describe_access(result, port, protocol, source)}")
+            if result['allowed'] and source.lower() != 'internet':
+                print(f"   Allowed from: {', '.join(to_cidrs(result['allowed_addresses'])[:5])}")
+
+
+def check_nsg_config(resource_group='avd-rg', vm_names=('avd-host-01',), all_vms=False, subscription=False,
+                     port=3389, protocol='Tcp', source='Internet', exposed=False):
+    print("🔒 Checking NSG Configuration...")
+
+    try:
+        topology, keys = load_scope(resource_group, vm_names, all_vms or exposed, subscription)
+        if not keys:
+            return False
+        engine = NsgEngine(topology)
+
+        if exposed:
+            # Only the VMs that let the traffic in
+            results = engine.exposed(port, protocol, source, vm_keys=keys)
+            print()
+            for result in results:
+                print(f"{result['vm']}/{result['nic']}: {describe_access(result, port, protocol, source)}")
+            reachable = [r for r in results if r['public_ips'] or source.lower() != 'internet']
+            print(f"\n📊 {len(results)} of {len(keys)} VMs' NICs allow {port}/{protocol} from {source}"
+                  + (f"; {len(reachable)} have a public IP" if source.lower() == 'internet' else ''))
+            return True
+
+        networks = [topology.vm_network(key) for key in keys]
+        if len(networks) == 1:
+            print()
+            print_nsg_config(topology, engine, networks[0], port, protocol, source)
+        else:
+            print()
+            for network in networks:
+                for result in engine.check(network['id'], port, protocol, source):
+                    print(f"{result['vm']}/{result['nic']}: {describe_access(result, port, protocol, source)}")
+        return True
+
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
+
+
+@click.command()
+@scope_options
+@click.option('--port', default=3389, help='Destination port to check (default: 3389, RDP)')
+@click.option('--protocol', default='Tcp', type=click.Choice(['Tcp', 'Udp', 'Icmp'], case_sensitive=False),
+              help='Protocol to check (default: Tcp)')
+@click.option('--source', default='Internet',
+              help='Source address, CIDR or service tag (Internet, VirtualNetwork, AzureLoadBalancer; default: Internet)')
+@click.option('--exposed', is_flag=True, help='List only the VMs that allow the traffic (implies --all)')
+def main(resource_group, vms, all_vms, subscription, port, protocol, source, exposed):
+    """Show the NIC and subnet NSG rules of session host VMs and whether traffic gets through"""
+    if not check_nsg_config(resource_group, vms or ('avd-host-01',), all_vms, subscription,
+                            port, protocol, source, exposed):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    check_nsg_config()
+    main()
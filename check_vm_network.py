@@ -1,78 +1,163 @@
 #!/usr/bin/env python3
 """
 Check VM Network Configuration
+
+The resource group's (or subscription's) VMs, NICs, NSGs, VNets and public IPs
+are listed once and joined in memory, so checking every VM costs the same few
+ARM calls as checking one.
 """
 
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.network import NetworkManagementClient
 from azure.identity import ClientSecretCredential
 import os
+import sys
+import time
+
+import click
 from dotenv import load_dotenv
 
+from azure_manager import arm_client_options
+from network_topology import load_topology
+
 # Load environment variables
 load_dotenv()
 
-def check_vm_network():
-    print("🔍 Checking VM Network Configuration...")
-    
+
+def load_scope(resource_group, vm_names=(), all_vms=False, subscription=False):
+    """Topology of the resource group (or subscription) and the keys of the VMs to check"""
     credential = ClientSecretCredential(
         tenant_id=os.getenv('AZURE_TENANT_ID'),
         client_id=os.getenv('AZURE_CLIENT_ID'),
         client_secret=os.getenv('AZURE_CLIENT_SECRET')
     )
-    
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    network_client = NetworkManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    
+
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    network_client = NetworkManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+
+    start = time.perf_counter()
+    topology = load_topology(compute_client, network_client, None if subscription else resource_group)
+    scope = 'subscription' if subscription else resource_group
+    print(f"   Loaded {len(topology.vms)} VMs, {len(topology.nics)} NICs, {len(topology.nsgs)} NSGs, "
+          f"{len(topology.subnets)} subnets and {len(topology.public_ips)} public IPs from {scope} "
+          f"with {sum(topology.calls.values())} ARM calls in {time.perf_counter() - start:.1f}s")
+
+    if all_vms:
+        return topology, sorted(topology.vms, key=lambda key: topology.vms[key].name)
+    keys = []
+    for name in vm_names:
+        key = topology.find_vm(name, None if subscription else resource_group)
+        if key is None:
+            print(f"❌ VM {name} not found in {scope}")
+        else:
+            keys.append(key)
+    return topology, keys
+
+
+def print_vm_network(network):
+    print(f"VM Name: {network['name']}")
+    print(f"Location: {network['location']}")
+    print(f"Size: {network['vm_size']}")
+
+    print("\nNetwork Interfaces:")
+    for nic in network['nics']:
+        print(f"  - {nic['name']}")
+        if nic.get('missing'):
+            print(f"    ❌ NIC not found")
+            continue
+        if nic['private_ips']:
+            print(f"    Private IP: {', '.join(nic['private_ips'])}")
+        print(f"    Subnet: {nic['subnet']} ({nic['vnet']}, {nic['address_prefix'] or 'unknown prefix'})")
+        print(f"    NSG: {nic['nsg'] or 'None'}; subnet NSG: {nic['subnet_nsg'] or 'None'}")
+
+        # Check if public IP is assigned
+        if nic['public_ips']:
+            for pip in nic['public_ips']:
+                state = 'could not be read' if pip['missing'] else pip['ip_address'] or 'not allocated'
+                print(f"    Public IP: {pip['name']} ({state})")
+        else:
+            print(f"    Public IP: None (Private subnet)")
+
+
+def vm_network_line(network) -> str:
+    """One line per VM, for checking many at once"""
+    nics = []
+    for nic in network['nics']:
+        if nic.get('missing'):
+            nics.append(f"{nic['name']} ❌ not found")
+            continue
+        public = ', '.join(pip['ip_address'] or pip['name'] for pip in nic['public_ips']) or '-'
+        nics.append(f"{', '.join(nic['private_ips']) or '-'} in {nic['vnet']}/{nic['subnet']}, "
+                    f"NSG {nic['nsg'] or '-'}, subnet NSG {nic['subnet_nsg'] or '-'}, public {public}")
+    return f"{network['name']}: {'; '.join(nics) or 'no NICs'}"
+
+
+def check_vm_network(resource_group='avd-rg', vm_names=('avd-host-01',), all_vms=False, subscription=False):
+    print("🔍 Checking VM Network Configuration...")
+
     try:
-        # Get VM details
-        vm = compute_client.virtual_machines.get('avd-rg', 'avd-host-01')
-        print(f"VM Name: {vm.name}")
-        print(f"Location: {vm.location}")
-        print(f"Size: {vm.hardware_profile.vm_size}")
-        
-        print("\nNetwork Interfaces:")
-        for nic in vm.network_profile.network_interfaces:
-            nic_name = nic.id.split('/')[-1]
-            print(f"  - {nic_name}")
-            
-            # Get NIC details
-            nic_details = network_client.network_interfaces.get('avd-rg', nic_name)
-            
-            if nic_details.ip_configurations:
-                ip_config = nic_details.ip_configurations[0]
-                print(f"    Private IP: {ip_config.private_ip_address}")
-                print(f"    Subnet: {ip_config.subnet.id.split('/')[-1]}")
-                
-                # Check if public IP is assigned
-                if hasattr(ip_config, 'public_ip_address') and ip_config.public_ip_address:
-                    print(f"    Public IP: {ip_config.public_ip_address.id.split('/')[-1]}")
-                else:
-                    print(f"    Public IP: None (Private subnet)")
-        
+        topology, keys = load_scope(resource_group, vm_names, all_vms, subscription)
+        if not keys:
+            return False
+
+        networks = [topology.vm_network(key) for key in keys]
+        if len(networks) == 1:
+            print()
+            print_vm_network(networks[0])
+        else:
+            print()
+            for network in networks:
+                print(vm_network_line(network))
+            exposed = [n['name'] for n in networks if any(nic.get('public_ips') for nic in n['nics'])]
+            print(f"\n📊 {len(networks)} VMs checked, {len(exposed)} with a public IP")
+
         print("\n🔧 Connection Options:")
         print("1. Use Azure Portal RDP (Recommended)")
-        print("   - Go to Azure Portal → Virtual Machines → avd-host-01")
+        print("   - Go to Azure Portal → Virtual Machines → <your VM>")
         print("   - Click 'Connect' → 'RDP'")
         print("   - Download and open the RDP file")
-        
+
         print("\n2. Add Public IP to VM")
         print("   - This requires modifying the VM configuration")
         print("   - Not recommended for security reasons")
-        
+
         print("\n3. Create Azure Bastion")
         print("   - Provides secure RDP access")
         print("   - Requires additional setup and cost")
-        
+
         print("\n4. Set up VPN Connection")
         print("   - Connect your Ubuntu machine to Azure VNet")
         print("   - More complex setup required")
-        
+
         print("\n🎯 Recommended Approach:")
         print("Use Azure Portal RDP - it's the easiest and most secure method!")
-        
+        return True
+
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
+
+
+def scope_options(command):
+    """Click options shared by the network check scripts"""
+    options = [
+        click.option('--resource-group', default='avd-rg', help='Resource group to load (default: avd-rg)'),
+        click.option('--vm', 'vms', multiple=True, help='VM name (repeatable; default: avd-host-01)'),
+        click.option('--all', 'all_vms', is_flag=True, help='Check every VM in the resource group (or subscription)'),
+        click.option('--subscription', is_flag=True, help='Load the whole subscription instead of one resource group')
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+@click.command()
+@scope_options
+def main(resource_group, vms, all_vms, subscription):
+    """Show the network configuration of session host VMs"""
+    if not check_vm_network(resource_group, vms or ('avd-host-01',), all_vms, subscription):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    check_vm_network()
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+CLI Shell
+Interactive REPL for azure_cli.py that authenticates once and keeps SDK clients
+and listings warm between commands, with tab completion from cached names
+"""
+
+import os
+import cmd
+import shlex
+import time
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import click
+
+import azure_manager
+from azure_manager import AzureManager
+from stream_output import DEFAULT_FIELDS
+from vm_metrics import TTLCache
+
+try:
+    import readline
+except ImportError:  # Windows without pyreadline: the shell works, just without completion/history
+    readline = None
+
+SHELL_CACHE_TTL = float(os.getenv('AZURE_SHELL_CACHE_TTL', '300'))
+HISTORY_FILE = os.path.expanduser('~/.azure_cli_history')
+
+
+class CachingAzureManager(AzureManager):
+    """
+    AzureManager whose iter_* listings are cached for SHELL_CACHE_TTL seconds
+
+    A listing is cached only once it has been read to the end, so an interrupted
+    stream never leaves a partial result behind. Resource group filtered listings
+    are answered from a cached unfiltered listing when there is one.
+    """
+
+    def __init__(self, subscription_id: Optional[str] = None, ttl_seconds: float = SHELL_CACHE_TTL):
+        super().__init__(subscription_id)
+        self.inventory = TTLCache(ttl_seconds, name='cli_shell')
+
+    def _cached(self, kind: str, resource_group: Optional[str], fetch) -> Iterator[Dict[str, Any]]:
+        rows = self.inventory.get((kind, None))
+        if rows is not None and resource_group:
+            rows = [row for row in rows if (row.get('resource_group') or '').lower() == resource_group.lower()]
+        elif resource_group:
+            rows = self.inventory.get((kind, resource_group.lower()))
+        if rows is not None:
+            yield from rows
+            return
+
+        rows = []
+        for row in fetch():
+            rows.append(row)
+            yield row
+        self.inventory.set((kind, resource_group.lower() if resource_group else None), rows)
+
+    def iter_resource_groups(self) -> Iterator[Dict[str, Any]]:
+        return self._cached('resource_groups', None, super().iter_resource_groups)
+
+    def iter_virtual_machines(self, resource_group: Optional[str] = None,
+                              power_state: bool = True) -> Iterator[Dict[str, Any]]:
+        # Rows without power state would poison the cache for callers that want it
+        if not power_state:
+            return super().iter_virtual_machines(resource_group, power_state=False)
+        return self._cached('virtual_machines', resource_group,
+                            lambda: super(CachingAzureManager, self).iter_virtual_machines(resource_group))
+
+    def iter_storage_accounts(self, resource_group: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        return self._cached('storage_accounts', resource_group,
+                            lambda: super(CachingAzureManager, self).iter_storage_accounts(resource_group))
+
+    def iter_web_apps(self, resource_group: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        return self._cached('web_apps', resource_group,
+                            lambda: super(CachingAzureManager, self).iter_web_apps(resource_group))
+
+    def cached_names(self, kind: str) -> List[str]:
+        """Names from any cached listing of kind, for completion; never calls ARM"""
+        entries = [value for (cached_kind, _), _, value in self.inventory.items() if cached_kind == kind]
+        return sorted({row['name'] for rows in entries for row in rows if row.get('name')})
+
+
+class AzureShell(cmd.Cmd):
+    """Runs azure_cli commands in-process against one authenticated CachingAzureManager"""
+
+    intro = "Azure CLI shell. Type 'help' for commands, Tab to complete, 'exit' to quit."
+    prompt = 'azure> '
+
+    def __init__(self, cli_group: click.Group, obj: Dict[str, Any], console):
+        super().__init__()
+        self.cli = cli_group
+        self.obj = obj
+        self.console = console
+        self.manager: CachingAzureManager = obj['manager']
+
+    def preload(self):
+        """Fetch resource group names in the background so --resource-group completes straight away"""
+        threading.Thread(target=lambda: sum(1 for _ in self.manager.iter_resource_groups()),
+                         daemon=True, name='shell-preload').start()
+
+    def run(self):
+        if readline is not None:
+            readline.set_completer_delims(' \t\n=,')
+            try:
+                readline.read_history_file(HISTORY_FILE)
+            except (FileNotFoundError, OSError):
+                pass
+        self.preload()
+        try:
+            while True:
+                try:
+                    self.cmdloop()
+                    break
+                except KeyboardInterrupt:
+                    # Ctrl-C abandons the current line or command, not the shell
+                    self.console.print()
+                    self.intro = None
+        finally:
+            if readline is not None:
+                try:
+                    readline.write_history_file(HISTORY_FILE)
+                except OSError:
+                    pass
+
+    def emptyline(self):
+        pass
+
+    def default(self, line: str):
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            self.console.print(f"[bold red]Error: {e}[/bold red]")
+            return
+        if args[0] == 'shell':
+            self.console.print("[yellow]Already in the shell.[/yellow]")
+            return
+        if args[0] == 'time':
+            start = time.perf_counter()
+            self._invoke(args[1:])
+            self.console.print(f"[dim]{(time.perf_counter() - start) * 1000:.1f} ms[/dim]")
+            return
+        self._invoke(args)
+
+    def _invoke(self, args: List[str]):
+        console_file = self.console.file
+        # The shell's subscription and auth method, unless the command line overrides them
+        args = ['--subscription-id', self.obj['subscription_id'], '--auth-method', self.obj['auth_method'], *args]
+        try:
+            self.cli.main(args, prog_name='azure_cli.py', standalone_mode=False, obj=self.obj)
+        except click.ClickException as e:
+            e.show()
+        except click.Abort:
+            self.console.print("[yellow]Aborted.[/yellow]")
+        except SystemExit:
+            # Commands exit on errors; they have already printed why
+            pass
+        finally:
+            # Streaming formats redirect console output to stderr for the duration of a command
+            self.console.file = console_file
+            azure_manager.console.file = console_file
+
+    def do_refresh(self, arg: str):
+        """refresh: drop the cached listings so the next commands read from Azure"""
+        self.manager.inventory.clear()
+        self.console.print("[green]Inventory cache cleared.[/green]")
+        self.preload()
+
+    def do_cache(self, arg: str):
+        """cache: show what is cached and the hit rate"""
+        cache = self.manager.inventory
+        entries = [(key, age, len(rows)) for key, age, rows in cache.items()]
+        for (kind, resource_group), age, count in sorted(entries, key=lambda e: e[0][0]):
+            scope = resource_group or 'all'
+            self.console.print(f"  {kind} ({scope}): {count} rows, {age:.0f}s old")
+        self.console.print(f"[dim]TTL {cache.ttl_seconds:.0f}s, {cache.hits} hits, {cache.misses} misses[/dim]")
+
+    def do_exit(self, arg: str):
+        """exit: leave the shell"""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg: str):
+        self.console.print()
+        return True
+
+    def do_help(self, arg: str):
+        if arg in ('refresh', 'cache', 'exit', 'quit'):
+            super().do_help(arg)
+            return
+        if arg:
+            self._invoke(arg.split() + ['--help'])
+            return
+        self._invoke(['--help'])
+        self.console.print("\nShell commands:\n  refresh  Drop cached listings\n  cache    Show cached listings\n"
+                           "  time     Time a command (e.g. time list vms)\n  exit     Leave the shell")
+
+    # Completion
+
+    def completenames(self, text: str, *ignored) -> List[str]:
+        names = [*self.cli.commands, 'refresh', 'cache', 'time', 'help', 'exit', 'quit']
+        return [name for name in sorted(set(names)) if name.startswith(text) and name != 'shell']
+
+    def completedefault(self, text: str, line: str, begidx: int, endidx: int) -> List[str]:
+        before = line[:begidx]
+        try:
+            words = shlex.split(before)
+        except ValueError:
+            return []
+        if before and not before[-1].isspace():
+            # Completing after a comma, e.g. --fields name,reso<Tab>
+            words = words[:-1]
+        return self._complete(words, text)
+
+    def complete_time(self, text: str, line: str, begidx: int, endidx: int) -> List[str]:
+        return self.completedefault(text, line, begidx, endidx)
+
+    complete_help = complete_time
+
+    def _complete(self, words: List[str], text: str) -> List[str]:
+        if words and words[0] in ('time', 'help'):
+            words = words[1:]
+        command: click.Command = self.cli
+        path = []
+        for word in words:
+            if isinstance(command, click.Group) and word in command.commands:
+                command = command.commands[word]
+                path.append(word)
+
+        if isinstance(command, click.Group):
+            return [name for name in sorted(command.commands) if name.startswith(text) and name != 'shell']
+
+        previous = words[-1] if words else None
+        option = next((p for p in command.params if isinstance(p, click.Option) and previous in p.opts), None)
+        if option is not None and not option.is_flag:
+            return [value for value in self._option_values(option, path) if value.startswith(text)]
+
+        opts = [opt for p in command.params if isinstance(p, click.Option) for opt in p.opts if opt.startswith('--')]
+        return [opt for opt in sorted(opts) if opt.startswith(text)]
+
+    def _option_values(self, option: click.Option, path: List[str]) -> List[str]:
+        if isinstance(option.type, click.Choice):
+            return [*option.type.choices]
+        if option.name == 'resource_group':
+            return self.manager.cached_names('resource_groups')
+        if option.name == 'subscriptions':
+            return [self.manager.subscription_id]
+        if option.name == 'fields' and path and path[-1] in DEFAULT_FIELDS:
+            return DEFAULT_FIELDS[path[-1]]
+        return []
@@ -10,6 +10,9 @@ import os
 from dotenv import load_dotenv
 import json
 
+from azure_manager import arm_client_options
+from registration_token import RegistrationTokenManager
+
 # Load environment variables
 load_dotenv()
 
@@ -22,8 +25,8 @@ def complete_avd_setup():
         client_secret=os.getenv('AZURE_CLIENT_SECRET')
     )
     
-    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
+    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
     
     print("\n📋 Current AVD Status:")
     
@@ -38,11 +41,11 @@ def complete_avd_setup():
     print(f"   ✅ Application Groups: {len(app_groups)}")
     print(f"   ✅ Session Host VMs: {len(vms)}")
     
-    # Generate fresh registration token
-    print("\n🔑 Generating Fresh Registration Token:")
+    # Current registration token, renewed if it has expired or is about to
+    print("\n🔑 Getting Registration Token:")
     try:
-        token = avd_client.host_pools.retrieve_registration_token('avd-rg', 'avd-host-pool')
-        print(f"   ✅ Token Generated Successfully")
+        token = RegistrationTokenManager(avd_client).get('avd-rg', 'avd-host-pool')
+        print(f"   ✅ Token Retrieved Successfully")
         print(f"   ✅ Expires: {token.expiration_time}")
         print(f"   📋 Token: {token.token}")
     except Exception as e:
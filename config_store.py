@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Config Store
+Atomic, versioned writes of the Azure settings in .env, and a watcher that lets
+every worker process notice new versions
+"""
+
+import os
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from dotenv import dotenv_values
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are still atomic, just not serialised across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'AZURE_CONFIG_VERSION'
+CONFIG_WATCH_INTERVAL = float(os.getenv('CONFIG_WATCH_INTERVAL', '2'))
+
+
+def _line_key(line: str) -> Optional[str]:
+    """The key a KEY=value (or export KEY=value) line sets, or None for comments and blank lines"""
+    line = line.strip()
+    if not line or line.startswith('#') or '=' not in line:
+        return None
+    key = line.split('=', 1)[0].strip()
+    return key[len('export '):].strip() if key.startswith('export ') else key
+
+
+class ConfigStore:
+    """
+    The .env file as a versioned store
+
+    Every write bumps AZURE_CONFIG_VERSION and replaces the file with os.replace,
+    so readers see either the old or the new file, never a partial one.
+    """
+
+    def __init__(self, path: str = '.env'):
+        self.path = os.path.abspath(path)
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self) -> Tuple[int, Dict[str, str]]:
+        """Return (version, values); a missing file is version 0"""
+        if not os.path.exists(self.path):
+            return 0, {}
+        values = {k: v for k, v in dotenv_values(self.path).items() if v is not None}
+        try:
+            version = int(values.get(VERSION_KEY, 0))
+        except ValueError:
+            version = 0
+        return version, values
+
+    def signature(self) -> Optional[Tuple[int, int, int]]:
+        """Cheap change detector: (inode, mtime, size)"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def write(self, updates: Dict[str, str]) -> int:
+        """
+        Set the keys in updates and bump the version, leaving every other line as it is
+
+        Keys already in the file are rewritten in place (later duplicates are
+        dropped); new ones are appended.
+
+        Returns:
+            the new version
+        """
+        with self._locked():
+            version, _ = self.read()
+            version += 1
+            values = dict(updates, **{VERSION_KEY: str(version)})
+
+            lines, written = [], set()
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    for line in f.readlines():
+                        key = _line_key(line)
+                        if key in values:
+                            if key not in written:
+                                lines.append(f'{key}={values[key]}\n')
+                                written.add(key)
+                            continue
+                        lines.append(line)
+            if lines and not lines[-1].endswith('\n'):
+                lines[-1] += '\n'
+            for key, value in values.items():
+                if key not in written:
+                    lines.append(f'{key}={value}\n')
+
+            directory = os.path.dirname(self.path)
+            fd, tmp_path = tempfile.mkstemp(prefix='.env.', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.writelines(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(self.path):
+                    os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return version
+
+
+class ConfigWatcher(threading.Thread):
+    """Polls the store's file signature and calls on_change(version, values) for new versions"""
+
+    def __init__(self, store: ConfigStore, on_change: Callable[[int, Dict[str, str]], None],
+                 interval: float = CONFIG_WATCH_INTERVAL):
+        super().__init__(daemon=True, name='config-watcher')
+        self.store = store
+        self.on_change = on_change
+        self.interval = interval
+        self._wake = threading.Event()
+        # Whatever is on disk at startup is already loaded; only later versions are changes
+        self.version, _ = store.read()
+        self._signature = store.signature()
+
+    def poke(self):
+        """Check now instead of at the next interval (e.g. right after this worker wrote)"""
+        self._wake.set()
+
+    def run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            signature = self.store.signature()
+            if signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                version, values = self.store.read()
+                if version != self.version:
+                    self.version = version
+                    self.on_change(version, values)
+            except Exception as e:
+                logger.error(f"Error applying config version change: {e}")
+                time.sleep(self.interval)
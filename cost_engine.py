@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Azure Cost Engine
+Daily actual/forecast cost from Cost Management, stored locally with vectorised rollups
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Any
+
+import numpy as np
+from azure.mgmt.costmanagement.models import (
+    QueryDefinition,
+    QueryTimePeriod,
+    QueryDataset,
+    QueryAggregation,
+    QueryGrouping,
+    ForecastDefinition,
+    ForecastTimePeriod,
+    ForecastDataset,
+    ForecastAggregation
+)
+
+from telemetry import arm_call, record_cache
+
+logger = logging.getLogger(__name__)
+
+# Rollup dimensions mapped to the cost_rows column they aggregate on
+ROLLUP_DIMENSIONS = {
+    'resource_group': 'resource_group',
+    'type': 'resource_type',
+    'location': 'location',
+    'resource': 'resource_id'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cost_rows (
+    kind TEXT NOT NULL,
+    usage_date TEXT NOT NULL,
+    resource_id TEXT,
+    resource_group TEXT,
+    resource_type TEXT,
+    location TEXT,
+    cost REAL NOT NULL,
+    currency TEXT
+);
+CREATE TABLE IF NOT EXISTS cost_tags (
+    usage_date TEXT NOT NULL,
+    tag_key TEXT NOT NULL,
+    tag_value TEXT,
+    cost REAL NOT NULL,
+    currency TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _parse_usage_date(value) -> str:
+    """Cost Management returns dates as 20240131 or ISO strings depending on the query"""
+    text = str(value)
+    if len(text) == 8 and text.isdigit():
+        return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    return text[:10]
+
+
+def _rows_as_dicts(result) -> List[Dict[str, Any]]:
+    """Convert a QueryResult/ForecastResult into dicts keyed by lower-case column name"""
+    if result is None or not result.columns:
+        return []
+    names = [column.name.lower() for column in result.columns]
+    if result.next_link:
+        logger.warning("Cost query result was truncated; narrow the time period for full coverage")
+    return [dict(zip(names, row)) for row in result.rows or []]
+
+
+def _split_resource_id(resource_id: str) -> Dict[str, str]:
+    """Derive resource group and type from an ARM resource ID"""
+    parts = (resource_id or '').strip('/').split('/')
+    resource_group = ''
+    resource_type = ''
+    lowered = [p.lower() for p in parts]
+    if 'resourcegroups' in lowered:
+        resource_group = parts[lowered.index('resourcegroups') + 1].lower()
+    if 'providers' in lowered:
+        index = lowered.index('providers')
+        provider_parts = parts[index + 1:]
+        # namespace/type/name[/subtype/name...] -> namespace/type[/subtype...]
+        resource_type = '/'.join([provider_parts[0]] + provider_parts[1::2]).lower() if provider_parts else ''
+    return {'resource_group': resource_group, 'resource_type': resource_type}
+
+
+class CostEngine:
+    """Queries Cost Management at daily granularity and serves rollups from a local store"""
+
+    def __init__(self, cost_client, subscription_id: str, db_path: Optional[str] = None,
+                 refresh_hours: Optional[float] = None, tag_keys: Optional[List[str]] = None,
+                 history_days: int = 30):
+        self.cost_client = cost_client
+        self.scope = f"/subscriptions/{subscription_id}"
+        self.db_path = db_path or os.getenv('AZURE_COST_DB', 'cost_cache.db')
+        self.refresh_seconds = 3600 * (refresh_hours if refresh_hours is not None
+                                       else float(os.getenv('AZURE_COST_REFRESH_HOURS', '6')))
+        self.tag_keys = tag_keys if tag_keys is not None else [
+            key.strip() for key in os.getenv('AZURE_COST_TAG_KEYS', '').split(',') if key.strip()
+        ]
+        self.history_days = history_days
+        self._refresh_lock = threading.Lock()
+        self._rollup_cache = {}
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _get_meta(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def last_refresh(self) -> Optional[float]:
+        """Unix timestamp of the last successful refresh, shared by every worker"""
+        with self._connect() as conn:
+            value = self._get_meta(conn, 'last_refresh')
+        return float(value) if value else None
+
+    def is_stale(self) -> bool:
+        last = self.last_refresh()
+        return last is None or time.time() - last > self.refresh_seconds
+
+    def _claim_refresh(self) -> bool:
+        """Take a short cross-process lease so only one worker queries Cost Management"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            lease = self._get_meta(conn, 'refresh_lease')
+            if lease and now - float(lease) < 600:
+                conn.rollback()
+                return False
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('refresh_lease', ?)", (str(now),))
+            conn.commit()
+        return True
+
+    def _query_actual(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        definition = QueryDefinition(
+            type='ActualCost',
+            timeframe='Custom',
+            time_period=QueryTimePeriod(from_property=start, to=end),
+            dataset=QueryDataset(
+                granularity='Daily',
+                aggregation={'totalCost': QueryAggregation(name='Cost', function='Sum')},
+                grouping=[
+                    QueryGrouping(type='Dimension', name='ResourceId'),
+                    QueryGrouping(type='Dimension', name='ResourceLocation')
+                ]
+            )
+        )
+        with arm_call("cost.query_usage"):
+            return _rows_as_dicts(self.cost_client.query.usage(self.scope, definition))
+
+    def _query_tag(self, tag_key: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        definition = QueryDefinition(
+            type='ActualCost',
+            timeframe='Custom',
+            time_period=QueryTimePeriod(from_property=start, to=end),
+            dataset=QueryDataset(
+                granularity='Daily',
+                aggregation={'totalCost': QueryAggregation(name='Cost', function='Sum')},
+                grouping=[QueryGrouping(type='TagKey', name=tag_key)]
+            )
+        )
+        with arm_call("cost.query_usage_by_tag"):
+            return _rows_as_dicts(self.cost_client.query.usage(self.scope, definition))
+
+    def _query_forecast(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        definition = ForecastDefinition(
+            type='ActualCost',
+            timeframe='Custom',
+            time_period=ForecastTimePeriod(from_property=start, to=end),
+            dataset=ForecastDataset(
+                granularity='Daily',
+                aggregation={'totalCost': ForecastAggregation(name='Cost', function='Sum')}
+            ),
+            include_actual_cost=False,
+            include_fresh_partial_cost=False
+        )
+        with arm_call("cost.forecast_usage"):
+            return _rows_as_dicts(self.cost_client.forecast.usage(self.scope, definition))
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Pull actual and forecast cost into the local store
+
+        Returns:
+            bool: True if the store was refreshed
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            if not force and not self.is_stale():
+                return False
+            if not self._claim_refresh():
+                return False
+
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            start = today - timedelta(days=self.history_days)
+            month_end = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
+
+            actual_rows = []
+            for row in self._query_actual(start, today + timedelta(days=1)):
+                resource_id = (row.get('resourceid') or '').lower()
+                parts = _split_resource_id(resource_id)
+                actual_rows.append((
+                    'actual',
+                    _parse_usage_date(row.get('usagedate')),
+                    resource_id,
+                    parts['resource_group'],
+                    parts['resource_type'],
+                    (row.get('resourcelocation') or '').lower(),
+                    float(row.get('cost') or row.get('pretaxcost') or 0),
+                    row.get('currency')
+                ))
+
+            forecast_rows = []
+            if today < month_end:
+                for row in self._query_forecast(today, month_end):
+                    forecast_rows.append((
+                        'forecast',
+                        _parse_usage_date(row.get('usagedate')),
+                        None, None, None, None,
+                        float(row.get('cost') or row.get('pretaxcost') or 0),
+                        row.get('currency')
+                    ))
+
+            tag_rows = []
+            for tag_key in self.tag_keys:
+                for row in self._query_tag(tag_key, start, today + timedelta(days=1)):
+                    tag_rows.append((
+                        _parse_usage_date(row.get('usagedate')),
+                        tag_key,
+                        row.get('tagvalue'),
+                        float(row.get('cost') or row.get('pretaxcost') or 0),
+                        row.get('currency')
+                    ))
+
+            with self._connect() as conn:
+                conn.execute('DELETE FROM cost_rows')
+                conn.execute('DELETE FROM cost_tags')
+                conn.executemany('INSERT INTO cost_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)', actual_rows + forecast_rows)
+                conn.executemany('INSERT INTO cost_tags VALUES (?, ?, ?, ?, ?)', tag_rows)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_refresh', ?)", (str(time.time()),))
+                conn.execute("DELETE FROM meta WHERE key = 'refresh_lease'")
+
+            logger.info(f"Cost store refreshed: {len(actual_rows)} actual, {len(forecast_rows)} forecast, "
+                        f"{len(tag_rows)} tag rows")
+            return True
+
+        except Exception as e:
+            logger.error(f"Cost refresh failed: {e}")
+            with self._connect() as conn:
+                conn.execute("DELETE FROM meta WHERE key = 'refresh_lease'")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(self):
+        """Start a refresh thread if the store is stale; never blocks the caller"""
+        if self.is_stale() and not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def _load(self, sql: str, params: tuple) -> Dict[str, np.ndarray]:
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return {'key': np.array([], dtype=object), 'cost': np.array([], dtype=float)}
+        keys, costs = zip(*rows)
+        return {
+            'key': np.array([k or '' for k in keys], dtype=object),
+            'cost': np.array(costs, dtype=float)
+        }
+
+    def rollup(self, by: str = 'resource_group', kind: str = 'actual',
+               days: Optional[int] = None, tag_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate stored cost by a dimension
+
+        Args:
+            by: 'resource_group', 'type', 'location', 'resource' or 'tag'
+            kind: 'actual' or 'forecast' (ignored for tag rollups)
+            days: only include the most recent N days
+            tag_key: tag key to roll up when by='tag'
+
+        Returns:
+            list of {'key', 'cost'} dicts sorted by descending cost
+        """
+        version = self.last_refresh()
+        cache_key = (by, kind, days, tag_key, version)
+        if cache_key in self._rollup_cache:
+            record_cache('cost_rollup', True)
+            return self._rollup_cache[cache_key]
+        record_cache('cost_rollup', False)
+
+        since = '0000-00-00'
+        if days:
+            since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        if by == 'tag':
+            data = self._load(
+                'SELECT tag_value, cost FROM cost_tags WHERE tag_key = ? AND usage_date >= ?',
+                (tag_key, since)
+            )
+        elif by in ROLLUP_DIMENSIONS:
+            column = ROLLUP_DIMENSIONS[by]
+            data = self._load(
+                f'SELECT {column}, cost FROM cost_rows WHERE kind = ? AND usage_date >= ?',
+                (kind, since)
+            )
+        else:
+            raise ValueError(f"Unsupported rollup dimension: {by}")
+
+        if data['cost'].size:
+            unique_keys, inverse = np.unique(data['key'].astype(str), return_inverse=True)
+            totals = np.bincount(inverse, weights=data['cost'])
+            order = np.argsort(totals)[::-1]
+            result = [{'key': str(unique_keys[i]), 'cost': round(float(totals[i]), 2)} for i in order]
+        else:
+            result = []
+
+        # Drop entries from older refreshes so the cache stays bounded
+        self._rollup_cache = {k: v for k, v in self._rollup_cache.items() if k[-1] == version}
+        self._rollup_cache[cache_key] = result
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """Month-to-date, forecast and top resource groups for the dashboard cost card"""
+        self.refresh_in_background()
+
+        month_start = datetime.now(timezone.utc).strftime('%Y-%m-01')
+        with self._connect() as conn:
+            month_to_date = conn.execute(
+                "SELECT COALESCE(SUM(cost), 0) FROM cost_rows WHERE kind = 'actual' AND usage_date >= ?",
+                (month_start,)
+            ).fetchone()[0]
+            remaining = conn.execute(
+                "SELECT COALESCE(SUM(cost), 0) FROM cost_rows WHERE kind = 'forecast'"
+            ).fetchone()[0]
+            currency_row = conn.execute(
+                'SELECT currency FROM cost_rows WHERE currency IS NOT NULL LIMIT 1'
+            ).fetchone()
+
+        last = self.last_refresh()
+        return {
+            'currency': currency_row[0] if currency_row else 'USD',
+            'month_to_date': round(month_to_date, 2),
+            'forecast_month_end': round(month_to_date + remaining, 2),
+            'top_resource_groups': self.rollup('resource_group', days=30)[:5],
+            'last_refresh': datetime.fromtimestamp(last, timezone.utc).isoformat() if last else None,
+            'stale': self.is_stale()
+        }
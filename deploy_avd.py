@@ -8,7 +8,7 @@ import os
 import json
 import time
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from azure.identity import ClientSecretCredential
 from azure.mgmt.resource import ResourceManagementClient
@@ -16,9 +16,13 @@ from azure.mgmt.network import NetworkManagementClient
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.desktopvirtualization import DesktopVirtualizationMgmtClient
 from azure.mgmt.storage import StorageManagementClient
-from azure.core.exceptions import AzureError
+from azure.core.exceptions import AzureError, ResourceNotFoundError
 from dotenv import load_dotenv
 import click
+
+from azure_manager import arm_client_options
+from deploy_graph import DeploymentGraph, DeploymentFailed, DEFAULT_MAX_WORKERS
+from deploy_plan import PlannedResource, plan, steps_to_apply, CREATE, UPDATE, NO_CHANGE
 from rich.console import Console
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
@@ -28,6 +32,10 @@ load_dotenv()
 
 console = Console()
 
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "avd_arm_template.json")
+# How often a template deployment's per-resource operations are listed while it runs
+DEPLOYMENT_STATUS_INTERVAL = float(os.getenv('AVD_DEPLOYMENT_STATUS_INTERVAL', '5'))
+
 class AVDDeployer:
     def __init__(self):
         self.tenant_id = os.getenv('AZURE_TENANT_ID')
@@ -45,12 +53,13 @@ class AVDDeployer:
             client_secret=self.client_secret
         )
         
-        # Initialize clients
-        self.resource_client = ResourceManagementClient(self.credential, self.subscription_id)
-        self.network_client = NetworkManagementClient(self.credential, self.subscription_id)
-        self.compute_client = ComputeManagementClient(self.credential, self.subscription_id)
-        self.avd_client = DesktopVirtualizationMgmtClient(self.credential, self.subscription_id)
-        self.storage_client = StorageManagementClient(self.credential, self.subscription_id)
+        # Initialize clients (AZURE_ARM_ENDPOINT can point them at a local fake_arm.py server)
+        options = arm_client_options()
+        self.resource_client = ResourceManagementClient(self.credential, self.subscription_id, **options)
+        self.network_client = NetworkManagementClient(self.credential, self.subscription_id, **options)
+        self.compute_client = ComputeManagementClient(self.credential, self.subscription_id, **options)
+        self.avd_client = DesktopVirtualizationMgmtClient(self.credential, self.subscription_id, **options)
+        self.storage_client = StorageManagementClient(self.credential, self.subscription_id, **options)
         
         # AVD Configuration
         self.location = "eastus"  # Free tier friendly location
@@ -61,6 +70,49 @@ class AVDDeployer:
         self.workspace_name = "avd-workspace"
         self.app_group_name = "avd-app-group"
         
+    def resource_group_params(self) -> Dict:
+        return {"location": self.location}
+    
+    def virtual_network_params(self) -> Dict:
+        return {
+            "location": self.location,
+            "address_space": {
+                "address_prefixes": ["10.0.0.0/16"]
+            },
+            "subnets": [
+                {
+                    "name": self.subnet_name,
+                    "address_prefix": "10.0.1.0/24"
+                }
+            ]
+        }
+    
+    def host_pool_params(self) -> Dict:
+        return {
+            "location": self.location,
+            "host_pool_type": "Pooled",
+            "load_balancer_type": "BreadthFirst",
+            "max_session_limit": 10,
+            "personal_desktop_assignment_type": "Automatic",
+            "registration_info": {
+                "expiration_time": (datetime.now() + timedelta(days=30)).isoformat(),
+                "registration_token_operation": "Update"
+            }
+        }
+    
+    def workspace_params(self) -> Dict:
+        return {
+            "location": self.location,
+            "description": "AVD Workspace for Free Tier"
+        }
+    
+    def application_group_params(self) -> Dict:
+        return {
+            "location": self.location,
+            "host_pool_arm_path": f"/subscriptions/{self.subscription_id}/resourceGroups/{self.resource_group_name}/providers/Microsoft.DesktopVirtualization/hostPools/{self.host_pool_name}",
+            "application_group_type": "Desktop"
+        }
+    
     def create_resource_group(self):
         """Create resource group for AVD"""
         console.print(f"[bold blue]Creating resource group: {self.resource_group_name}[/bold blue]")
@@ -68,7 +120,7 @@ class AVDDeployer:
         try:
             resource_group = self.resource_client.resource_groups.create_or_update(
                 self.resource_group_name,
-                {"location": self.location}
+                self.resource_group_params()
             )
             console.print(f"[green]✓ Resource group created: {resource_group.name}[/green]")
             return resource_group
@@ -80,18 +132,7 @@ class AVDDeployer:
         """Create virtual network for AVD"""
         console.print(f"[bold blue]Creating virtual network: {self.vnet_name}[/bold blue]")
         
-        vnet_params = {
-            "location": self.location,
-            "address_space": {
-                "address_prefixes": ["10.0.0.0/16"]
-            },
-            "subnets": [
-                {
-                    "name": self.subnet_name,
-                    "address_prefix": "10.0.1.0/24"
-                }
-            ]
-        }
+        vnet_params = self.virtual_network_params()
         
         try:
             vnet_poller = self.network_client.virtual_networks.begin_create_or_update(
@@ -110,17 +151,7 @@ class AVDDeployer:
         """Create AVD host pool"""
         console.print(f"[bold blue]Creating AVD host pool: {self.host_pool_name}[/bold blue]")
         
-        host_pool_params = {
-            "location": self.location,
-            "host_pool_type": "Pooled",
-            "load_balancer_type": "BreadthFirst",
-            "max_session_limit": 10,
-            "personal_desktop_assignment_type": "Automatic",
-            "registration_info": {
-                "expiration_time": (datetime.now() + timedelta(days=30)).isoformat(),
-                "registration_token_operation": "Update"
-            }
-        }
+        host_pool_params = self.host_pool_params()
         
         try:
             host_pool = self.avd_client.host_pools.create_or_update(
@@ -139,10 +170,7 @@ class AVDDeployer:
         """Create AVD workspace"""
         console.print(f"[bold blue]Creating AVD workspace: {self.workspace_name}[/bold blue]")
         
-        workspace_params = {
-            "location": self.location,
-            "description": "AVD Workspace for Free Tier"
-        }
+        workspace_params = self.workspace_params()
         
         try:
             workspace = self.avd_client.workspaces.create_or_update(
@@ -160,11 +188,7 @@ class AVDDeployer:
         """Create AVD application group"""
         console.print(f"[bold blue]Creating AVD application group: {self.app_group_name}[/bold blue]")
         
-        app_group_params = {
-            "location": self.location,
-            "host_pool_arm_path": f"/subscriptions/{self.subscription_id}/resourceGroups/{self.resource_group_name}/providers/Microsoft.DesktopVirtualization/hostPools/{self.host_pool_name}",
-            "application_group_type": "Desktop"
-        }
+        app_group_params = self.application_group_params()
         
         try:
             app_group = self.avd_client.application_groups.create_or_update(
@@ -230,26 +254,116 @@ class AVDDeployer:
                 console.print(f"[red]✗ Failed to create VM {vm_name}: {e}[/red]")
                 raise
     
-    def deploy_avd_infrastructure(self):
-        """Deploy complete AVD infrastructure"""
+    def state_file(self) -> str:
+        """Default checkpoint file for this resource group"""
+        return f".avd-deploy-{self.resource_group_name}.json"
+    
+    def plan_resources(self) -> List[PlannedResource]:
+        """Desired state of every resource the deployment writes, keyed by the step that writes it"""
+        rg = self.resource_group_name
+        resources = [
+            PlannedResource("resource_group", "Resource group", rg, self.resource_group_params(),
+                            lambda: self.resource_client.resource_groups.get(rg)),
+            PlannedResource("virtual_network", "Virtual network", self.vnet_name, self.virtual_network_params(),
+                            lambda: self.network_client.virtual_networks.get(rg, self.vnet_name)),
+            # The registration token expiry is set relative to now on every run; tokens are renewed separately
+            PlannedResource("host_pool", "Host pool", self.host_pool_name, self.host_pool_params(),
+                            lambda: self.avd_client.host_pools.get(rg, self.host_pool_name),
+                            ignore=["registration_info"]),
+            PlannedResource("workspace", "Workspace", self.workspace_name, self.workspace_params(),
+                            lambda: self.avd_client.workspaces.get(rg, self.workspace_name)),
+            PlannedResource("application_group", "Application group", self.app_group_name,
+                            self.application_group_params(),
+                            lambda: self.avd_client.application_groups.get(rg, self.app_group_name))
+        ]
+        # deploy_session_hosts only prepares VM configurations and writes nothing, so it isn't planned
+        return resources
+    
+    def print_plan(self, resources: List[PlannedResource]):
+        table = Table(title=f"Deployment Plan ({self.resource_group_name})")
+        table.add_column("Resource", style="cyan")
+        table.add_column("Name", style="blue")
+        table.add_column("Action")
+        table.add_column("Changes", style="dim")
+        styles = {CREATE: "[green]+ create[/green]", UPDATE: "[yellow]~ update[/yellow]", NO_CHANGE: "[dim]= no change[/dim]"}
+        for resource in resources:
+            if resource.error:
+                changes = f"could not read current state: {resource.error}"
+            else:
+                changes = "\n".join(f"{path}: {current!r} → {desired!r}" for path, current, desired in resource.changes)
+            table.add_row(resource.resource_type, resource.name, styles[resource.action], changes)
+        console.print(table)
+        counts = {action: sum(1 for r in resources if r.action == action) for action in (CREATE, UPDATE, NO_CHANGE)}
+        console.print(f"[bold]Plan:[/bold] {counts[CREATE]} to create, {counts[UPDATE]} to update, "
+                      f"{counts[NO_CHANGE]} unchanged")
+    
+    def build_graph(self, session_hosts: int = 1, state_file: Optional[str] = None,
+                    parallelism: int = DEFAULT_MAX_WORKERS, unchanged: Optional[set] = None) -> DeploymentGraph:
+        """Deployment steps and their dependencies; steps in unchanged are kept for ordering but write nothing"""
+        # Any change here makes an existing checkpoint stale
+        fingerprint = {
+            "subscription_id": self.subscription_id,
+            "location": self.location,
+            "resource_group": self.resource_group_name,
+            "vnet": self.vnet_name,
+            "host_pool": self.host_pool_name,
+            "workspace": self.workspace_name,
+            "app_group": self.app_group_name,
+            "session_hosts": session_hosts
+        }
+        unchanged = unchanged or set()
+        graph = DeploymentGraph(state_file or self.state_file(), fingerprint, max_workers=parallelism)
+        
+        def step(name, func, depends_on=()):
+            if name in unchanged:
+                func = lambda: console.print(f"[dim]= {name} is up to date[/dim]")
+            graph.add(name, func, depends_on)
+        
+        step("resource_group", self.create_resource_group)
+        step("virtual_network", self.create_virtual_network, depends_on=["resource_group"])
+        step("host_pool", self.create_host_pool, depends_on=["resource_group"])
+        step("workspace", self.create_workspace, depends_on=["resource_group"])
+        step("application_group", self.create_application_group, depends_on=["host_pool"])
+        step("session_hosts", lambda: self.deploy_session_hosts(count=session_hosts),
+             depends_on=["virtual_network", "host_pool"])
+        return graph
+    
+    def deploy_avd_infrastructure(self, session_hosts: int = 1, state_file: Optional[str] = None,
+                                  resume: bool = True, parallelism: int = DEFAULT_MAX_WORKERS,
+                                  plan_only: bool = False, use_plan: bool = True):
+        """
+        Deploy complete AVD infrastructure
+        
+        The current state is read first and only steps with resources to create or
+        update are applied (use_plan=False writes everything). Independent steps
+        (virtual network, host pool, workspace) run concurrently. Finished steps are
+        checkpointed, so re-running after a failure resumes where it stopped unless
+        resume is False.
+        
+        Returns:
+            the planned resources (None with use_plan=False)
+        """
         console.print("[bold green]🚀 Starting AVD Deployment for Azure Free Tier[/bold green]")
         console.print(f"[blue]Location: {self.location}[/blue]")
         console.print(f"[blue]Resource Group: {self.resource_group_name}[/blue]")
         
+        resources, unchanged = None, set()
+        if use_plan or plan_only:
+            with console.status("[bold green]Reading current state..."):
+                resources = plan(self.plan_resources(), max_workers=max(parallelism, 1) * 2)
+            self.print_plan(resources)
+            if plan_only:
+                return resources
+            unchanged = {r.step for r in resources} - steps_to_apply(resources)
+            if not steps_to_apply(resources):
+                self.build_graph(session_hosts, state_file, parallelism).clear_checkpoint()
+                console.print("[bold green]✅ AVD infrastructure is up to date; nothing to apply.[/bold green]")
+                return resources
+        
+        graph = self.build_graph(session_hosts, state_file, parallelism, unchanged)
         try:
-            # Step 1: Create resource group
-            self.create_resource_group()
-            
-            # Step 2: Create virtual network
-            self.create_virtual_network()
-            
-            # Step 3: Create AVD components
-            self.create_host_pool()
-            self.create_workspace()
-            self.create_application_group()
-            
-            # Step 4: Deploy session hosts (minimal for free tier)
-            self.deploy_session_hosts(count=1)
+            graph.run(resume=resume,
+                      on_skip=lambda step: console.print(f"[dim]↷ {step} already completed, skipping (checkpoint)[/dim]"))
             
             console.print("[bold green]✅ AVD Infrastructure deployment completed![/bold green]")
             console.print("\n[bold yellow]Next Steps:[/bold yellow]")
@@ -257,20 +371,195 @@ class AVDDeployer:
             console.print("2. Configure user access")
             console.print("3. Test connectivity")
             console.print("4. Monitor costs in Azure portal")
+            return resources
             
+        except DeploymentFailed as e:
+            console.print(f"[bold red]❌ Deployment failed: {e}[/bold red]")
+            console.print(f"[yellow]Completed steps are saved in {graph.state_file}; run again to resume.[/yellow]")
+            raise
         except Exception as e:
             console.print(f"[bold red]❌ Deployment failed: {e}[/bold red]")
             raise
 
+    # Template deployment: the whole stack in one ARM deployment
+    
+    def template_parameters(self) -> Dict:
+        """avd_arm_template.json parameters rendered from this deployer's configuration"""
+        values = {
+            "location": self.location,
+            "resourceGroupName": self.resource_group_name,
+            "vnetName": self.vnet_name,
+            "subnetName": self.subnet_name,
+            "hostPoolName": self.host_pool_name,
+            "workspaceName": self.workspace_name,
+            "applicationGroupName": self.app_group_name,
+            "tokenExpirationTime": (datetime.now(timezone.utc) + timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
+        return {name: {"value": value} for name, value in values.items()}
+    
+    def template_deployment(self) -> Dict:
+        with open(TEMPLATE_FILE) as f:
+            template = json.load(f)
+        return {"properties": {"mode": "Incremental", "template": template, "parameters": self.template_parameters()}}
+    
+    def _resource_group_exists(self) -> bool:
+        try:
+            self.resource_client.resource_groups.get(self.resource_group_name)
+            return True
+        except ResourceNotFoundError:
+            return False
+    
+    def validate_template(self, deployment_name: str) -> bool:
+        """Pre-flight validation; needs the resource group to exist"""
+        console.print(f"[bold blue]Validating template deployment: {deployment_name}[/bold blue]")
+        try:
+            result = self.resource_client.deployments.begin_validate(
+                self.resource_group_name, deployment_name, self.template_deployment()
+            ).result()
+        except AzureError as e:
+            console.print(f"[red]✗ Template validation failed: {e}[/red]")
+            return False
+        if result.error:
+            console.print(f"[red]✗ Template validation failed: {result.error.code}: {result.error.message}[/red]")
+            return False
+        validated = (result.properties.validated_resources or []) if result.properties else []
+        console.print(f"[green]✓ Template is valid ({len(validated)} resources)[/green]")
+        return True
+    
+    def what_if_template(self, deployment_name: str):
+        """Show the changes ARM would make, without making them"""
+        table = Table(title=f"What-if ({self.resource_group_name})")
+        table.add_column("Change")
+        table.add_column("Resource", style="cyan")
+        styles = {"Create": "[green]+ create[/green]", "Modify": "[yellow]~ modify[/yellow]",
+                  "Delete": "[red]- delete[/red]", "NoChange": "[dim]= no change[/dim]",
+                  "Ignore": "[dim]ignore[/dim]", "Deploy": "[yellow]! deploy[/yellow]"}
+        
+        if not self._resource_group_exists():
+            # What-if runs at resource group scope, so a new group means everything is created
+            with open(TEMPLATE_FILE) as f:
+                resources = json.load(f)["resources"]
+            console.print(f"[yellow]Resource group {self.resource_group_name} does not exist yet; "
+                          f"it and every template resource would be created.[/yellow]")
+            for resource in resources:
+                table.add_row(styles["Create"], resource["type"])
+            console.print(table)
+            return
+        
+        with console.status("[bold green]Running what-if..."):
+            result = self.resource_client.deployments.begin_what_if(
+                self.resource_group_name, deployment_name,
+                {"properties": self.template_deployment()["properties"]}
+            ).result()
+        for change in result.changes or []:
+            change_type = getattr(change.change_type, "value", change.change_type)
+            table.add_row(styles.get(change_type, change_type), change.resource_id.split("/providers/", 1)[-1])
+        console.print(table)
+    
+    def _report_operations(self, deployment_name: str, seen: Dict[str, str]) -> List[str]:
+        """Print per-resource operation state changes; returns failure messages"""
+        failures = []
+        for operation in self.resource_client.deployment_operations.list(self.resource_group_name, deployment_name):
+            properties = operation.properties
+            target = properties.target_resource if properties else None
+            if target is None:
+                continue
+            state = properties.provisioning_state
+            label = f"{target.resource_type} {target.resource_name}"
+            if state == "Failed":
+                error = getattr(properties.status_message, "error", None)
+                message = f"{error.code}: {error.message}" if error else str(properties.status_message)
+                failures.append(f"{label}: {message}")
+            if seen.get(operation.operation_id) == state:
+                continue
+            seen[operation.operation_id] = state
+            if state == "Succeeded":
+                console.print(f"[green]✓ {label} ({properties.duration})[/green]")
+            elif state == "Failed":
+                console.print(f"[red]✗ {label}: {failures[-1].split(': ', 1)[-1]}[/red]")
+            else:
+                console.print(f"[blue]… {label}: {state}[/blue]")
+        return failures
+    
+    def deploy_template(self, deployment_name: Optional[str] = None, validate_only: bool = False,
+                        what_if: bool = False):
+        """
+        Deploy avd_arm_template.json as a single ARM deployment
+        
+        ARM schedules the resources server-side by their dependsOn, so independent
+        resources provision in parallel with one client request. Per-resource
+        progress comes from the deployment operations list.
+        """
+        deployment_name = deployment_name or f"avd-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        console.print("[bold green]🚀 Starting AVD template deployment[/bold green]")
+        console.print(f"[blue]Location: {self.location}[/blue]")
+        console.print(f"[blue]Resource Group: {self.resource_group_name}[/blue]")
+        
+        if what_if:
+            self.what_if_template(deployment_name)
+            return None
+        if validate_only:
+            if not self._resource_group_exists():
+                console.print(f"[yellow]Resource group {self.resource_group_name} does not exist; "
+                              f"validation runs against an existing group.[/yellow]")
+                return None
+            return self.validate_template(deployment_name)
+        
+        self.create_resource_group()
+        console.print(f"[bold blue]Submitting deployment: {deployment_name}[/bold blue]")
+        start = time.perf_counter()
+        poller = self.resource_client.deployments.begin_create_or_update(
+            self.resource_group_name, deployment_name, self.template_deployment()
+        )
+        
+        seen = {}
+        try:
+            while not poller.done():
+                poller.wait(DEPLOYMENT_STATUS_INTERVAL)
+                self._report_operations(deployment_name, seen)
+            deployment = poller.result()
+        except AzureError as e:
+            failures = self._report_operations(deployment_name, seen)
+            console.print(f"[bold red]❌ Deployment {deployment_name} failed: {str(e).splitlines()[0]}[/bold red]")
+            for failure in failures:
+                console.print(f"[red]  - {failure}[/red]")
+            raise
+        self._report_operations(deployment_name, seen)
+        
+        state = deployment.properties.provisioning_state
+        if state != "Succeeded":
+            raise RuntimeError(f"Deployment {deployment_name} finished in state {state}")
+        console.print(f"[bold green]✅ Template deployment completed in {time.perf_counter() - start:.1f}s[/bold green]")
+        for name, output in (deployment.properties.outputs or {}).items():
+            console.print(f"  {name}: {output.get('value')}")
+        return deployment
+
 @click.command()
 @click.option('--session-hosts', default=1, help='Number of session hosts to deploy (default: 1)')
 @click.option('--location', default='eastus', help='Azure region (default: eastus)')
-def main(session_hosts: int, location: str):
+@click.option('--parallelism', default=DEFAULT_MAX_WORKERS, help=f'Steps run at once (default: {DEFAULT_MAX_WORKERS})')
+@click.option('--state-file', help='Checkpoint file (default: .avd-deploy-<resource group>.json)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and run every step')
+@click.option('--plan', 'plan_only', is_flag=True, help='Show what would change and exit without writing')
+@click.option('--no-diff', is_flag=True, help='Write every resource without reading current state first')
+@click.option('--mode', type=click.Choice(['sdk', 'template']), default='sdk',
+              help='sdk: one call per resource (default); template: avd_arm_template.json as one deployment')
+@click.option('--validate', 'validate_only', is_flag=True, help='Template mode: pre-flight validation only')
+def main(session_hosts: int, location: str, parallelism: int, state_file: Optional[str], restart: bool,
+         plan_only: bool, no_diff: bool, mode: str, validate_only: bool):
     """Deploy Azure Virtual Desktop infrastructure"""
+    if validate_only and mode != 'template':
+        raise click.UsageError("--validate requires --mode template")
     try:
         deployer = AVDDeployer()
         deployer.location = location
-        deployer.deploy_avd_infrastructure()
+        if mode == 'template':
+            # --plan is ARM's what-if in template mode
+            if deployer.deploy_template(validate_only=validate_only, what_if=plan_only) is False:
+                exit(1)
+            return
+        deployer.deploy_avd_infrastructure(session_hosts, state_file, resume=not restart, parallelism=parallelism,
+                                           plan_only=plan_only, use_plan=not no_diff)
     except Exception as e:
         console.print(f"[bold red]Deployment failed: {e}[/bold red]")
         exit(1)
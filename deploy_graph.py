@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Deployment Graph
+Runs deployment steps in dependency order, independent steps concurrently, and
+checkpoints finished steps to a state file so a failed run can resume
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+DEFAULT_MAX_WORKERS = 4
+
+
+class DeploymentFailed(Exception):
+    """One or more steps failed; finished steps are checkpointed for the next run"""
+
+    def __init__(self, failed: Dict[str, str], blocked: List[str]):
+        self.failed = failed
+        self.blocked = blocked
+        details = "; ".join(f"{name}: {error}" for name, error in failed.items())
+        message = f"{len(failed)} step(s) failed ({details})"
+        if blocked:
+            message += f"; not started: {', '.join(blocked)}"
+        super().__init__(message)
+
+
+class Step:
+    def __init__(self, name: str, func: Callable[[], Any], depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class DeploymentGraph:
+    """
+    A DAG of named steps
+
+    A step starts once all of its dependencies have succeeded. When a step
+    fails, nothing that depends on it starts, but every other step still runs
+    (and is checkpointed); run() then raises DeploymentFailed.
+
+    The state file records succeeded steps together with a fingerprint of the
+    deployment's configuration. A later run with the same fingerprint skips
+    those steps; a different fingerprint starts over. The file is removed once
+    every step has succeeded.
+    """
+
+    def __init__(self, state_file: Optional[str] = None, fingerprint: Optional[Dict[str, Any]] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS):
+        self.state_file = state_file
+        self.fingerprint = fingerprint or {}
+        self.max_workers = max_workers
+        self.steps: Dict[str, Step] = {}
+        self._state_lock = threading.Lock()
+        self._completed: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, func: Callable[[], Any], depends_on: Iterable[str] = ()) -> 'DeploymentGraph':
+        if name in self.steps:
+            raise ValueError(f"Duplicate step: {name}")
+        self.steps[name] = Step(name, func, depends_on)
+        return self
+
+    def order(self) -> List[str]:
+        """Steps in a valid serial order; raises ValueError on unknown dependencies or cycles"""
+        for step in self.steps.values():
+            unknown = [d for d in step.depends_on if d not in self.steps]
+            if unknown:
+                raise ValueError(f"Step {step.name} depends on unknown step(s): {', '.join(unknown)}")
+
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.steps[name].depends_on:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(name)
+
+        for name in self.steps:
+            visit(name, [])
+        return ordered
+
+    # Checkpointing
+
+    def load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        """Succeeded steps from a previous run of the same configuration"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable deployment state {self.state_file}: {e}")
+            return {}
+        if state.get('version') != STATE_VERSION or state.get('fingerprint') != self.fingerprint:
+            logger.warning(f"Deployment state {self.state_file} is for a different configuration; starting over")
+            return {}
+        return {name: entry for name, entry in state.get('steps', {}).items() if name in self.steps}
+
+    def _save_checkpoint(self):
+        if not self.state_file:
+            return
+        state = {'version': STATE_VERSION, 'fingerprint': self.fingerprint, 'steps': self._completed}
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.deploy-state.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, indent=2, default=str)
+            os.replace(tmp_path, self.state_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear_checkpoint(self):
+        if self.state_file and os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+    # Execution
+
+    def _run_step(self, step: Step) -> Any:
+        start = time.perf_counter()
+        result = step.func()
+        with self._state_lock:
+            self._completed[step.name] = {
+                'finished_at': datetime.now(timezone.utc).isoformat(),
+                'seconds': round(time.perf_counter() - start, 2)
+            }
+            self._save_checkpoint()
+        return result
+
+    def run(self, resume: bool = True, on_skip: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Run every step not already checkpointed
+
+        Returns:
+            step name -> return value (None for steps skipped from the checkpoint)
+        """
+        self.order()
+        self._completed = self.load_checkpoint() if resume else {}
+        results: Dict[str, Any] = {}
+        for name in self._completed:
+            results[name] = None
+            if on_skip is not None:
+                on_skip(name)
+
+        pending = {name: step for name, step in self.steps.items() if name not in self._completed}
+        failed: Dict[str, str] = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='deploy') as executor:
+            while True:
+                # Dependents of a failed step never become ready and stay pending
+                for name, step in [*pending.items()]:
+                    if all(d in self._completed for d in step.depends_on):
+                        running[executor.submit(self._run_step, step)] = name
+                        del pending[name]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        failed[name] = str(e).splitlines()[0] if str(e) else repr(e)
+
+        if failed:
+            raise DeploymentFailed(failed, [*pending])
+        self.clear_checkpoint()
+        return results
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Deployment Plan
+Reads the current state of a deployment's resources in one concurrent pass and
+diffs it against the desired parameters, so only changed resources are written
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+DEFAULT_READ_WORKERS = 8
+
+CREATE = 'create'
+UPDATE = 'update'
+NO_CHANGE = 'no-op'
+
+
+class PlannedResource:
+    """
+    Desired state of one resource
+
+    read() returns the current SDK model, or raises ResourceNotFoundError.
+    Keys in ignore (dotted paths, e.g. 'registration_info') are never diffed,
+    for values that legitimately differ on every run.
+    """
+
+    def __init__(self, step: str, resource_type: str, name: str, params: Dict[str, Any],
+                 read: Callable[[], Any], ignore: Iterable[str] = ()):
+        self.step = step
+        self.resource_type = resource_type
+        self.name = name
+        self.params = params
+        self.read = read
+        self.ignore = set(ignore)
+        self.action: Optional[str] = None
+        self.changes: List[Tuple[str, Any, Any]] = []
+        self.error: Optional[str] = None
+
+
+def _normalise(path: str, value: Any) -> Any:
+    if isinstance(value, str):
+        # ARM returns display names for locations and may re-case resource IDs
+        if path.split('.')[-1] == 'location':
+            return value.replace(' ', '').lower()
+        if value.lower().startswith('/subscriptions/'):
+            return value.lower()
+    if hasattr(value, 'value'):  # SDK enums
+        return value.value
+    return value
+
+
+def diff(desired: Any, current: Any, path: str = '', ignore: Iterable[str] = ()) -> List[Tuple[str, Any, Any]]:
+    """
+    Differences between desired and current as (path, current, desired)
+
+    Only what desired specifies is compared: extra keys, list items and
+    server-populated fields in current are not changes. List items that are
+    dicts with a 'name' are matched by name, others by position.
+    """
+    ignore = set(ignore)
+    if path in ignore:
+        return []
+    if isinstance(desired, dict):
+        current = current if isinstance(current, dict) else {}
+        changes = []
+        for key, value in desired.items():
+            child = f"{path}.{key}" if path else key
+            changes.extend(diff(value, current.get(key), child, ignore))
+        return changes
+    if isinstance(desired, list):
+        current = current if isinstance(current, list) else []
+        if all(isinstance(item, dict) and 'name' in item for item in desired):
+            by_name = {item.get('name'): item for item in current if isinstance(item, dict)}
+            changes = []
+            for item in desired:
+                changes.extend(diff(item, by_name.get(item['name']), f"{path}[{item['name']}]", ignore))
+            return changes
+        if len(desired) != len(current):
+            return [(path, current, desired)]
+        changes = []
+        for index, item in enumerate(desired):
+            changes.extend(diff(item, current[index], f"{path}[{index}]", ignore))
+        return changes
+    if isinstance(desired, datetime):
+        return []
+    if _normalise(path, desired) != _normalise(path, current):
+        return [(path, current, desired)]
+    return []
+
+
+def plan(resources: List[PlannedResource], max_workers: int = DEFAULT_READ_WORKERS) -> List[PlannedResource]:
+    """Read every resource concurrently and set its action and changes"""
+    def read(resource):
+        try:
+            return resource.read()
+        except ResourceNotFoundError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plan') as executor:
+        futures = [(resource, executor.submit(read, resource)) for resource in resources]
+        for resource, future in futures:
+            try:
+                current = future.result()
+            except Exception as e:
+                # Unreadable (e.g. no permission): assume it needs writing and say why
+                resource.action = UPDATE
+                resource.error = str(e).splitlines()[0] if str(e) else repr(e)
+                continue
+            if current is None:
+                resource.action = CREATE
+                continue
+            current = current.as_dict() if hasattr(current, 'as_dict') else current
+            resource.changes = diff(resource.params, current, ignore=resource.ignore)
+            resource.action = UPDATE if resource.changes else NO_CHANGE
+    return resources
+
+
+def steps_to_apply(resources: List[PlannedResource]) -> set:
+    """Steps with at least one resource to create or update"""
+    return {resource.step for resource in resources if resource.action != NO_CHANGE}
@@ -1,93 +1,198 @@
 #!/usr/bin/env python3
 """
 AVD Session Host VM Deployment using Azure SDK
+
+Hosts are provisioned as a pipeline: a host's NIC is created while earlier hosts'
+VMs are still provisioning, and up to --parallelism VMs provision at once.
 """
 
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.network import NetworkManagementClient
 from azure.identity import ClientSecretCredential
 import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import click
 from dotenv import load_dotenv
 
+from azure_manager import arm_client_options
+
 # Load environment variables
 load_dotenv()
 
-def deploy_session_hosts():
-    print("🚀 Starting AVD Session Host VM Deployment...")
-    
+DEFAULT_PARALLELISM = 4
+
+_print_lock = threading.Lock()
+
+
+def _report(host: Dict[str, Any], count: int, message: str):
+    # Hosts report from worker threads; keep each line whole
+    with _print_lock:
+        print(f"[{host['index']:>{len(str(count))}}/{count}] {host['vm_name']}: {message}", flush=True)
+
+
+def _nic_params(subscription_id: str, resource_group: str, location: str) -> Dict[str, Any]:
+    return {
+        'location': location,
+        'ip_configurations': [{
+            'name': 'ipconfig1',
+            'subnet': {
+                'id': f'/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/Microsoft.Network/virtualNetworks/avd-vnet/subnets/avd-subnet'
+            }
+        }]
+    }
+
+
+def _vm_params(location: str, vm_size: str, computer_name: str, nic_id: str) -> Dict[str, Any]:
+    return {
+        'location': location,
+        'hardware_profile': {
+            'vm_size': vm_size
+        },
+        'os_profile': {
+            'computer_name': computer_name,
+            'admin_username': os.getenv("AVD_ADMIN_USERNAME", "avdadmin"),
+            'admin_password': os.getenv("AVD_ADMIN_PASSWORD", "CHANGE_THIS_PASSWORD")
+        },
+        'network_profile': {
+            'network_interfaces': [{
+                'id': nic_id
+            }]
+        },
+        'storage_profile': {
+            'image_reference': {
+                'publisher': 'MicrosoftWindowsDesktop',
+                'offer': 'windows-10',
+                'sku': 'win10-22h2-pro',
+                'version': 'latest'
+            }
+        }
+    }
+
+
+def deploy_session_hosts(count: int = 1, parallelism: int = DEFAULT_PARALLELISM, resource_group: str = 'avd-rg',
+                         location: str = 'eastus', vm_size: str = 'Standard_B1s',
+                         first_index: int = 1) -> List[Dict[str, Any]]:
+    """
+    Create count session hosts (NIC, then VM), up to parallelism VMs at a time
+
+    Hosts are numbered from first_index (avd-host-01 by default), so more hosts
+    can be added to an existing pool without touching the ones already there.
+
+    A failed host is reported and skipped; the others carry on.
+
+    Returns:
+        one result per host: vm_name, status ('succeeded' or 'failed'), stage,
+        error, nic_seconds and vm_seconds
+    """
+    print(f"🚀 Starting AVD Session Host VM Deployment ({count} hosts, {parallelism} in parallel)...")
+
     # Initialize clients
     credential = ClientSecretCredential(
         tenant_id=os.getenv('AZURE_TENANT_ID'),
         client_id=os.getenv('AZURE_CLIENT_ID'),
         client_secret=os.getenv('AZURE_CLIENT_SECRET')
     )
-    
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    network_client = NetworkManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    
-    # Configuration
-    resource_group = 'avd-rg'
-    location = 'eastus'
-    vm_size = 'Standard_B1s'  # Free tier friendly
-    vm_count = 1
-    
-    for i in range(vm_count):
-        vm_name = f'avd-host-{i+1:02d}'
-        nic_name = f'{vm_name}-nic'
-        computer_name = f'avdhost{i+1:02d}'  # Short computer name
-        
-        print(f"Creating network interface: {nic_name}")
-        
-        # Create network interface
-        nic_params = {
-            'location': location,
-            'ip_configurations': [{
-                'name': 'ipconfig1',
-                'subnet': {
-                    'id': f'/subscriptions/{os.getenv("AZURE_SUBSCRIPTION_ID")}/resourceGroups/{resource_group}/providers/Microsoft.Network/virtualNetworks/avd-vnet/subnets/avd-subnet'
-                }
-            }]
-        }
-        
-        network_client.network_interfaces.begin_create_or_update(
-            resource_group, nic_name, nic_params
-        ).result()
-        
-        print(f"Creating VM: {vm_name}")
-        
-        # Create VM
-        vm_params = {
-            'location': location,
-            'hardware_profile': {
-                'vm_size': vm_size
-            },
-            'os_profile': {
-                'computer_name': computer_name,
-                        'admin_username': os.getenv("AVD_ADMIN_USERNAME", "avdadmin"),
-        'admin_password': os.getenv("AVD_ADMIN_PASSWORD", "CHANGE_THIS_PASSWORD")
-            },
-            'network_profile': {
-                'network_interfaces': [{
-                    'id': f'/subscriptions/{os.getenv("AZURE_SUBSCRIPTION_ID")}/resourceGroups/{resource_group}/providers/Microsoft.Network/networkInterfaces/{nic_name}'
-                }]
-            },
-            'storage_profile': {
-                'image_reference': {
-                    'publisher': 'MicrosoftWindowsDesktop',
-                    'offer': 'windows-10',
-                    'sku': 'win10-22h2-pro',
-                    'version': 'latest'
-                }
-            }
-        }
-        
-        compute_client.virtual_machines.begin_create_or_update(
-            resource_group, vm_name, vm_params
-        ).result()
-        
-        print(f"✅ VM {vm_name} created successfully!")
-    
-    print("🎉 All session host VMs deployed successfully!")
+
+    subscription_id = os.getenv('AZURE_SUBSCRIPTION_ID')
+    compute_client = ComputeManagementClient(credential, subscription_id, **arm_client_options())
+    network_client = NetworkManagementClient(credential, subscription_id, **arm_client_options())
+
+    hosts = [{
+        'index': i + 1,
+        'vm_name': f'avd-host-{i+first_index:02d}',
+        'nic_name': f'avd-host-{i+first_index:02d}-nic',
+        'computer_name': f'avdhost{i+first_index:02d}',  # Short computer name
+        'status': 'pending',
+        'stage': None,
+        'error': None,
+        'nic_seconds': None,
+        'vm_seconds': None
+    } for i in range(count)]
+
+    # A NIC may be created for at most `parallelism` hosts waiting on a VM slot, so NICs
+    # stay one batch ahead instead of all being created up front
+    in_flight = threading.BoundedSemaphore(parallelism * 2)
+    nic_pool = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='nic')
+    vm_pool = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='vm')
+
+    def fail(host, stage, error):
+        # SDK errors repeat the code and message on extra lines; the first line has both
+        host.update(status='failed', stage=stage, error=str(error).splitlines()[0] if str(error) else repr(error))
+        _report(host, count, f"❌ {stage.upper()} failed: {host['error']}")
+        in_flight.release()
+
+    def create_vm(host, nic_id):
+        host['stage'] = 'vm'
+        start = time.perf_counter()
+        try:
+            compute_client.virtual_machines.begin_create_or_update(
+                resource_group, host['vm_name'], _vm_params(location, vm_size, host['computer_name'], nic_id)
+            ).result()
+        except Exception as e:
+            fail(host, 'vm', e)
+            return
+        host.update(status='succeeded', vm_seconds=round(time.perf_counter() - start, 2))
+        _report(host, count, f"✅ VM created ({host['vm_seconds']}s)")
+        in_flight.release()
+
+    def create_nic(host):
+        host['stage'] = 'nic'
+        start = time.perf_counter()
+        try:
+            nic = network_client.network_interfaces.begin_create_or_update(
+                resource_group, host['nic_name'], _nic_params(subscription_id, resource_group, location)
+            ).result()
+        except Exception as e:
+            fail(host, 'nic', e)
+            return
+        host['nic_seconds'] = round(time.perf_counter() - start, 2)
+        _report(host, count, f"NIC {host['nic_name']} ready ({host['nic_seconds']}s), creating VM")
+        vm_pool.submit(create_vm, host, nic.id)
+
+    start = time.perf_counter()
+    try:
+        for host in hosts:
+            in_flight.acquire()
+            nic_pool.submit(create_nic, host)
+        nic_pool.shutdown(wait=True)
+        vm_pool.shutdown(wait=True)
+    except KeyboardInterrupt:
+        # Pollers can't be cancelled server-side; stop starting new hosts and report what started
+        nic_pool.shutdown(wait=False, cancel_futures=True)
+        vm_pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    elapsed = time.perf_counter() - start
+
+    succeeded = [h for h in hosts if h['status'] == 'succeeded']
+    failed = [h for h in hosts if h['status'] == 'failed']
+    if failed:
+        print(f"⚠️  {len(succeeded)}/{count} session hosts deployed in {elapsed:.1f}s; failed:")
+        for host in failed:
+            print(f"   - {host['vm_name']} ({host['stage']}): {host['error']}")
+    else:
+        print(f"🎉 All {count} session host VMs deployed successfully in {elapsed:.1f}s!")
+
+    return [{k: v for k, v in host.items() if k not in ('index', 'computer_name')} for host in hosts]
+
+
+@click.command()
+@click.option('--count', default=1, help='Number of session hosts to deploy (default: 1)')
+@click.option('--parallelism', default=DEFAULT_PARALLELISM,
+              help=f'Session hosts provisioning at once (default: {DEFAULT_PARALLELISM})')
+@click.option('--resource-group', default='avd-rg', help='Resource group (default: avd-rg)')
+@click.option('--location', default='eastus', help='Azure region (default: eastus)')
+@click.option('--vm-size', default='Standard_B1s', help='VM size (default: Standard_B1s)')
+def main(count: int, parallelism: int, resource_group: str, location: str, vm_size: str):
+    """Deploy AVD session host VMs"""
+    results = deploy_session_hosts(count, max(1, parallelism), resource_group, location, vm_size)
+    if any(result['status'] == 'failed' for result in results):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    deploy_session_hosts()
+    main()
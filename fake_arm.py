@@ -0,0 +1,1022 @@
+#!/usr/bin/env python3
+"""
+Fake ARM Server
+Local stand-in for Azure Resource Manager with synthetic subscriptions, paging,
+latency injection, 429 injection and simulated provisioning time, for benchmarking
+without a live subscription
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any
+from urllib.parse import urlparse, parse_qs, urlencode
+
+import click
+
+DEFAULT_SUBSCRIPTION_ID = '00000000-0000-0000-0000-000000000000'
+
+VM_SIZES = ['Standard_B1s', 'Standard_B2s', 'Standard_D2s_v3', 'Standard_D4s_v3', 'Standard_D2s_v5']
+STORAGE_SKUS = ['Standard_LRS', 'Standard_GRS', 'Standard_RAGRS', 'Premium_LRS']
+LOCATIONS = ['eastus', 'westeurope', 'westus2', 'northeurope']
+POWER_STATES = ['running', 'running', 'running', 'deallocated', 'stopped']
+# Power state reported while a power action with --provision-ms is in progress
+TRANSITIONAL_STATES = {'running': 'starting', 'stopped': 'stopping', 'deallocated': 'deallocating'}
+# Resource providers whose PUTs complete synchronously on real ARM, so --provision-ms doesn't apply
+SYNCHRONOUS_PROVIDERS = ('microsoft.desktopvirtualization', 'microsoft.resources/resourcegroups')
+
+class FakeSubscription:
+    """In-memory ARM state: resources by lower-case ID and collections by lower-case list path"""
+
+    def __init__(self, subscription_id: str = DEFAULT_SUBSCRIPTION_ID, resource_groups: int = 5,
+                 vms: int = 50, storage_accounts: int = 10, web_apps: int = 10, seed: int = 42):
+        self.subscription_id = subscription_id
+        self.resources = {}
+        self.collections = {}
+        self.power_states = {}
+        # Resource key -> (monotonic end of the power transition, monotonic time the VM agent is ready)
+        self.transitions = {}
+        self._lock = threading.Lock()
+        self._generate(resource_groups, vms, storage_accounts, web_apps, random.Random(seed))
+
+    def _sub_path(self) -> str:
+        return f"/subscriptions/{self.subscription_id}"
+
+    def add(self, resource_id: str, resource: Dict[str, Any]):
+        """Register a resource and add it to its resource-group and subscription collections"""
+        key = resource_id.lower()
+        with self._lock:
+            is_new = key not in self.resources
+            self.resources[key] = resource
+            if not is_new:
+                return
+            parts = resource_id.strip('/').split('/')
+            collection_paths = ['/' + '/'.join(parts[:-1])]
+            # .../resourceGroups/{rg}/providers/{ns}/{type}/{name} is also listed at subscription scope
+            if len(parts) == 8 and parts[2].lower() == 'resourcegroups' and parts[4].lower() == 'providers':
+                collection_paths.append(f"{self._sub_path()}/providers/{parts[5]}/{parts[6]}")
+            for path in collection_paths:
+                self.collections.setdefault(path.lower(), []).append(key)
+
+    def remove(self, resource_id: str) -> bool:
+        key = resource_id.lower()
+        with self._lock:
+            if key not in self.resources:
+                return False
+            del self.resources[key]
+            for members in self.collections.values():
+                if key in members:
+                    members.remove(key)
+            return True
+
+    def _generate(self, resource_groups: int, vms: int, storage_accounts: int, web_apps: int, rng: random.Random):
+        group_names = [f"rg-{i:04d}" for i in range(max(1, resource_groups))]
+        for name in group_names:
+            self.add(f"{self._sub_path()}/resourceGroups/{name}", {
+                'id': f"{self._sub_path()}/resourceGroups/{name}",
+                'name': name,
+                'type': 'Microsoft.Resources/resourceGroups',
+                'location': rng.choice(LOCATIONS),
+                'tags': {'environment': rng.choice(['prod', 'dev', 'test'])},
+                'properties': {'provisioningState': 'Succeeded'}
+            })
+
+        for i in range(vms):
+            rg = group_names[i % len(group_names)]
+            name = f"vm-{i:06d}"
+            resource_id = f"{self._sub_path()}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachines/{name}"
+            self.power_states[resource_id.lower()] = rng.choice(POWER_STATES)
+            self.add(resource_id, {
+                'id': resource_id,
+                'name': name,
+                'type': 'Microsoft.Compute/virtualMachines',
+                'location': rng.choice(LOCATIONS),
+                'tags': {'environment': rng.choice(['prod', 'dev', 'test'])},
+                'properties': {
+                    'provisioningState': 'Succeeded',
+                    'hardwareProfile': {'vmSize': rng.choice(VM_SIZES)},
+                    'storageProfile': {'osDisk': {'osType': rng.choice(['Linux', 'Windows']), 'createOption': 'FromImage'}},
+                    'networkProfile': {'networkInterfaces': [{
+                        'id': f"{self._sub_path()}/resourceGroups/{rg}/providers/Microsoft.Network/networkInterfaces/{name}-nic"
+                    }]}
+                }
+            })
+
+        for i in range(storage_accounts):
+            rg = group_names[i % len(group_names)]
+            name = f"st{i:08d}"
+            resource_id = f"{self._sub_path()}/resourceGroups/{rg}/providers/Microsoft.Storage/storageAccounts/{name}"
+            self.add(resource_id, {
+                'id': resource_id,
+                'name': name,
+                'type': 'Microsoft.Storage/storageAccounts',
+                'location': rng.choice(LOCATIONS),
+                'kind': 'StorageV2',
+                'sku': {'name': rng.choice(STORAGE_SKUS)},
+                'tags': {},
+                'properties': {'provisioningState': 'Succeeded', 'statusOfPrimary': 'available'}
+            })
+
+        for i in range(web_apps):
+            rg = group_names[i % len(group_names)]
+            name = f"app-{i:06d}"
+            resource_id = f"{self._sub_path()}/resourceGroups/{rg}/providers/Microsoft.Web/sites/{name}"
+            self.add(resource_id, {
+                'id': resource_id,
+                'name': name,
+                'type': 'Microsoft.Web/sites',
+                'location': rng.choice(LOCATIONS),
+                'kind': 'app',
+                'tags': {},
+                'properties': {
+                    'state': rng.choice(['Running', 'Stopped']),
+                    'hostNames': [f"{name}.azurewebsites.net"],
+                    'defaultHostName': f"{name}.azurewebsites.net"
+                }
+            })
+
+        self._generate_network(group_names, vms, rng)
+
+    def _generate_network(self, group_names: List[str], vms: int, rng: random.Random):
+        """Per resource group a VNet with two subnets and a NIC NSG; per VM a NIC, some with a public IP"""
+        network = lambda rg, path: f"{self._sub_path()}/resourceGroups/{rg}/providers/Microsoft.Network/{path}"
+        for index, rg in enumerate(group_names):
+            # Every group denies inbound by default; some open RDP to the internet, the mistake to find
+            rules = [
+                _security_rule(network(rg, f"networkSecurityGroups/{rg}-nsg"), 'AllowHttpsInbound', 200, 'Allow',
+                               'Tcp', 'Internet', '443', '*', '*'),
+                _security_rule(network(rg, f"networkSecurityGroups/{rg}-nsg"), 'AllowSshFromCorp', 300, 'Allow',
+                               'Tcp', '10.0.0.0/8', '22', '*', '*'),
+                _security_rule(network(rg, f"networkSecurityGroups/{rg}-nsg"), 'DenyAllInbound', 4000, 'Deny',
+                               '*', '*', '*', '*', '*')
+            ]
+            if rng.random() < 0.3:
+                rules.insert(0, _security_rule(network(rg, f"networkSecurityGroups/{rg}-nsg"), 'AllowRdpInbound', 100,
+                                               'Allow', 'Tcp', '*', '3389', '*', '*'))
+            self._add_nsg(network(rg, f"networkSecurityGroups/{rg}-nsg"), rules)
+            self._add_nsg(network(rg, f"networkSecurityGroups/{rg}-subnet-nsg"), [
+                _security_rule(network(rg, f"networkSecurityGroups/{rg}-subnet-nsg"), 'AllowRdpFromBastion', 100,
+                               'Allow', 'Tcp', '10.255.0.0/24', '3389', '*', '*'),
+                _security_rule(network(rg, f"networkSecurityGroups/{rg}-subnet-nsg"), 'AllowWebInbound', 110,
+                               'Allow', 'Tcp', 'Internet', '80-443', '*', '*')
+            ])
+
+            vnet_id = network(rg, f"virtualNetworks/{rg}-vnet")
+            subnets = []
+            for subnet, prefix in (('default', f"10.{index % 250}.0.0/17"), ('workload', f"10.{index % 250}.128.0/17")):
+                subnet_id = f"{vnet_id}/subnets/{subnet}"
+                properties = {'provisioningState': 'Succeeded', 'addressPrefix': prefix}
+                if subnet == 'default':
+                    properties['networkSecurityGroup'] = {'id': network(rg, f"networkSecurityGroups/{rg}-subnet-nsg")}
+                subnets.append({'id': subnet_id, 'name': subnet, 'type': 'Microsoft.Network/virtualNetworks/subnets',
+                                'properties': properties})
+            self.add(vnet_id, {
+                'id': vnet_id, 'name': f"{rg}-vnet", 'type': 'Microsoft.Network/virtualNetworks',
+                'location': rng.choice(LOCATIONS),
+                'properties': {'provisioningState': 'Succeeded',
+                               'addressSpace': {'addressPrefixes': [f"10.{index % 250}.0.0/16"]}, 'subnets': subnets}
+            })
+            for subnet in subnets:
+                self.add(subnet['id'], subnet)
+
+        for i in range(vms):
+            rg = group_names[i % len(group_names)]
+            index = i % len(group_names)
+            name = f"vm-{i:06d}"
+            nic_id = network(rg, f"networkInterfaces/{name}-nic")
+            subnet = rng.choice(['default', 'workload'])
+            host = i // len(group_names) + 4
+            ip_configuration = {
+                'id': f"{nic_id}/ipConfigurations/ipconfig1", 'name': 'ipconfig1',
+                'properties': {
+                    'privateIPAddress': f"10.{index % 250}.{(128 if subnet == 'workload' else 0) + host // 250 % 128}.{host % 250 + 1}",
+                    'privateIPAllocationMethod': 'Dynamic',
+                    'subnet': {'id': network(rg, f"virtualNetworks/{rg}-vnet/subnets/{subnet}")}
+                }
+            }
+            if rng.random() < 0.2:
+                pip_id = network(rg, f"publicIPAddresses/{name}-pip")
+                ip_configuration['properties']['publicIPAddress'] = {'id': pip_id}
+                self.add(pip_id, {
+                    'id': pip_id, 'name': f"{name}-pip", 'type': 'Microsoft.Network/publicIPAddresses',
+                    'location': rng.choice(LOCATIONS), 'sku': {'name': 'Standard'},
+                    'properties': {'provisioningState': 'Succeeded', 'publicIPAllocationMethod': 'Static',
+                                   'ipAddress': f"20.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+                                   'ipConfiguration': {'id': ip_configuration['id']}}
+                })
+            properties = {
+                'provisioningState': 'Succeeded', 'ipConfigurations': [ip_configuration],
+                'virtualMachine': {'id': f"{self._sub_path()}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachines/{name}"}
+            }
+            if rng.random() < 0.5:
+                properties['networkSecurityGroup'] = {'id': network(rg, f"networkSecurityGroups/{rg}-nsg")}
+            self.add(nic_id, {'id': nic_id, 'name': f"{name}-nic", 'type': 'Microsoft.Network/networkInterfaces',
+                              'location': rng.choice(LOCATIONS), 'properties': properties})
+
+    def _add_nsg(self, nsg_id: str, rules: List[Dict[str, Any]]):
+        self.add(nsg_id, {
+            'id': nsg_id, 'name': nsg_id.rsplit('/', 1)[-1], 'type': 'Microsoft.Network/networkSecurityGroups',
+            'location': 'eastus',
+            'properties': {'provisioningState': 'Succeeded', 'securityRules': rules,
+                           'defaultSecurityRules': _default_security_rules(nsg_id)}
+        })
+
+    def set_power_state(self, resource_id: str, power_state: str, transition_seconds: float = 0):
+        """
+        Move a VM to power_state, via its transitional state for transition_seconds
+
+        A VM that ends up running reports its agent ready half a transition later, as a guest boots.
+        """
+        key = resource_id.lower()
+        self.power_states[key] = power_state
+        if transition_seconds:
+            end = time.monotonic() + transition_seconds
+            self.transitions[key] = (end, end + transition_seconds / 2)
+        else:
+            self.transitions.pop(key, None)
+
+    def power_state(self, resource_id: str) -> str:
+        key = resource_id.lower()
+        power_state = self.power_states.get(key, 'running')
+        transition = self.transitions.get(key)
+        if transition and time.monotonic() < transition[0]:
+            return TRANSITIONAL_STATES.get(power_state, power_state)
+        return power_state
+
+    def instance_view(self, resource_id: str) -> Dict[str, Any]:
+        power_state = self.power_state(resource_id)
+        view = {
+            'statuses': [
+                {'code': 'ProvisioningState/succeeded', 'level': 'Info', 'displayStatus': 'Provisioning succeeded'},
+                {'code': f"PowerState/{power_state}", 'level': 'Info', 'displayStatus': f"VM {power_state}"}
+            ]
+        }
+        if power_state in ('running', 'starting'):
+            transition = self.transitions.get(resource_id.lower())
+            ready = power_state == 'running' and (transition is None or time.monotonic() >= transition[1])
+            view['vmAgent'] = {'vmAgentVersion': '2.7.41491.1102', 'statuses': [
+                {'code': 'ProvisioningState/succeeded', 'level': 'Info', 'displayStatus': 'Ready'} if ready else
+                {'code': 'ProvisioningState/Unavailable', 'level': 'Warning', 'displayStatus': 'Not Ready'}
+            ]}
+        return view
+
+
+def _security_rule(nsg_id: str, name: str, priority: int, access: str, protocol: str, source: str,
+                   destination_ports: str, destination: str, source_ports: str, direction: str = 'Inbound',
+                   child: str = 'securityRules') -> Dict[str, Any]:
+    return {'id': f"{nsg_id}/{child}/{name}", 'name': name, 'properties': {
+        'provisioningState': 'Succeeded', 'priority': priority, 'access': access, 'protocol': protocol,
+        'direction': direction, 'sourceAddressPrefix': source, 'sourcePortRange': source_ports,
+        'destinationAddressPrefix': destination, 'destinationPortRange': destination_ports
+    }}
+
+
+def _default_security_rules(nsg_id: str) -> List[Dict[str, Any]]:
+    """The rules Azure adds to every NSG"""
+    rules = []
+    for direction, suffix, extra in (('Inbound', 'InBound', ('AllowAzureLoadBalancerInBound', 'AzureLoadBalancer', '*')),
+                                     ('Outbound', 'OutBound', ('AllowInternetOutBound', '*', 'Internet'))):
+        for priority, (name, source, destination, access) in zip((65000, 65001, 65500), (
+                (f"AllowVnet{suffix}", 'VirtualNetwork', 'VirtualNetwork', 'Allow'),
+                (extra[0], extra[1], extra[2], 'Allow'),
+                (f"DenyAll{suffix}", '*', '*', 'Deny'))):
+            rules.append(_security_rule(nsg_id, name, priority, access, '*', source, '*', destination, '*',
+                                        direction, 'defaultSecurityRules'))
+    return rules
+
+
+class TemplateError(Exception):
+    pass
+
+
+class TemplateEvaluator:
+    """
+    The ARM template expression subset used by avd_arm_template.json:
+    parameters(), variables(), concat(), resourceId(), utcNow() and dateTimeAdd() with day offsets
+    """
+
+    TOKEN = re.compile(r"\s*(?:(?P<string>'(?:[^']|'')*')|(?P<number>-?\d+)|(?P<name>[A-Za-z_][\w.]*)|(?P<punct>[(),]))")
+
+    def __init__(self, template: Dict[str, Any], parameters: Dict[str, Any], resource_group_path: str):
+        self.resource_group_path = resource_group_path
+        self.parameters = {}
+        self.variables = template.get('variables', {})
+        for name, spec in template.get('parameters', {}).items():
+            if name in parameters:
+                self.parameters[name] = parameters[name].get('value')
+            elif 'defaultValue' in spec:
+                self.parameters[name] = self.value(spec['defaultValue'])
+            else:
+                raise TemplateError(f"Missing value for parameter '{name}'")
+
+    def value(self, value: Any) -> Any:
+        """Evaluate every '[...]' expression string inside value"""
+        if isinstance(value, dict):
+            return {k: self.value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(v) for v in value]
+        if isinstance(value, str) and value.startswith('[') and value.endswith(']') and not value.startswith('[['):
+            tokens = self._tokenize(value[1:-1])
+            result, position = self._expression(tokens, 0)
+            if position != len(tokens):
+                raise TemplateError(f"Unexpected tokens in expression {value}")
+            return result
+        return value
+
+    def _tokenize(self, expression: str) -> List[Any]:
+        tokens, position = [], 0
+        while position < len(expression.rstrip()):
+            match = self.TOKEN.match(expression, position)
+            if not match:
+                raise TemplateError(f"Cannot parse expression near '{expression[position:]}'")
+            tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        return tokens
+
+    def _expression(self, tokens, position):
+        kind, text = tokens[position]
+        if kind == 'string':
+            return text[1:-1].replace("''", "'"), position + 1
+        if kind == 'number':
+            return int(text), position + 1
+        if kind != 'name' or position + 1 >= len(tokens) or tokens[position + 1] != ('punct', '('):
+            raise TemplateError(f"Expected a function call at '{text}'")
+        args, position = [], position + 2
+        while tokens[position] != ('punct', ')'):
+            arg, position = self._expression(tokens, position)
+            args.append(arg)
+            if tokens[position] == ('punct', ','):
+                position += 1
+        return self._call(text, args), position + 1
+
+    def _call(self, name: str, args: List[Any]) -> Any:
+        if name == 'parameters':
+            if args[0] not in self.parameters:
+                raise TemplateError(f"The template parameter '{args[0]}' is not found")
+            return self.parameters[args[0]]
+        if name == 'variables':
+            if args[0] not in self.variables:
+                raise TemplateError(f"The template variable '{args[0]}' is not found")
+            return self.value(self.variables[args[0]])
+        if name == 'concat':
+            return ''.join(str(arg) for arg in args)
+        if name == 'resourceId':
+            return f"{self.resource_group_path}/providers/{args[0]}/{'/'.join(args[1:])}"
+        if name == 'utcNow':
+            return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        if name == 'dateTimeAdd':
+            days = re.fullmatch(r'P(\d+)D', args[1])
+            if not days:
+                raise TemplateError(f"Unsupported duration {args[1]}")
+            base = datetime.fromisoformat(args[0].replace('Z', '+00:00'))
+            return (base + timedelta(days=int(days.group(1)))).strftime('%Y-%m-%dT%H:%M:%SZ')
+        raise TemplateError(f"Unsupported template function '{name}'")
+
+
+class FakeDeployment:
+    """
+    A template deployment whose resources provision on a simulated timeline
+
+    Each resource starts when its dependsOn resources finish and takes
+    provision_ms (nothing for synchronous providers), like ARM's server-side
+    scheduling. Resources appear in the subscription as they finish.
+    """
+
+    def __init__(self, deployment_id: str, body: Dict[str, Any], provision_ms: float):
+        self.id = deployment_id
+        self.name = deployment_id.rsplit('/', 1)[-1]
+        self.resource_group_path = deployment_id.split('/providers/')[0]
+        properties = body.get('properties', {})
+        self.template = properties.get('template') or {}
+        evaluator = TemplateEvaluator(self.template, properties.get('parameters') or {}, self.resource_group_path)
+        self.resources = []
+        for resource in self.template.get('resources', []):
+            resource = evaluator.value(resource)
+            resource_id = f"{self.resource_group_path}/providers/{resource['type']}/{resource['name']}"
+            self.resources.append({
+                'id': resource_id,
+                'type': resource['type'],
+                'name': resource['name'],
+                'body': {k: v for k, v in resource.items() if k in ('location', 'tags', 'kind', 'sku', 'properties')},
+                'depends_on': [d.lower() for d in resource.get('dependsOn', [])]
+            })
+        self.outputs = {name: {'type': spec.get('type'), 'value': evaluator.value(spec.get('value'))}
+                        for name, spec in self.template.get('outputs', {}).items()}
+
+        by_id = {r['id'].lower(): r for r in self.resources}
+        for resource in self.resources:
+            unknown = [d for d in resource['depends_on'] if d not in by_id]
+            if unknown:
+                raise TemplateError(f"Resource {resource['name']} depends on {unknown[0]}, which is not in the template")
+
+        def finish(resource, path=()):
+            if 'finish' in resource:
+                return resource['finish']
+            if resource['id'] in path:
+                raise TemplateError(f"Circular dependency involving {resource['name']}")
+            start = max((finish(by_id[d], path + (resource['id'],)) for d in resource['depends_on']), default=0.0)
+            synchronous = any(resource['type'].lower().startswith(p) for p in SYNCHRONOUS_PROVIDERS)
+            resource['start'] = start
+            resource['finish'] = start + (0 if synchronous else provision_ms / 1000)
+            return resource['finish']
+
+        self.duration = max((finish(r) for r in self.resources), default=0.0)
+        self.started = time.monotonic()
+        self.started_at = datetime.now(timezone.utc)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def materialise(self, subscription: FakeSubscription):
+        """Add finished resources to the subscription"""
+        elapsed = self.elapsed()
+        for resource in self.resources:
+            if resource['finish'] <= elapsed and not resource.get('materialised'):
+                body = dict(resource['body'], id=resource['id'], name=resource['name'], type=resource['type'])
+                body['properties'] = dict(body.get('properties') or {}, provisioningState='Succeeded')
+                subscription.add(resource['id'], body)
+                resource['materialised'] = True
+
+    def state(self) -> Dict[str, Any]:
+        done = self.elapsed() >= self.duration
+        properties = {
+            'provisioningState': 'Succeeded' if done else 'Running',
+            'mode': 'Incremental',
+            'timestamp': self.started_at.isoformat(),
+            'duration': f"PT{min(self.elapsed(), self.duration):.3f}S"
+        }
+        if done:
+            properties['outputs'] = self.outputs
+            properties['outputResources'] = [{'id': r['id']} for r in self.resources]
+        return {'id': self.id, 'name': self.name, 'type': 'Microsoft.Resources/deployments', 'properties': properties}
+
+    def operations(self) -> List[Dict[str, Any]]:
+        elapsed = self.elapsed()
+        operations = []
+        for index, resource in enumerate(self.resources):
+            if resource['start'] > elapsed:
+                continue
+            done = resource['finish'] <= elapsed
+            operations.append({
+                'id': f"{self.id}/operations/{index:016X}",
+                'operationId': f"{index:016X}",
+                'properties': {
+                    'provisioningOperation': 'Create',
+                    'provisioningState': 'Succeeded' if done else 'Running',
+                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'duration': f"PT{(min(elapsed, resource['finish']) - resource['start']):.3f}S",
+                    'statusCode': 'Created' if done else None,
+                    'targetResource': {'id': resource['id'], 'resourceType': resource['type'],
+                                       'resourceName': resource['name']}
+                }
+            })
+        return operations
+
+
+def _subset_equal(desired: Any, current: Any) -> bool:
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(_subset_equal(v, current.get(k)) for k, v in desired.items())
+    if isinstance(desired, list):
+        return (isinstance(current, list) and len(desired) == len(current)
+                and all(_subset_equal(d, c) for d, c in zip(desired, current)))
+    if isinstance(desired, str) and isinstance(current, str):
+        return desired.lower() == current.lower()
+    return desired == current
+
+
+class FakeArmServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the fake subscription and injection settings"""
+
+    daemon_threads = True
+
+    def __init__(self, address, subscription: FakeSubscription, page_size: int = 50,
+                 latency_ms: float = 0, jitter_ms: float = 0, throttle_rate: float = 0,
+                 retry_after: int = 0, provision_ms: float = 0, conflict_rate: float = 0, seed: int = 42):
+        super().__init__(address, FakeArmHandler)
+        self.subscription = subscription
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.provision_ms = provision_ms
+        self.conflict_rate = conflict_rate
+        # Resource key -> monotonic time its provisioningState turns Succeeded
+        self.provisioning = {}
+        # Deployment ID (lower case) -> FakeDeployment
+        self.deployments = {}
+        # Compute operation ID (run command, power action) -> (monotonic finish time, result body)
+        self.operations = {}
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            operations = {k[3:]: v for k, v in self.stats.items() if k.startswith('op:')}
+            return {
+                'requests': self.stats['requests'],
+                'throttled': self.stats['throttled'],
+                'conflicts': self.stats['conflicts'],
+                'operations': dict(sorted(operations.items()))
+            }
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats.clear()
+
+
+def _operation_name(method: str, path: str) -> str:
+    """Collapse a request path into a low-cardinality operation label"""
+    path = re.sub(r'/subscriptions/[^/]+', '/subscriptions/{sub}', path, flags=re.I)
+    path = re.sub(r'/resourcegroups/[^/]+', '/resourceGroups/{rg}', path, flags=re.I)
+    path = re.sub(r'(/providers/[^/]+/[^/]+)/[^/]+', r'\1/{name}', path, flags=re.I)
+    return f"{method} {path}"
+
+
+class FakeArmHandler(BaseHTTPRequestHandler):
+    server: FakeArmServer
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('x-ms-request-id', f"fake-{time.monotonic_ns()}")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _not_found(self, path: str):
+        self._send_json(404, {'error': {'code': 'ResourceNotFound', 'message': f"Resource '{path}' was not found."}})
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return {}
+
+    def _handle(self, method: str):
+        parsed = urlparse(self.path)
+        path = re.sub(r'/+', '/', parsed.path).rstrip('/') or '/'
+        query = parse_qs(parsed.query)
+
+        # Control endpoints are not counted as ARM traffic
+        if path == '/_fake/stats':
+            return self._send_json(200, self.server.snapshot_stats())
+        if path == '/_fake/reset':
+            self.server.reset_stats()
+            return self._send_json(200, {'reset': True})
+
+        body = self._read_body() if method in ('PUT', 'PATCH', 'POST') else {}
+
+        self.server.record('requests')
+        self.server.record(f"op:{_operation_name(method, path)}")
+
+        if self.server.latency_ms or self.server.jitter_ms:
+            with self.server.stats_lock:
+                jitter = self.server.rng.uniform(0, self.server.jitter_ms)
+            time.sleep((self.server.latency_ms + jitter) / 1000)
+
+        if self.server.throttle_rate:
+            with self.server.stats_lock:
+                throttled = self.server.rng.random() < self.server.throttle_rate
+            if throttled:
+                self.server.record('throttled')
+                return self._send_json(429, {
+                    'error': {'code': 'TooManyRequests', 'message': 'Injected throttle from fake ARM server'}
+                }, headers={'Retry-After': str(self.server.retry_after)})
+
+        if self.server.conflict_rate and method in ('PUT', 'DELETE') and '/providers/microsoft.network/' in path.lower():
+            with self.server.stats_lock:
+                conflicted = self.server.rng.random() < self.server.conflict_rate
+            if conflicted:
+                # What ARM answers while another write to the same resource (or its VNet) is in flight
+                self.server.record('conflicts')
+                return self._send_json(409, {'error': {
+                    'code': 'AnotherOperationInProgress',
+                    'message': 'Another operation on this or dependent resource is in progress. (injected by fake ARM server)'
+                }})
+
+        if method == 'GET':
+            return self._get(path, query)
+        if method in ('PUT', 'PATCH'):
+            return self._put(path, body, merge=(method == 'PATCH'))
+        if method == 'POST':
+            return self._post(path, body)
+        if method == 'DELETE':
+            resource = self.server.subscription.resources.get(path.lower(), {})
+            if resource.get('type') == 'Microsoft.Network/publicIPAddresses' and \
+                    resource.get('properties', {}).get('ipConfiguration'):
+                return self._send_json(400, {'error': {
+                    'code': 'PublicIPAddressCannotBeDeleted',
+                    'message': f"Public IP address {path} can not be deleted since it is still allocated to resource "
+                               f"{resource['properties']['ipConfiguration']['id']}."
+                }})
+            self.server.subscription.remove(path)
+            return self._send_json(200)
+        return self._send_json(405, {'error': {'code': 'MethodNotAllowed', 'message': method}})
+
+    def _get(self, path: str, query: Dict[str, List[str]]):
+        subscription = self.server.subscription
+        lowered = path.lower()
+
+        if lowered.endswith('/instanceview'):
+            resource_id = path[:-len('/instanceView')]
+            if resource_id.lower() not in subscription.resources:
+                return self._not_found(path)
+            return self._send_json(200, subscription.instance_view(resource_id))
+
+        # Deployment operations are listed without the providers/Microsoft.Resources segment
+        lowered = re.sub(r'(/resourcegroups/[^/]+)/deployments/', r'\1/providers/microsoft.resources/deployments/', lowered)
+        if '/providers/microsoft.resources/deployments/' in lowered:
+            deployment_id, _, rest = lowered.partition('/operations')
+            deployment = self.server.deployments.get(deployment_id)
+            if deployment is None or rest:
+                return self._not_found(path)
+            deployment.materialise(subscription)
+            if lowered.endswith('/operations'):
+                return self._send_json(200, {'value': deployment.operations()})
+            state = deployment.state()
+            running = state['properties']['provisioningState'] == 'Running'
+            return self._send_json(200, state, headers=self._poll_headers() if running else None)
+
+        if '/providers/microsoft.compute/locations/' in lowered and '/operations/' in lowered:
+            operation = self.server.operations.get(lowered.rsplit('/', 1)[-1])
+            if operation is None:
+                return self._not_found(path)
+            finish_at, result = operation
+            if time.monotonic() < finish_at:
+                return self._send_json(202, headers=self._poll_headers())
+            return self._send_json(200, result)
+
+        if lowered.endswith('/providers/microsoft.insights/metrics'):
+            return self._send_json(200, self._metrics(path[:-len('/providers/Microsoft.Insights/metrics')], query))
+
+        if lowered in subscription.resources:
+            resource = dict(subscription.resources[lowered])
+            if lowered in self.server.provisioning:
+                if time.monotonic() < self.server.provisioning[lowered]:
+                    return self._send_json(200, resource, headers=self._poll_headers())
+                self.server.provisioning.pop(lowered, None)
+                resource['properties'] = dict(resource['properties'], provisioningState='Succeeded')
+                subscription.resources[lowered] = resource
+            if 'instanceview' in (query.get('$expand', [''])[0]).lower():
+                resource['properties'] = dict(resource.get('properties', {}),
+                                              instanceView=subscription.instance_view(path))
+            return self._send_json(200, resource)
+
+        if lowered in subscription.collections:
+            members = subscription.collections[lowered]
+            skip = int(query.get('$skiptoken', ['0'])[0])
+            page = members[skip:skip + self.server.page_size]
+            body = {'value': [subscription.resources[key] for key in page if key in subscription.resources]}
+            if 'instanceview' in (query.get('$expand', [''])[0]).lower():
+                body['value'] = [dict(item, properties=dict(item.get('properties', {}),
+                                                            instanceView=subscription.instance_view(item['id'])))
+                                 for item in body['value']]
+            if skip + self.server.page_size < len(members):
+                next_query = {k: v[0] for k, v in query.items()}
+                next_query['$skiptoken'] = str(skip + self.server.page_size)
+                body['nextLink'] = f"{self.server.endpoint}{path}?{urlencode(next_query)}"
+            return self._send_json(200, body)
+
+        # An empty but valid collection (e.g. a resource group with no VMs)
+        if re.search(r'/providers/[^/]+/[^/]+$', path) or lowered.endswith('/resourcegroups'):
+            return self._send_json(200, {'value': []})
+
+        return self._not_found(path)
+
+    def _put(self, path: str, body: Dict[str, Any], merge: bool = False):
+        subscription = self.server.subscription
+        if '/providers/microsoft.resources/deployments/' in path.lower():
+            return self._put_deployment(path, body)
+        existing = subscription.resources.get(path.lower(), {})
+        if_match = self.headers.get('If-Match')
+        if if_match and if_match != '*' and if_match != existing.get('etag'):
+            return self._send_json(412, {'error': {
+                'code': 'PreconditionFailed', 'message': f"The etag {if_match} does not match {existing.get('etag')}."
+            }})
+        resource = dict(existing) if merge else {}
+        resource.update(body)
+        parts = path.strip('/').split('/')
+        resource['id'] = path
+        resource['name'] = parts[-1]
+        if len(parts) >= 8 and parts[4].lower() == 'providers':
+            resource['type'] = '/'.join([parts[5]] + parts[6::2])
+        elif len(parts) == 4 and parts[2].lower() == 'resourcegroups':
+            resource['type'] = 'Microsoft.Resources/resourceGroups'
+        properties = dict(existing.get('properties', {})) if merge else {}
+        properties.update(resource.get('properties') or {})
+        # With --provision-ms, new provider resources stay 'Creating' so SDK pollers have to poll
+        provisioning = (self.server.provision_ms and not existing and '/providers/' in path.lower()
+                        and not any(f"/providers/{p}" in path.lower() for p in SYNCHRONOUS_PROVIDERS))
+        properties['provisioningState'] = 'Creating' if provisioning else 'Succeeded'
+        registration = properties.get('registrationInfo')
+        if resource.get('type', '').lower() == 'microsoft.desktopvirtualization/hostpools' and registration:
+            # As on real ARM, 'Update' issues a new token and 'Delete' revokes it
+            registration = dict(registration)
+            operation = (registration.pop('registrationTokenOperation', None) or '').lower()
+            if operation == 'update':
+                registration['token'] = f"fake-token-{uuid.uuid4().hex}"
+            elif operation == 'delete':
+                registration = {}
+            properties['registrationInfo'] = registration
+        resource['properties'] = properties
+        network_type = resource.get('type', '').lower()
+        if network_type.startswith('microsoft.network/'):
+            resource['etag'] = f'W/"{uuid.uuid4()}"'
+        if network_type == 'microsoft.network/publicipaddresses':
+            # Static addresses are allocated with the resource, dynamic ones when attached
+            previous = existing.get('properties', {})
+            properties.setdefault('ipConfiguration', previous.get('ipConfiguration'))
+            static = properties.get('publicIPAllocationMethod', 'Dynamic').lower() == 'static'
+            properties['ipAddress'] = (properties.get('ipAddress') or previous.get('ipAddress')
+                                       or (self._public_address() if static else None))
+        elif network_type == 'microsoft.network/networkinterfaces':
+            # Read-only: set by attaching the NIC to a VM, not by PUTs of the NIC
+            if existing.get('properties', {}).get('virtualMachine'):
+                properties['virtualMachine'] = existing['properties']['virtualMachine']
+            self._sync_public_ips(existing, resource)
+        subscription.add(path, resource)
+        if provisioning:
+            self.server.provisioning[path.lower()] = time.monotonic() + self.server.provision_ms / 1000
+        if resource.get('type') == 'Microsoft.Compute/virtualMachines':
+            subscription.power_states.setdefault(path.lower(), 'running')
+        return self._send_json(201 if not existing else 200, resource,
+                               headers=self._poll_headers() if provisioning else None)
+
+    def _public_address(self) -> str:
+        with self.server.stats_lock:
+            return f"20.{self.server.rng.randrange(256)}.{self.server.rng.randrange(256)}.{self.server.rng.randrange(1, 255)}"
+
+    def _sync_public_ips(self, existing: Dict[str, Any], nic: Dict[str, Any]):
+        """Point public IPs at the NIC IP configuration that now uses them, as ARM does, and release the rest"""
+        def attached(resource):
+            references = {}
+            for config in resource.get('properties', {}).get('ipConfigurations') or []:
+                pip_id = (config.get('properties', {}).get('publicIPAddress') or {}).get('id')
+                if pip_id:
+                    references[pip_id.lower()] = config.get('id') or f"{nic['id']}/ipConfigurations/{config.get('name')}"
+            return references
+
+        before, after = attached(existing), attached(nic)
+        resources = self.server.subscription.resources
+        for key in before.keys() - after.keys():
+            if key in resources:
+                resources[key] = dict(resources[key], properties=dict(resources[key]['properties'], ipConfiguration=None))
+        for key, config_id in after.items():
+            if key in resources:
+                properties = dict(resources[key]['properties'], ipConfiguration={'id': config_id})
+                properties['ipAddress'] = properties.get('ipAddress') or self._public_address()
+                resources[key] = dict(resources[key], properties=properties)
+
+    def _template_error(self, error: Exception):
+        return self._send_json(400, {'error': {'code': 'InvalidTemplate', 'message': str(error)}})
+
+    def _put_deployment(self, path: str, body: Dict[str, Any]):
+        try:
+            deployment = FakeDeployment(path, body, self.server.provision_ms)
+        except (TemplateError, KeyError, IndexError) as e:
+            return self._template_error(e)
+        self.server.deployments[path.lower()] = deployment
+        deployment.materialise(self.server.subscription)
+        state = deployment.state()
+        if state['properties']['provisioningState'] == 'Running':
+            state['properties']['provisioningState'] = 'Accepted'
+            return self._send_json(201, state, headers=self._poll_headers())
+        return self._send_json(201, state)
+
+    def _what_if(self, deployment: FakeDeployment) -> Dict[str, Any]:
+        changes = []
+        for resource in deployment.resources:
+            current = self.server.subscription.resources.get(resource['id'].lower())
+            if current is None:
+                change_type = 'Create'
+            else:
+                desired = {k: v for k, v in resource['body'].items() if k != 'properties'}
+                desired['properties'] = {k: v for k, v in (resource['body'].get('properties') or {}).items()
+                                         if k != 'registrationInfo'}
+                change_type = 'NoChange' if _subset_equal(desired, current) else 'Modify'
+            changes.append({'resourceId': resource['id'], 'changeType': change_type})
+        return {'status': 'Succeeded', 'properties': {'changes': changes}}
+
+    def _poll_headers(self) -> Dict[str, str]:
+        # azure-core pollers honour retry-after-ms; poll about ten times per provisioning
+        return {'retry-after-ms': str(max(10, int(self.server.provision_ms / 10)))}
+
+    def _post(self, path: str, body: Dict[str, Any]):
+        subscription = self.server.subscription
+        lowered = path.lower()
+        action = lowered.rsplit('/', 1)[-1]
+        resource_id = path.rsplit('/', 1)[0]
+
+        if '/providers/microsoft.resources/deployments/' in lowered and action in ('validate', 'whatif'):
+            try:
+                deployment = FakeDeployment(resource_id, body, self.server.provision_ms)
+            except (TemplateError, KeyError, IndexError) as e:
+                return self._template_error(e)
+            if action == 'whatif':
+                return self._send_json(200, self._what_if(deployment))
+            state = deployment.state()
+            state['properties'] = {'provisioningState': 'Succeeded', 'mode': 'Incremental',
+                                   'validatedResources': [{'id': r['id']} for r in deployment.resources]}
+            return self._send_json(200, state)
+
+        power_actions = {'start': 'running', 'restart': 'running', 'poweroff': 'stopped', 'deallocate': 'deallocated'}
+        if action in power_actions:
+            if resource_id.lower() not in subscription.resources:
+                return self._not_found(resource_id)
+            subscription.set_power_state(resource_id, power_actions[action], self.server.provision_ms / 1000)
+            if not self.server.provision_ms:
+                return self._send_json(200)
+            # The SDK poller waits until the transition is over, like begin_restart().result() on real ARM
+            return self._send_json(202, headers=self._operation_headers(
+                subscription.resources[resource_id.lower()], {}, self.server.provision_ms))
+        if action == 'runcommand':
+            return self._run_command(resource_id)
+        if action == 'retrieveregistrationtoken':
+            pool = subscription.resources.get(resource_id.lower())
+            if pool is not None:
+                registration = pool.get('properties', {}).get('registrationInfo') or {}
+                return self._send_json(200, {'token': registration.get('token'),
+                                             'expirationTime': registration.get('expirationTime')})
+            expires = datetime.now(timezone.utc) + timedelta(hours=24)
+            return self._send_json(200, {'token': f"fake-token-{int(time.time())}",
+                                         'expirationTime': expires.isoformat()})
+        if lowered.endswith('/providers/microsoft.costmanagement/query'):
+            return self._send_json(200, self._cost_query())
+        if lowered.endswith('/providers/microsoft.costmanagement/forecast'):
+            return self._send_json(200, {'properties': {'columns': [
+                {'name': 'Cost', 'type': 'Number'}, {'name': 'UsageDate', 'type': 'Number'},
+                {'name': 'CostStatus', 'type': 'String'}, {'name': 'Currency', 'type': 'String'}
+            ], 'rows': []}})
+        return self._send_json(200, {})
+
+    def _run_command_result(self, vm_name: str) -> Dict[str, Any]:
+        return {'value': [
+            {'code': 'ComponentStatus/StdOut/succeeded', 'level': 'Info', 'message': f"Fake run command output from {vm_name}"},
+            {'code': 'ComponentStatus/StdErr/succeeded', 'level': 'Info', 'message': ''}
+        ]}
+
+    def _run_command(self, vm_id: str):
+        subscription = self.server.subscription
+        vm = subscription.resources.get(vm_id.lower())
+        if vm is None:
+            return self._not_found(vm_id)
+        # As on real ARM, run command needs a running VM
+        if subscription.power_state(vm_id) != 'running':
+            return self._send_json(409, {'error': {
+                'code': 'OperationNotAllowed', 'message': 'The operation requires the VM to be running (or set to run).'
+            }})
+        if not self.server.provision_ms:
+            return self._send_json(200, self._run_command_result(vm['name']))
+        # With --provision-ms the script "runs" that long; the SDK polls the Location operation
+        return self._send_json(202, headers=self._operation_headers(
+            vm, self._run_command_result(vm['name']), self.server.provision_ms))
+
+    def _operation_headers(self, vm: Dict[str, Any], result: Dict[str, Any], duration_ms: float) -> Dict[str, str]:
+        """Register a compute operation that returns result after duration_ms; headers point the poller at it"""
+        operation_id = uuid.uuid4().hex
+        self.server.operations[operation_id] = (time.monotonic() + duration_ms / 1000, result)
+        headers = self._poll_headers()
+        headers['Location'] = (f"{self.server.endpoint}/subscriptions/{self.server.subscription.subscription_id}/"
+                               f"providers/Microsoft.Compute/locations/{vm.get('location', 'eastus')}/operations/{operation_id}")
+        return headers
+
+    def _metrics(self, resource_id: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        names = (query.get('metricnames', ['Percentage CPU'])[0]).split(',')
+        timespan = query.get('timespan', [''])[0]
+        try:
+            start = datetime.fromisoformat(timespan.split('/')[0])
+            end = datetime.fromisoformat(timespan.split('/')[1])
+        except (ValueError, IndexError):
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(hours=1)
+        rng = random.Random(resource_id)
+        minutes = int((end - start).total_seconds() // 60)
+        value = []
+        for name in names:
+            base = rng.uniform(5, 60)
+            data = [{
+                'timeStamp': (start + timedelta(minutes=i)).isoformat(),
+                'average': round(max(0.0, base + rng.gauss(0, 8)), 2)
+            } for i in range(minutes)]
+            value.append({
+                'id': f"{resource_id}/providers/Microsoft.Insights/metrics/{name}",
+                'type': 'Microsoft.Insights/metrics',
+                'name': {'value': name, 'localizedValue': name},
+                'unit': 'Percent' if name == 'Percentage CPU' else 'Bytes',
+                'timeseries': [{'data': data}]
+            })
+        return {'timespan': timespan, 'interval': query.get('interval', ['PT1M'])[0], 'value': value}
+
+    def _cost_query(self) -> Dict[str, Any]:
+        today = int(datetime.now(timezone.utc).strftime('%Y%m%d'))
+        rows = []
+        for key, resource in list(self.server.subscription.resources.items()):
+            if '/providers/' in key:
+                rows.append([round(random.Random(key).uniform(0.1, 20), 2), today, key,
+                             resource.get('location', 'eastus'), 'USD'])
+        return {'properties': {'columns': [
+            {'name': 'Cost', 'type': 'Number'}, {'name': 'UsageDate', 'type': 'Number'},
+            {'name': 'ResourceId', 'type': 'String'}, {'name': 'ResourceLocation', 'type': 'String'},
+            {'name': 'Currency', 'type': 'String'}
+        ], 'rows': rows}}
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, **options) -> FakeArmServer:
+    """
+    Start a fake ARM server on a background thread
+
+    Keyword options are split between FakeSubscription (resource_groups, vms,
+    storage_accounts, web_apps, subscription_id, seed) and FakeArmServer
+    (page_size, latency_ms, jitter_ms, throttle_rate, retry_after, provision_ms, conflict_rate).
+    """
+    subscription_keys = {'subscription_id', 'resource_groups', 'vms', 'storage_accounts', 'web_apps', 'seed'}
+    subscription = FakeSubscription(**{k: v for k, v in options.items() if k in subscription_keys})
+    server_options = {k: v for k, v in options.items() if k not in subscription_keys}
+    server = FakeArmServer((host, port), subscription, seed=options.get('seed', 42), **server_options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+@click.option('--port', default=8089, help='Port (default: 8089)')
+@click.option('--subscription-id', default=DEFAULT_SUBSCRIPTION_ID, help='Synthetic subscription ID')
+@click.option('--resource-groups', default=5, help='Number of resource groups')
+@click.option('--vms', default=50, help='Number of virtual machines')
+@click.option('--storage-accounts', default=10, help='Number of storage accounts')
+@click.option('--web-apps', default=10, help='Number of web apps')
+@click.option('--page-size', default=50, help='Items per list page')
+@click.option('--latency-ms', default=0.0, help='Fixed latency added to every request')
+@click.option('--jitter-ms', default=0.0, help='Random extra latency up to this many ms')
+@click.option('--throttle-rate', default=0.0, help='Fraction of requests answered with 429')
+@click.option('--retry-after', default=0, help='Retry-After seconds on injected 429s')
+@click.option('--provision-ms', default=0.0, help='Time new resources stay in provisioningState Creating')
+@click.option('--conflict-rate', default=0.0, help='Fraction of network writes answered with 409 AnotherOperationInProgress')
+@click.option('--seed', default=42, help='Random seed for deterministic data')
+def main(host, port, subscription_id, resource_groups, vms, storage_accounts, web_apps,
+         page_size, latency_ms, jitter_ms, throttle_rate, retry_after, provision_ms, conflict_rate, seed):
+    """Run a local fake ARM server"""
+    server = start_server(
+        host, port, subscription_id=subscription_id, resource_groups=resource_groups, vms=vms,
+        storage_accounts=storage_accounts, web_apps=web_apps, seed=seed, page_size=page_size,
+        latency_ms=latency_ms, jitter_ms=jitter_ms, throttle_rate=throttle_rate, retry_after=retry_after,
+        provision_ms=provision_ms, conflict_rate=conflict_rate
+    )
+    print(f"Fake ARM server listening on {server.endpoint}")
+    print(f"  export AZURE_ARM_ENDPOINT={server.endpoint}")
+    print(f"  export AZURE_SUBSCRIPTION_ID={subscription_id}")
+    print("  export AZURE_TENANT_ID=fake AZURE_CLIENT_ID=fake AZURE_CLIENT_SECRET=fake")
+    print(f"Stats: {server.endpoint}/_fake/stats  Reset: {server.endpoint}/_fake/reset")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,31 @@
 #!/usr/bin/env python3
 """
 Fix AVD Registration with Correct PowerShell Module Path
+
+Runs on every selected session host at once; re-running retries only the hosts that failed.
 """
 
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.desktopvirtualization import DesktopVirtualizationMgmtClient
 from azure.identity import ClientSecretCredential
 import os
+import sys
+
+import click
 from dotenv import load_dotenv
 
+from azure_manager import arm_client_options
+from registration_token import RegistrationTokenManager
+from run_command import (RunCommandEngine, DEFAULT_PARALLELISM, SUCCEEDED, fleet_options, parse_tags,
+                         run_on_fleet, select_vms)
+
 # Load environment variables
 load_dotenv()
 
-def fix_avd_registration():
-    print("🔧 Fixing AVD Registration...")
-    
-    credential = ClientSecretCredential(
-        tenant_id=os.getenv('AZURE_TENANT_ID'),
-        client_id=os.getenv('AZURE_CLIENT_ID'),
-        client_secret=os.getenv('AZURE_CLIENT_SECRET')
-    )
-    
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
-    
-    try:
-        # Get registration token
-        registration_info = avd_client.host_pools.retrieve_registration_token('avd-rg', 'avd-host-pool')
-        token = registration_info.token
-        
-        print(f"✅ Registration Token Retrieved")
-        
-        # Corrected PowerShell script for registration
-        ps_script = f'''
+# The token and host name are run command parameters, so the script (and its report) is the same on every host
+REGISTRATION_FIX_SCRIPT = '''
+param([string]$RegistrationToken, [string]$SessionHost, [string]$HostPoolName)
+
 # AVD Registration Fix Script
 Write-Host "Fixing AVD Registration..." -ForegroundColor Green
 
@@ -44,98 +37,130 @@ $possiblePaths = @(
 )
 
 $modulePath = $null
-foreach ($path in $possiblePaths) {{
-    if (Test-Path $path) {{
+foreach ($path in $possiblePaths) {
+    if (Test-Path $path) {
         $modulePath = $path
         Write-Host "Found module at: $path" -ForegroundColor Green
         break
-    }}
-}}
+    }
+}
 
-if ($modulePath) {{
-    try {{
+if ($modulePath) {
+    try {
         Import-Module $modulePath -Force
         Write-Host "Module loaded successfully" -ForegroundColor Green
         
         # Register with host pool
-        $registrationToken = "{token}"
         Write-Host "Registering with host pool..." -ForegroundColor Yellow
         
         # Try different registration methods
-        try {{
-            Add-RdsessionHost -HostPoolName "avd-host-pool" -SessionHost "avd-host-01" -RegistrationToken $registrationToken
+        try {
+            Add-RdsessionHost -HostPoolName $HostPoolName -SessionHost $SessionHost -RegistrationToken $RegistrationToken
             Write-Host "Registration successful using Add-RdsessionHost" -ForegroundColor Green
-        }} catch {{
+        } catch {
             Write-Host "Add-RdsessionHost failed, trying alternative method..." -ForegroundColor Yellow
-            try {{
+            try {
                 # Alternative registration method
                 $registrationScript = @"
-`$registrationToken = "$token"
+`$registrationToken = "$RegistrationToken"
 `$registrationPath = "$modulePath"
 Import-Module `$registrationPath -Force
-Add-RdsessionHost -HostPoolName "avd-host-pool" -SessionHost "avd-host-01" -RegistrationToken `$registrationToken
+Add-RdsessionHost -HostPoolName "$HostPoolName" -SessionHost "$SessionHost" -RegistrationToken `$registrationToken
 "@
                 Invoke-Expression $registrationScript
                 Write-Host "Registration successful using alternative method" -ForegroundColor Green
-            }} catch {{
-                Write-Host "Alternative registration failed: $_" -ForegroundColor Red
-            }}
-        }}
+            } catch {
+                Write-Error "Alternative registration failed: $_"
+            }
+        }
         
-    }} catch {{
-        Write-Host "Failed to load module: $_" -ForegroundColor Red
-    }}
-}} else {{
+    } catch {
+        Write-Error "Failed to load module: $_"
+    }
+} else {
     Write-Host "AVD PowerShell module not found. Checking installation..." -ForegroundColor Red
     
     # Check if AVD agent is installed
     $agentService = Get-Service -Name "RDAgentBootLoader" -ErrorAction SilentlyContinue
-    if ($agentService) {{
+    if ($agentService) {
         Write-Host "AVD Agent is installed and running" -ForegroundColor Green
         Write-Host "You may need to restart the computer to complete registration" -ForegroundColor Yellow
-    }} else {{
-        Write-Host "AVD Agent service not found" -ForegroundColor Red
-    }}
-}}
+    } else {
+        Write-Error "AVD Agent service not found"
+    }
+}
 
 Write-Host "Registration fix attempt completed" -ForegroundColor Green
 '''
+
+
+def fix_avd_registration(resource_group='avd-rg', host_pool='avd-host-pool', vms=(), match=None, tags=None,
+                         parallelism=DEFAULT_PARALLELISM, timeout=600, resume=True):
+    print("🔧 Fixing AVD Registration...")
+    
+    credential = ClientSecretCredential(
+        tenant_id=os.getenv('AZURE_TENANT_ID'),
+        client_id=os.getenv('AZURE_CLIENT_ID'),
+        client_secret=os.getenv('AZURE_CLIENT_SECRET')
+    )
+    
+    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    avd_client = DesktopVirtualizationMgmtClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'), **arm_client_options())
+    
+    try:
+        session_hosts = select_vms(compute_client, resource_group, vms, match, tags)
+        if not session_hosts:
+            print(f"❌ No VMs selected in {resource_group}")
+            return {}
         
-        print(f"\n🔧 Running Registration Fix...")
+        # Get registration token; renewed if it has expired or is about to
+        tokens = RegistrationTokenManager(avd_client)
+        registration_info = tokens.get(resource_group, host_pool)
         
-        # Run the corrected script on the VM
-        script_params = {
-            'command_id': 'RunPowerShellScript',
-            'script': [ps_script],
-            'parameters': []
-        }
+        print(f"✅ Registration Token Retrieved")
         
-        print(f"   Executing registration fix...")
-        poller = compute_client.virtual_machines.begin_run_command(
-            'avd-rg', 'avd-host-01', script_params
+        print(f"\n🔧 Running Registration Fix on {len(session_hosts)} session host(s)...")
+        engine = RunCommandEngine(
+            compute_client, resource_group, REGISTRATION_FIX_SCRIPT, name='fix-avd-registration',
+            # Each host asks the manager, so hosts that start late in a long rollout get a refreshed token
+            parameters=lambda vm_name: {'RegistrationToken': tokens.get(resource_group, host_pool).token,
+                                        'SessionHost': vm_name, 'HostPoolName': host_pool},
+            parallelism=parallelism, timeout=timeout
         )
+        results = run_on_fleet(engine, session_hosts, resume=resume)
         
-        result = poller.result()
-        
-        if result.value and len(result.value) > 0:
-            for output in result.value:
-                print(f"   {output.message}")
-        else:
-            print(f"   ✅ Registration fix completed!")
+        if len(results) == 1:
+            for output in next(iter(results.values()))['stdout'].splitlines():
+                print(f"   {output}")
         
+        registered = [vm for vm, result in results.items() if result['status'] == SUCCEEDED]
         print(f"\n🎉 AVD Setup Status:")
         print(f"   ✅ AVD Agent: Installed")
         print(f"   ✅ AVD Boot Loader: Installed")
-        print(f"   ⚠️  Registration: May need restart")
+        print(f"   ⚠️  Registration: May need restart ({len(registered)}/{len(results)} hosts)")
         
         print(f"\n📋 Next Steps:")
-        print(f"   1. Restart the VM: avd-host-01")
+        print(f"   1. Restart the {len(registered)} session host(s) where the fix ran")
         print(f"   2. After restart, registration should complete automatically")
         print(f"   3. Add users to the application group")
         print(f"   4. Test AVD client connection")
+        return results
         
     except Exception as e:
         print(f"❌ Error: {e}")
+        return None
+
+
+@click.command()
+@click.option('--host-pool', default='avd-host-pool', help='Host pool to register with (default: avd-host-pool)')
+@fleet_options(default_timeout=600)
+def main(host_pool, resource_group, vms, match, tags, parallelism, timeout, restart):
+    """Re-run AVD registration on session hosts"""
+    results = fix_avd_registration(resource_group, host_pool, vms, match, parse_tags(tags),
+                                   parallelism, timeout, resume=not restart)
+    if not results or any(result['status'] != SUCCEEDED for result in results.values()):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    fix_avd_registration()
+    main()
@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration
+Keeps Prometheus multiprocess metrics consistent across worker restarts
+"""
+
+import os
+import shutil
+
+
+def on_starting(server):
+    """Start each master process with an empty metrics directory"""
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop live gauges of workers that have exited"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
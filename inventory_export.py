@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Inventory Export
+Concurrent enumeration of every supported resource type into Parquet files
+(gzip JSONL when pyarrow is not installed), written in streaming row groups
+"""
+
+import os
+import json
+import gzip
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # JSONL fallback
+    pa = None
+    pq = None
+
+from azure_manager import AzureManager
+
+SCHEMA_VERSION = 1
+ROW_GROUP_SIZE = 10000
+# Rows a worker normalises before taking the shared buffer lock
+APPEND_BATCH = 500
+# Matches the SDK's requests connection pool, so concurrent listings don't discard connections
+DEFAULT_PARALLELISM = 10
+
+# Stable column order and types per resource type; every file has exactly these columns
+SCHEMAS = {
+    'resource_groups': [
+        ('subscription_id', 'string'), ('name', 'string'), ('location', 'string'),
+        ('provisioning_state', 'string'), ('tags', 'map')
+    ],
+    'virtual_machines': [
+        ('subscription_id', 'string'), ('id', 'string'), ('name', 'string'), ('resource_group', 'string'),
+        ('location', 'string'), ('vm_size', 'string'), ('os_type', 'string'), ('power_state', 'string'),
+        ('tags', 'map')
+    ],
+    'storage_accounts': [
+        ('subscription_id', 'string'), ('name', 'string'), ('resource_group', 'string'), ('location', 'string'),
+        ('sku', 'string'), ('kind', 'string'), ('status', 'string'), ('tags', 'map')
+    ],
+    'web_apps': [
+        ('subscription_id', 'string'), ('name', 'string'), ('resource_group', 'string'), ('location', 'string'),
+        ('state', 'string'), ('default_host_name', 'string'), ('host_names', 'list'), ('tags', 'map')
+    ]
+}
+
+def _arrow_schema(resource_type: str):
+    types = {'string': pa.string(), 'map': pa.map_(pa.string(), pa.string()), 'list': pa.list_(pa.string())}
+    return pa.schema([(name, types[kind]) for name, kind in SCHEMAS[resource_type]],
+                     metadata={'schema_version': str(SCHEMA_VERSION), 'resource_type': resource_type})
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, or None where the resource module is missing (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _normalise(row: Dict[str, Any], resource_type: str, subscription_id: str) -> Dict[str, Any]:
+    """Shape a list_* row to the export schema"""
+    row = dict(row, subscription_id=subscription_id)
+    if resource_type == 'resource_groups':
+        row['provisioning_state'] = row.get('properties', {}).get('provisioning_state')
+    record = {}
+    for name, kind in SCHEMAS[resource_type]:
+        value = row.get(name)
+        if kind == 'map':
+            value = {str(k): str(v) for k, v in (value or {}).items()}
+        elif kind == 'list':
+            value = [str(v) for v in (value or [])]
+        elif value is not None:
+            value = str(getattr(value, 'value', value))
+        record[name] = value
+    return record
+
+
+class ParquetSink:
+    """One Parquet file per resource type; each write is one row group"""
+
+    extension = 'parquet'
+
+    def __init__(self, path: str, resource_type: str):
+        self.schema = _arrow_schema(resource_type)
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows: List[Dict[str, Any]]):
+        columns = {name: [row[name] for row in rows] for name in self.schema.names}
+        self.writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class JsonlSink:
+    """gzip JSON lines fallback with the same columns; the first line carries the schema"""
+
+    extension = 'jsonl.gz'
+
+    def __init__(self, path: str, resource_type: str):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self.file.write(json.dumps({'_schema': SCHEMAS[resource_type], 'schema_version': SCHEMA_VERSION}) + '\n')
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self.file.write(''.join(json.dumps(row) + '\n' for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class InventoryExporter:
+    """
+    Exports resource groups, VMs, storage accounts and web apps for one or more subscriptions
+
+    Each (subscription, resource group, resource type) listing runs on a worker
+    thread. Rows are buffered per type and written as row groups of ROW_GROUP_SIZE,
+    so memory depends on parallelism and row group size rather than tenant size.
+    """
+
+    def __init__(self, manager: AzureManager, output_dir: str, subscription_ids: Optional[List[str]] = None,
+                 parallelism: int = DEFAULT_PARALLELISM, power_state: bool = False, fmt: Optional[str] = None,
+                 row_group_size: int = ROW_GROUP_SIZE):
+        self.manager = manager
+        self.output_dir = output_dir
+        self.subscription_ids = subscription_ids or [manager.subscription_id]
+        self.parallelism = parallelism
+        self.power_state = power_state
+        self.row_group_size = row_group_size
+        self.format = fmt or ('parquet' if pq is not None else 'jsonl')
+        if self.format == 'parquet' and pq is None:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        self._sinks = {}
+        self._locks = {}
+        self._buffers = {resource_type: [] for resource_type in SCHEMAS}
+        self.counts = {resource_type: 0 for resource_type in SCHEMAS}
+
+    def _manager_for(self, subscription_id: str) -> AzureManager:
+        """Managers for other subscriptions share the already authenticated credential"""
+        if subscription_id == self.manager.subscription_id:
+            return self.manager
+        manager = AzureManager(subscription_id)
+        manager.credential = self.manager.credential
+        return manager
+
+    def _append(self, resource_type: str, rows: List[Dict[str, Any]], flush: bool = False):
+        """Buffer rows from all workers of a type and write them out one full row group at a time"""
+        with self._locks[resource_type]:
+            buffer = self._buffers[resource_type]
+            buffer.extend(rows)
+            self.counts[resource_type] += len(rows)
+            while len(buffer) >= self.row_group_size or (flush and buffer):
+                self._sinks[resource_type].write(buffer[:self.row_group_size])
+                del buffer[:self.row_group_size]
+
+    def _drain(self, resource_type: str, subscription_id: str, rows: Iterable[Dict[str, Any]]):
+        batch = []
+        for row in rows:
+            batch.append(_normalise(row, resource_type, subscription_id))
+            if len(batch) >= APPEND_BATCH:
+                self._append(resource_type, batch)
+                batch = []
+        if batch:
+            self._append(resource_type, batch)
+
+    def _export(self, resource_type: str, manager: AzureManager, resource_group: str):
+        if resource_type == 'virtual_machines':
+            rows = manager.iter_virtual_machines(resource_group, power_state=self.power_state)
+        elif resource_type == 'storage_accounts':
+            rows = manager.iter_storage_accounts(resource_group)
+        else:
+            rows = manager.iter_web_apps(resource_group)
+        self._drain(resource_type, manager.subscription_id, rows)
+
+    def run(self) -> Dict[str, Any]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        sink_class = ParquetSink if self.format == 'parquet' else JsonlSink
+        files = {}
+        for resource_type in SCHEMAS:
+            path = os.path.join(self.output_dir, f"{resource_type}.{sink_class.extension}")
+            self._sinks[resource_type] = sink_class(path, resource_type)
+            self._locks[resource_type] = threading.Lock()
+            files[resource_type] = path
+
+        start = time.perf_counter()
+        errors = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
+                futures = {}
+                for subscription_id in self.subscription_ids:
+                    manager = self._manager_for(subscription_id)
+                    resource_groups = list(manager.iter_resource_groups())
+                    self._drain('resource_groups', subscription_id, resource_groups)
+                    for rg in resource_groups:
+                        for resource_type in ('virtual_machines', 'storage_accounts', 'web_apps'):
+                            future = executor.submit(self._export, resource_type, manager, rg['name'])
+                            futures[future] = f"{subscription_id}/{rg['name']}/{resource_type}"
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(f"{futures[future]}: {e}")
+            for resource_type in SCHEMAS:
+                self._append(resource_type, [], flush=True)
+        finally:
+            for sink in self._sinks.values():
+                sink.close()
+
+        elapsed = time.perf_counter() - start
+        manifest = {
+            'schema_version': SCHEMA_VERSION,
+            'format': self.format,
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+            'subscriptions': self.subscription_ids,
+            'counts': self.counts,
+            'files': {k: os.path.basename(v) for k, v in files.items()},
+            'errors': errors
+        }
+        with open(os.path.join(self.output_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        return {
+            **manifest,
+            'elapsed_seconds': round(elapsed, 2),
+            'peak_rss_mb': _peak_rss_mb()
+        }
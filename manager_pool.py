@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Azure Manager Pool
+Thread-safe AzureManager instances keyed by credential identity, with backoff
+after authentication failures and background token refresh
+"""
+
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from azure_manager import AzureManager, arm_client_options
+
+logger = logging.getLogger(__name__)
+
+ARM_SCOPE = 'https://management.azure.com/.default'
+AUTH_INITIAL_BACKOFF = float(os.getenv('AZURE_AUTH_INITIAL_BACKOFF', '2'))
+AUTH_MAX_BACKOFF = float(os.getenv('AZURE_AUTH_MAX_BACKOFF', '300'))
+# azure-identity renews cached tokens within 5 minutes of expiry, so checking
+# more often than that keeps renewals on this thread instead of request threads
+TOKEN_REFRESH_INTERVAL = float(os.getenv('AZURE_TOKEN_REFRESH_INTERVAL', '60'))
+
+Identity = Tuple[str, str, str, str]
+
+
+def credential_identity(settings: Optional[Dict[str, str]] = None) -> Identity:
+    """(subscription, tenant, client, secret fingerprint) of a service principal (default: environment)"""
+    settings = os.environ if settings is None else settings
+    secret = settings.get('AZURE_CLIENT_SECRET', '')
+    fingerprint = hashlib.sha256(secret.encode()).hexdigest()[:12] if secret else ''
+    return (
+        settings.get('AZURE_SUBSCRIPTION_ID', ''),
+        settings.get('AZURE_TENANT_ID', ''),
+        settings.get('AZURE_CLIENT_ID', ''),
+        fingerprint
+    )
+
+
+class _PoolEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.manager: Optional[AzureManager] = None
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class ManagerPool:
+    """
+    Lazily authenticated AzureManagers, keyed by the identity of the credentials they were built from
+
+    Only one thread authenticates a given identity at a time; the others wait for
+    its result. After a failure, get() returns None without retrying until the
+    jittered exponential backoff has elapsed.
+
+    Until a reloaded config is installed the environment decides the identity.
+    After that, the installed identity and settings do, so requests that arrive
+    while os.environ is being updated still find the installed manager.
+    """
+
+    def __init__(self, initial_backoff: float = AUTH_INITIAL_BACKOFF, max_backoff: float = AUTH_MAX_BACKOFF,
+                 refresh_interval: float = TOKEN_REFRESH_INTERVAL):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[Identity, _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        # Set by install(), before os.environ changes
+        self.active_identity: Optional[Identity] = None
+        self._active_settings: Optional[Dict[str, str]] = None
+
+    def _active(self) -> Tuple[Identity, Optional[Dict[str, str]]]:
+        """(identity, settings) to serve requests with; settings None means the environment"""
+        with self._lock:
+            if self.active_identity is not None:
+                return self.active_identity, self._active_settings
+        return credential_identity(), None
+
+    def _entry(self, identity: Identity) -> _PoolEntry:
+        with self._lock:
+            if identity not in self._entries:
+                self._entries[identity] = _PoolEntry()
+            return self._entries[identity]
+
+    def peek(self) -> Optional[AzureManager]:
+        """The authenticated manager for the active credentials, without authenticating"""
+        identity, _ = self._active()
+        entry = self._entries.get(identity)
+        return entry.manager if entry else None
+
+    def get(self) -> Optional[AzureManager]:
+        """
+        Get or create the authenticated manager for the active credentials
+
+        The manager is built from the same settings its identity was computed
+        from, so it is never cached under another identity.
+        """
+        identity, settings = self._active()
+        entry = self._entry(identity)
+        if entry.manager is not None:
+            return entry.manager
+        if time.monotonic() < entry.retry_at:
+            return None
+
+        with entry.lock:
+            # Another thread may have finished (or failed) authenticating while we waited
+            if entry.manager is not None or time.monotonic() < entry.retry_at:
+                return entry.manager
+            try:
+                manager = AzureManager(settings=settings)
+                if manager.authenticate('service_principal'):
+                    entry.manager = manager
+                    entry.failures = 0
+                    entry.retry_at = 0.0
+                    self._start_refresher()
+                    return manager
+            except Exception as e:
+                logger.error(f"Failed to initialize Azure manager: {e}")
+
+            entry.failures += 1
+            delay = min(self.initial_backoff * 2 ** (entry.failures - 1), self.max_backoff)
+            entry.retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+            logger.warning(f"Azure authentication failed ({entry.failures} in a row); retrying after {delay:.0f}s")
+            return None
+
+    def install(self, identity: Identity, manager: AzureManager, settings: Optional[Dict[str, str]] = None):
+        """
+        Make an already authenticated manager (built from settings) the active one, dropping the others
+
+        Call this before changing os.environ: from here on, get() and peek() use
+        identity and settings instead of the environment.
+        """
+        entry = _PoolEntry()
+        entry.manager = manager
+        with self._lock:
+            self._entries = {identity: entry}
+            self.active_identity = identity
+            self._active_settings = dict(settings) if settings is not None else None
+        self._start_refresher()
+
+    def reset(self):
+        """Drop every manager and backoff state, forcing re-authentication"""
+        with self._lock:
+            self._entries = {}
+
+    def refresh_tokens(self):
+        """Fetch an ARM token for every pooled credential, renewing any that are about to expire"""
+        if 'authentication_policy' in arm_client_options():
+            # Fake ARM endpoints and cassette replays don't use bearer tokens
+            return
+        with self._lock:
+            managers = [e.manager for e in self._entries.values() if e.manager is not None]
+        for manager in managers:
+            try:
+                manager.credential.get_token(ARM_SCOPE)
+            except Exception as e:
+                logger.warning(f"Background token refresh failed: {e}")
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh_tokens()
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, daemon=True, name='token-refresher')
+                self._refresher.start()
+
+
+class CredentialReloader:
+    """
+    Applies new config versions in the background
+
+    The new credentials are authenticated on the watcher thread while the current
+    manager keeps serving. Only a working manager is swapped in, and only after
+    the pool serves it do the AZURE_* environment variables change.
+    """
+
+    def __init__(self, pool: ManagerPool, active_version: Optional[int] = None,
+                 on_swap: Optional[Callable[[int], None]] = None):
+        self.pool = pool
+        self.on_swap = on_swap
+        self._status = {
+            'active_version': active_version,
+            'pending_version': None,
+            'failed_version': None,
+            'error': None
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return dict(self._status)
+
+    def apply(self, version: int, settings: Dict[str, str]):
+        """Validate settings and swap them in; called by ConfigWatcher"""
+        self._status = {**self._status, 'pending_version': version}
+        logger.info(f"Validating Azure config version {version}")
+        try:
+            manager = AzureManager(settings=settings)
+            authenticated = manager.authenticate('service_principal')
+            error = None if authenticated else 'Authentication failed. Please verify your credentials.'
+        except Exception as e:
+            authenticated, error = False, str(e)
+
+        if not authenticated:
+            logger.error(f"Azure config version {version} rejected, keeping the current credentials: {error}")
+            self._status = {**self._status, 'pending_version': None, 'failed_version': version, 'error': error}
+            return
+
+        # The pool serves the new manager before the environment starts changing
+        self.pool.install(credential_identity(settings), manager, settings)
+        for key, value in settings.items():
+            if key.startswith('AZURE_'):
+                os.environ[key] = value
+        self._status = {'active_version': version, 'pending_version': None, 'failed_version': None, 'error': None}
+        logger.info(f"Azure config version {version} is now active")
+        if self.on_swap is not None:
+            self.on_swap(version)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Network Topology
+Loads the VMs, NICs, NSGs, virtual networks (with their subnets) and public IPs of a
+resource group or subscription with one list call per type, and joins them in memory
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# One worker per resource type listed
+DEFAULT_WORKERS = 5
+
+
+def _key(resource_id: Optional[str]) -> Optional[str]:
+    return resource_id.lower() if resource_id else None
+
+
+def _ref(reference) -> Optional[str]:
+    """Lower-case ID of an SDK sub-resource reference, or None"""
+    return _key(reference.id) if reference is not None else None
+
+
+def _name(resource_id: Optional[str]) -> Optional[str]:
+    return resource_id.split('/')[-1] if resource_id else None
+
+
+def enum_value(value: Any) -> Any:
+    """The string behind an SDK enum (e.g. 'Tcp' for SecurityRuleProtocol.TCP); other values unchanged"""
+    return value.value if hasattr(value, 'value') else value
+
+
+class NetworkTopology:
+    """
+    VMs and their network resources, indexed by lower-case resource ID
+
+    Besides the resources themselves it keeps the joins the per-hop GETs used
+    to walk: a VM's NICs, a NIC's subnet, NSG and public IPs, a subnet's NSG,
+    and the reverse (the NICs in a subnet or behind an NSG).
+    """
+
+    def __init__(self):
+        self.vms: Dict[str, Any] = {}
+        self.nics: Dict[str, Any] = {}
+        self.nsgs: Dict[str, Any] = {}
+        self.vnets: Dict[str, Any] = {}
+        self.subnets: Dict[str, Any] = {}
+        self.public_ips: Dict[str, Any] = {}
+        self.nics_by_vm: Dict[str, List[str]] = {}
+        self.nics_by_subnet: Dict[str, List[str]] = {}
+        self.nics_by_nsg: Dict[str, List[str]] = {}
+        self.subnets_by_nsg: Dict[str, List[str]] = {}
+        self._vms_by_name: Dict[str, List[str]] = {}
+        # ARM calls made to load this topology, by operation
+        self.calls: Dict[str, int] = {}
+
+    def _index(self):
+        self.subnets.update({_key(subnet.id): subnet for vnet in self.vnets.values() for subnet in vnet.subnets or []})
+        self.nics_by_vm, self.nics_by_subnet, self.nics_by_nsg, self.subnets_by_nsg, self._vms_by_name = {}, {}, {}, {}, {}
+        for key, vm in self.vms.items():
+            self._vms_by_name.setdefault(vm.name.lower(), []).append(key)
+        for key, nic in self.nics.items():
+            vm = _ref(nic.virtual_machine)
+            if vm:
+                self.nics_by_vm.setdefault(vm, []).append(key)
+            nsg = _ref(nic.network_security_group)
+            if nsg:
+                self.nics_by_nsg.setdefault(nsg, []).append(key)
+            for subnet in {_ref(config.subnet) for config in nic.ip_configurations or []} - {None}:
+                self.nics_by_subnet.setdefault(subnet, []).append(key)
+        for key, subnet in self.subnets.items():
+            nsg = _ref(subnet.network_security_group)
+            if nsg:
+                self.subnets_by_nsg.setdefault(nsg, []).append(key)
+
+    def missing_references(self) -> Dict[str, set]:
+        """IDs referenced by loaded resources but outside the loaded scope (e.g. a VNet in another resource group)"""
+        missing = {'nsgs': set(), 'subnets': set(), 'public_ips': set()}
+        for nic in self.nics.values():
+            missing['nsgs'].add(_ref(nic.network_security_group))
+            for config in nic.ip_configurations or []:
+                missing['subnets'].add(_ref(config.subnet))
+                missing['public_ips'].add(_ref(config.public_ip_address))
+        for subnet in self.subnets.values():
+            missing['nsgs'].add(_ref(subnet.network_security_group))
+        return {kind: ids - set(getattr(self, kind)) - {None} for kind, ids in missing.items()}
+
+    def find_vm(self, name: str, resource_group: Optional[str] = None) -> Optional[str]:
+        """Key of the VM called name (in resource_group, if given), or None"""
+        for key in self._vms_by_name.get(name.lower(), []):
+            if resource_group is None or key.split('/')[4] == resource_group.lower():
+                return key
+        return None
+
+    def vm_network(self, vm_key: str) -> Dict[str, Any]:
+        """
+        A VM's network as plain data: name, resource_group, location, vm_size and
+        one entry per NIC with its private IPs, subnet, VNet, NIC NSG, subnet NSG
+        and public IPs (None where a reference couldn't be resolved)
+        """
+        vm = self.vms[vm_key]
+        nic_keys = [_ref(nic) for nic in (vm.network_profile.network_interfaces if vm.network_profile else None) or []]
+        nics = []
+        for nic_key in nic_keys:
+            nic = self.nics.get(nic_key)
+            if nic is None:
+                nics.append({'name': _name(nic_key), 'missing': True})
+                continue
+            configs = nic.ip_configurations or []
+            subnet_key = next((_ref(config.subnet) for config in configs if config.subnet is not None), None)
+            subnet = self.subnets.get(subnet_key)
+            subnet_nsg = _ref(subnet.network_security_group) if subnet is not None else None
+            public_ips = []
+            for config in configs:
+                pip_key = _ref(config.public_ip_address)
+                if pip_key:
+                    pip = self.public_ips.get(pip_key)
+                    public_ips.append({'id': pip_key, 'name': _name(pip_key), 'missing': pip is None,
+                                       'ip_address': pip.ip_address if pip is not None else None})
+            nics.append({
+                'id': nic_key,
+                'name': nic.name,
+                'private_ips': [config.private_ip_address for config in configs if config.private_ip_address],
+                'subnet': _name(subnet_key),
+                'subnet_id': subnet_key,
+                'vnet': subnet_key.split('/')[8] if subnet_key else None,
+                'address_prefix': subnet.address_prefix if subnet is not None else None,
+                'nsg': _name(_ref(nic.network_security_group)),
+                'nsg_id': _ref(nic.network_security_group),
+                'subnet_nsg': _name(subnet_nsg),
+                'subnet_nsg_id': subnet_nsg,
+                'public_ips': public_ips
+            })
+        return {
+            'id': vm_key,
+            'name': vm.name,
+            'resource_group': vm.id.split('/')[4],
+            'location': vm.location,
+            'vm_size': enum_value(vm.hardware_profile.vm_size) if vm.hardware_profile else None,
+            'nics': nics
+        }
+
+    def vms_in_subnet(self, subnet_id: str) -> List[str]:
+        return sorted({_ref(self.nics[nic].virtual_machine) for nic in self.nics_by_subnet.get(_key(subnet_id), [])
+                       if self.nics[nic].virtual_machine is not None})
+
+    def vms_behind_nsg(self, nsg_id: str) -> List[str]:
+        """VMs the NSG applies to, through a NIC or through a subnet"""
+        nsg_id = _key(nsg_id)
+        nics = set(self.nics_by_nsg.get(nsg_id, []))
+        for subnet in self.subnets_by_nsg.get(nsg_id, []):
+            nics.update(self.nics_by_subnet.get(subnet, []))
+        return sorted({_ref(self.nics[nic].virtual_machine) for nic in nics if self.nics[nic].virtual_machine is not None})
+
+
+def load_topology(compute_client, network_client, resource_group: Optional[str] = None,
+                  resolve_missing: bool = True, max_workers: int = DEFAULT_WORKERS) -> NetworkTopology:
+    """
+    List every VM, NIC, NSG, VNet and public IP in resource_group (or the
+    subscription) concurrently and index them into a NetworkTopology
+
+    Subnets come inline with their VNets, so they cost no extra calls. With
+    resolve_missing, resources referenced from outside the scope (a NIC in
+    this group on a VNet in a shared networking group, say) are then fetched
+    with one GET each; no other per-resource reads are made.
+    """
+    topology = NetworkTopology()
+
+    def listing(operation, client_operations):
+        if resource_group:
+            return operation, lambda: client_operations.list(resource_group)
+        return operation, client_operations.list_all
+
+    listings = {
+        'vms': listing('virtual_machines.list', compute_client.virtual_machines),
+        'nics': listing('network_interfaces.list', network_client.network_interfaces),
+        'nsgs': listing('network_security_groups.list', network_client.network_security_groups),
+        'vnets': listing('virtual_networks.list', network_client.virtual_networks),
+        'public_ips': listing('public_ip_addresses.list', network_client.public_ip_addresses)
+    }
+
+    def load(kind):
+        operation, list_all = listings[kind]
+        pager = list_all().by_page()
+        resources = {}
+        pages = 0
+        for page in pager:
+            pages += 1
+            resources.update({_key(resource.id): resource for resource in page})
+        return kind, operation, pages, resources
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='topology') as executor:
+        for kind, operation, pages, resources in executor.map(load, listings):
+            getattr(topology, kind).update(resources)
+            topology.calls[operation] = pages
+    topology._index()
+
+    if resolve_missing:
+        _resolve_missing(topology, network_client, max_workers)
+    return topology
+
+
+def _resolve_missing(topology: NetworkTopology, network_client, max_workers: int = DEFAULT_WORKERS):
+    """
+    Fetch out-of-scope references one GET each; a subnet is fetched with its whole VNet
+
+    A fetched VNet can reference further NSGs, so this repeats until nothing new is referenced.
+    """
+    attempted = set()
+
+    def read(item):
+        kind, operation, resource_id, get = item
+        parts = resource_id.split('/')
+        try:
+            return kind, operation, get(parts[4], parts[8])
+        except Exception as e:
+            # Unreadable references (deleted, or no permission) stay unresolved in vm_network()
+            logger.warning(f"Could not read {resource_id}: {str(e).splitlines()[0] if str(e) else repr(e)}")
+            return kind, operation, None
+
+    while True:
+        missing = topology.missing_references()
+        vnets = {subnet.rsplit('/subnets/', 1)[0] for subnet in missing['subnets']}
+        reads = ([('nsgs', 'network_security_groups.get', nsg, network_client.network_security_groups.get)
+                  for nsg in missing['nsgs']] +
+                 [('vnets', 'virtual_networks.get', vnet, network_client.virtual_networks.get) for vnet in vnets] +
+                 [('public_ips', 'public_ip_addresses.get', pip, network_client.public_ip_addresses.get)
+                  for pip in missing['public_ips']])
+        reads = [item for item in reads if item[2] not in attempted]
+        if not reads:
+            return
+        attempted.update(item[2] for item in reads)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='topology') as executor:
+            for kind, operation, resource in executor.map(read, reads):
+                topology.calls[operation] = topology.calls.get(operation, 0) + 1
+                if resource is not None:
+                    getattr(topology, kind)[_key(resource.id)] = resource
+        topology._index()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+NSG Engine
+Effective NSG evaluation over a NetworkTopology: subnet and NIC rules are compiled
+into priority-ordered interval indexes over ports and addresses, so "is this traffic
+allowed to this VM" and "which VMs expose this port" are lookups, not rule scans
+"""
+
+import bisect
+import ipaddress
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from network_topology import NetworkTopology, enum_value
+
+logger = logging.getLogger(__name__)
+
+INBOUND = 'Inbound'
+OUTBOUND = 'Outbound'
+
+MAX_ADDRESS = 2 ** 32 - 1
+ALL_ADDRESSES = ((0, MAX_ADDRESS),)
+ALL_PORTS = ((0, 65535),)
+# Not part of the Internet service tag, besides the VNet's own address space
+NON_INTERNET = ('10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '100.64.0.0/10',
+                '127.0.0.0/8', '169.254.0.0/16', '168.63.129.16/32')
+AZURE_LOAD_BALANCER = '168.63.129.16/32'
+
+# Address sets are tuples of sorted, disjoint, inclusive (low, high) intervals, so they hash
+
+
+def _merge(intervals: Iterable[Tuple[int, int]]) -> tuple:
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return tuple(merged)
+
+
+def _intersect(a: tuple, b: tuple) -> tuple:
+    result, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        low, high = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if low <= high:
+            result.append((low, high))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return tuple(result)
+
+
+def _subtract(a: tuple, b: tuple) -> tuple:
+    result = []
+    for low, high in a:
+        for b_low, b_high in b:
+            if b_high < low or b_low > high:
+                continue
+            if b_low > low:
+                result.append((low, b_low - 1))
+            low = b_high + 1
+            if low > high:
+                break
+        if low <= high:
+            result.append((low, high))
+    return tuple(result)
+
+
+def _contains(intervals: tuple, value: int) -> bool:
+    index = bisect.bisect_right(intervals, (value, MAX_ADDRESS + 1)) - 1
+    return index >= 0 and intervals[index][0] <= value <= intervals[index][1]
+
+
+def _prefix(prefix: str) -> Optional[Tuple[int, int]]:
+    """(low, high) of an IPv4 address or CIDR, or None for anything else (IPv6, unknown tags)"""
+    try:
+        network = ipaddress.ip_network(prefix.strip(), strict=False)
+    except ValueError:
+        return None
+    if network.version != 4:
+        return None
+    return int(network.network_address), int(network.broadcast_address)
+
+
+def ip_to_int(address: str) -> int:
+    return int(ipaddress.IPv4Address(address))
+
+
+def to_cidrs(intervals: tuple) -> List[str]:
+    """An address set as the shortest list of CIDRs"""
+    cidrs = []
+    for low, high in intervals:
+        cidrs.extend(str(network) for network in ipaddress.summarize_address_range(
+            ipaddress.IPv4Address(low), ipaddress.IPv4Address(high)))
+    return cidrs
+
+
+def _ports(single: Optional[str], ranges: Optional[List[str]]) -> Optional[tuple]:
+    """Port ranges of a rule, or None for '*'"""
+    values = [*(ranges or []), *([single] if single else [])]
+    intervals = []
+    for value in values:
+        value = value.strip()
+        if value == '*':
+            return None
+        low, _, high = value.partition('-')
+        intervals.append((int(low), int(high or low)))
+    return _merge(intervals) if intervals else None
+
+
+class _Rule:
+    __slots__ = ('name', 'priority', 'allow', 'protocol', 'ports', 'remote', 'local', 'source_ports')
+
+    def __init__(self, name, priority, allow, protocol, ports, remote, local, source_ports):
+        self.name = name
+        self.priority = priority
+        self.allow = allow
+        self.protocol = protocol
+        self.ports = ports
+        self.remote = remote
+        self.local = local
+        self.source_ports = source_ports
+
+
+class CompiledNsg:
+    """
+    One NSG's rules for one direction, resolved against one VNet's address space
+
+    Rules are sorted by priority and indexed twice: elementary port segments
+    map to the rules covering them, in priority order, and elementary local
+    address segments (the VM side) map to the set of rules matching them.
+    Finding the rules for a flow is then two binary searches. Evaluations are
+    memoised on (port segment, local segment, protocol, remote set, source
+    port), so VMs that share an NSG share the work.
+    """
+
+    def __init__(self, nsg, vnet_space: tuple, direction: str = INBOUND):
+        self.name = nsg.name
+        self.direction = direction
+        self.unresolved = set()
+        rules = [rule for rule in [*(nsg.security_rules or []), *(nsg.default_security_rules or [])]
+                 if (enum_value(rule.direction) or INBOUND).lower() == direction.lower()]
+        self.rules = [self._compile(rule, vnet_space) for rule in sorted(rules, key=lambda r: r.priority)]
+
+        port_bounds = sorted({0} | {bound for rule in self.rules for low, high in rule.ports
+                                    for bound in (low, high + 1) if bound <= 65535})
+        self.port_bounds = port_bounds
+        self.port_rules: List[List[int]] = [[] for _ in port_bounds]
+        local_bounds = sorted({0} | {bound for rule in self.rules for low, high in rule.local
+                                     for bound in (low, high + 1) if bound <= MAX_ADDRESS})
+        self.local_bounds = np.array(local_bounds, dtype=np.int64)
+        local_rules = [set() for _ in local_bounds]
+        for index, rule in enumerate(self.rules):
+            for low, high in rule.ports:
+                for segment in range(bisect.bisect_left(port_bounds, low), bisect.bisect_left(port_bounds, high + 1)):
+                    self.port_rules[segment].append(index)
+            for low, high in rule.local:
+                for segment in range(bisect.bisect_left(local_bounds, low), bisect.bisect_left(local_bounds, high + 1)):
+                    local_rules[segment].add(index)
+        self.local_rules = [frozenset(rules) for rules in local_rules]
+        self._memo: Dict[tuple, Tuple[tuple, list]] = {}
+
+    def _compile(self, rule, vnet_space: tuple) -> _Rule:
+        source = self._addresses(rule.source_address_prefix, rule.source_address_prefixes,
+                                 rule.source_application_security_groups, vnet_space, rule.name)
+        destination = self._addresses(rule.destination_address_prefix, rule.destination_address_prefixes,
+                                      rule.destination_application_security_groups, vnet_space, rule.name)
+        inbound = self.direction == INBOUND
+        protocol = (enum_value(rule.protocol) or '*').lower()
+        return _Rule(rule.name, rule.priority, (enum_value(rule.access) or '').lower() == 'allow',
+                     '*' if protocol in ('*', 'any') else protocol,
+                     _ports(rule.destination_port_range, rule.destination_port_ranges) or ALL_PORTS,
+                     source if inbound else destination, destination if inbound else source,
+                     _ports(rule.source_port_range, rule.source_port_ranges))
+
+    def _addresses(self, single, prefixes, asgs, vnet_space: tuple, rule_name: str) -> tuple:
+        values = [*(prefixes or []), *([single] if single else [])]
+        intervals = []
+        for value in values:
+            resolved = resolve_addresses(value, vnet_space)
+            if resolved is None:
+                self.unresolved.add(f"{self.name}/{rule_name}: {value}")
+            else:
+                intervals.extend(resolved)
+        if asgs:
+            # Application security group membership isn't part of the topology; such rules match nothing here
+            self.unresolved.add(f"{self.name}/{rule_name}: application security groups")
+        return _merge(intervals)
+
+    def port_segment(self, port: int) -> int:
+        return bisect.bisect_right(self.port_bounds, port) - 1
+
+    def local_segment(self, address: int) -> int:
+        return int(np.searchsorted(self.local_bounds, address, side='right')) - 1
+
+    def evaluate(self, port_segment: int, local_segment: int, protocol: str, remote: tuple,
+                 source_port: Optional[int] = None) -> Tuple[tuple, list]:
+        """
+        The part of remote this NSG allows, and the rules that decided it
+
+        Rules are applied in priority order to what earlier rules left
+        unmatched, so each remote address is decided by its first matching
+        rule. Rules restricted to particular source ports only match when
+        source_port is given.
+
+        Returns:
+            (allowed address set, [(rule, 'Allow'/'Deny', matched address set), ...])
+        """
+        key = (port_segment, local_segment, protocol, remote, source_port)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        local_rules = self.local_rules[local_segment]
+        remaining, allowed, matches = remote, (), []
+        for index in self.port_rules[port_segment]:
+            if index not in local_rules:
+                continue
+            rule = self.rules[index]
+            if rule.protocol != '*' and rule.protocol != protocol:
+                continue
+            if rule.source_ports is not None and (source_port is None or not _contains(rule.source_ports, source_port)):
+                continue
+            matched = _intersect(remaining, rule.remote)
+            if not matched:
+                continue
+            matches.append((rule.name, 'Allow' if rule.allow else 'Deny', matched))
+            if rule.allow:
+                allowed = _merge(allowed + matched)
+            remaining = _subtract(remaining, matched)
+            if not remaining:
+                break
+        self._memo[key] = (allowed, matches)
+        return allowed, matches
+
+
+def resolve_addresses(value: str, vnet_space: tuple) -> Optional[tuple]:
+    """Address set of a prefix, address or service tag, or None if it can't be resolved"""
+    tag = value.strip().lower()
+    if tag in ('*', 'any', '0.0.0.0/0'):
+        return ALL_ADDRESSES
+    if tag == 'internet':
+        excluded = _merge([_prefix(prefix) for prefix in NON_INTERNET] + list(vnet_space))
+        return _subtract(ALL_ADDRESSES, excluded)
+    if tag == 'virtualnetwork':
+        # Peered and on-premises ranges are also VirtualNetwork in Azure, but aren't in the topology
+        return vnet_space
+    if tag == 'azureloadbalancer':
+        return (_prefix(AZURE_LOAD_BALANCER),)
+    interval = _prefix(value)
+    return (interval,) if interval is not None else None
+
+
+class NsgEngine:
+    """
+    Effective security rules for the VMs of a NetworkTopology
+
+    A flow is allowed to a NIC only if both its subnet's NSG and its own NSG
+    allow it (a missing NSG allows everything), as in Azure: inbound traffic
+    meets the subnet NSG first, outbound the NIC's. remote is the other end of
+    the flow: an address, a CIDR, or the Internet, VirtualNetwork or
+    AzureLoadBalancer tags. A CIDR or tag is a set of addresses, and a flow is
+    allowed if any of them is.
+    """
+
+    def __init__(self, topology: NetworkTopology):
+        self.topology = topology
+        self._compiled: Dict[Tuple[str, str, str], Optional[CompiledNsg]] = {}
+        self._vnet_spaces: Dict[Optional[str], tuple] = {}
+        # Per-VM NIC targets; reading SDK models is the slow part of a repeated query
+        self._vm_targets: Dict[str, List[Dict[str, Any]]] = {}
+        self.unresolved = set()
+
+    def vnet_space(self, vnet_key: Optional[str]) -> tuple:
+        if vnet_key not in self._vnet_spaces:
+            vnet = self.topology.vnets.get(vnet_key) if vnet_key else None
+            prefixes = vnet.address_space.address_prefixes or [] if vnet is not None and vnet.address_space else []
+            self._vnet_spaces[vnet_key] = _merge(filter(None, (_prefix(prefix) for prefix in prefixes)))
+        return self._vnet_spaces[vnet_key]
+
+    def compiled(self, nsg_key: Optional[str], vnet_key: Optional[str], direction: str = INBOUND) -> Optional[CompiledNsg]:
+        """The NSG compiled for one VNet and direction, or None if there is no such NSG loaded"""
+        key = (nsg_key, vnet_key, direction)
+        if key not in self._compiled:
+            nsg = self.topology.nsgs.get(nsg_key) if nsg_key else None
+            compiled = CompiledNsg(nsg, self.vnet_space(vnet_key), direction) if nsg is not None else None
+            if compiled is not None and compiled.unresolved:
+                logger.warning(f"NSG {nsg.name}: {len(compiled.unresolved)} rule address(es) can't be resolved "
+                               f"and match nothing: {', '.join(sorted(compiled.unresolved)[:3])}")
+                self.unresolved |= compiled.unresolved
+            self._compiled[key] = compiled
+        return self._compiled[key]
+
+    def remote_addresses(self, remote: str, vnet_key: Optional[str]) -> tuple:
+        addresses = resolve_addresses(remote, self.vnet_space(vnet_key))
+        if addresses is None:
+            raise ValueError(f"Unknown address or service tag: {remote}")
+        return addresses
+
+    def _targets(self, vm_keys: Iterable[str]) -> List[Dict[str, Any]]:
+        """One entry per NIC of each VM with what evaluating it needs"""
+        targets = []
+        for vm_key in vm_keys:
+            if vm_key in self._vm_targets:
+                targets.extend(self._vm_targets[vm_key])
+                continue
+            network = self.topology.vm_network(vm_key)
+            vm_targets = self._vm_targets[vm_key] = []
+            for nic in network['nics']:
+                if nic.get('missing') or not nic['private_ips']:
+                    continue
+                subnet = self.topology.subnets.get(nic['subnet_id'])
+                vm_targets.append({
+                    'vm': network['name'], 'vm_id': vm_key, 'resource_group': network['resource_group'],
+                    'nic': nic['name'], 'private_ip': nic['private_ips'][0],
+                    'vnet_key': nic['subnet_id'].rsplit('/subnets/', 1)[0] if subnet is not None else None,
+                    'subnet_nsg': nic['subnet_nsg_id'], 'nic_nsg': nic['nsg_id'],
+                    'public_addresses': [pip['ip_address'] or pip['name'] for pip in nic['public_ips']]
+                })
+            targets.extend(vm_targets)
+        return targets
+
+    def _decide(self, target: Dict[str, Any], port: int, protocol: str, remote: str, direction: str,
+                source_port: Optional[int]) -> Dict[str, Any]:
+        addresses = self.remote_addresses(remote, target['vnet_key'])
+        local = ip_to_int(target['private_ip'])
+        scopes = [('subnet', target['subnet_nsg']), ('nic', target['nic_nsg'])]
+        if direction == OUTBOUND:
+            scopes.reverse()
+        allowed, evaluations = addresses, []
+        for scope, nsg_key in scopes:
+            compiled = self.compiled(nsg_key, target['vnet_key'], direction)
+            if compiled is None:
+                if nsg_key:
+                    # Referenced but not loaded (no permission, or deleted): assume it allows, and say so
+                    evaluations.append({'scope': scope, 'name': nsg_key.split('/')[-1], 'allowed': addresses,
+                                        'matches': [], 'unreadable': True})
+                continue
+            nsg_allowed, matches = compiled.evaluate(compiled.port_segment(port), compiled.local_segment(local),
+                                                     protocol.lower(), addresses, source_port)
+            evaluations.append({'scope': scope, 'name': compiled.name, 'allowed': nsg_allowed, 'matches': matches})
+            allowed = _intersect(allowed, nsg_allowed)
+
+        nsgs = []
+        for evaluation in evaluations:
+            if allowed:
+                rules = [name for name, access, matched in evaluation['matches']
+                         if access == 'Allow' and _intersect(matched, allowed)]
+            elif not evaluation['allowed']:
+                rules = [name for name, access, _ in evaluation['matches'] if access == 'Deny']
+            else:
+                rules = [name for name, access, _ in evaluation['matches'] if access == 'Allow']
+            nsgs.append({'scope': evaluation['scope'], 'name': evaluation['name'],
+                         'allowed': bool(evaluation['allowed']), 'rules': rules,
+                         'unreadable': evaluation.get('unreadable', False)})
+        return {
+            'vm': target['vm'], 'vm_id': target['vm_id'], 'resource_group': target['resource_group'],
+            'nic': target['nic'], 'private_ip': target['private_ip'],
+            'public_ips': target['public_addresses'],
+            'allowed': bool(allowed), 'allowed_addresses': allowed, 'nsgs': nsgs
+        }
+
+    def check(self, vm_key: str, port: int, protocol: str = 'Tcp', remote: str = 'Internet',
+              direction: str = INBOUND, source_port: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Whether traffic from (or, outbound, to) remote on port reaches the VM, per NIC
+
+        Returns:
+            one dict per NIC: vm, nic, private_ip, public_ips, allowed,
+            allowed_addresses (see to_cidrs) and nsgs, the subnet and NIC NSGs
+            in evaluation order with the rules that decided the result
+        """
+        return [self._decide(target, port, protocol, remote, direction, source_port)
+                for target in self._targets([vm_key])]
+
+    def exposed(self, port: int = 3389, protocol: str = 'Tcp', remote: str = 'Internet',
+                direction: str = INBOUND, vm_keys: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        NICs across the topology (or vm_keys) that allow port from remote
+
+        Each NIC's position in each of its NSGs' address indexes is found in
+        one vectorised search per NSG. NICs that land in the same segments of
+        the same NSGs in the same VNet get the same answer, so each distinct
+        combination is evaluated once, however many VMs share it. Results are
+        as check(); for Internet exposure, only NICs with a public IP (or
+        behind a public load balancer, which isn't modelled) are reachable.
+        """
+        targets = self._targets(sorted(self.topology.vms) if vm_keys is None else vm_keys)
+        if not targets:
+            return []
+        ips = np.array([ip_to_int(target['private_ip']) for target in targets], dtype=np.int64)
+        vnets = {key: index for index, key in enumerate(sorted({str(t['vnet_key']) for t in targets}))}
+        columns = [np.array([vnets[str(t['vnet_key'])] for t in targets], dtype=np.int64)]
+        for scope in ('subnet_nsg', 'nic_nsg'):
+            contexts = {}
+            context_ids = np.array([contexts.setdefault((t[scope], t['vnet_key']), len(contexts)) for t in targets],
+                                   dtype=np.int64)
+            segments = np.full(len(targets), -1, dtype=np.int64)
+            for (nsg_key, vnet_key), context in contexts.items():
+                compiled = self.compiled(nsg_key, vnet_key, direction)
+                if compiled is not None:
+                    members = context_ids == context
+                    segments[members] = np.searchsorted(compiled.local_bounds, ips[members], side='right') - 1
+            columns.extend([context_ids, segments])
+
+        _, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+        representatives = {}
+        for index, combination in enumerate(np.asarray(inverse).reshape(-1)):
+            representatives.setdefault(int(combination), index)
+        outcomes = {combination: self._decide(targets[index], port, protocol, remote, direction, None)
+                    for combination, index in representatives.items()}
+
+        results = []
+        for index, combination in enumerate(np.asarray(inverse).reshape(-1)):
+            outcome = outcomes[int(combination)]
+            if not outcome['allowed']:
+                continue
+            target = targets[index]
+            results.append(dict(outcome, vm=target['vm'], vm_id=target['vm_id'], resource_group=target['resource_group'],
+                                nic=target['nic'], private_ip=target['private_ip'],
+                                public_ips=target['public_addresses']))
+        return results
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Offline Price Sheet Estimator
+Monthly cost estimates for the inventory from a local price sheet, no live pricing calls
+"""
+
+import os
+import csv
+import logging
+from typing import List, Dict, Optional, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_MONTH = 730
+WILDCARD = '*'
+
+# Inventory field that carries the SKU for each resource type
+SKU_FIELDS = {
+    'vm': 'vm_size',
+    'storage': 'sku',
+    'webapp': 'sku'
+}
+
+
+def _make_keys(types, skus, locations) -> np.ndarray:
+    """Build normalised lookup keys; all three inputs are equal-length sequences"""
+    return np.array([
+        f"{t}|{(s or WILDCARD).lower()}|{(l or WILDCARD).replace(' ', '').lower()}"
+        for t, s, l in zip(types, skus, locations)
+    ])
+
+
+class PriceSheet:
+    """
+    Sorted-key index over a price sheet
+
+    Expected columns: resource_type (vm/storage/webapp), sku, location, and either
+    monthly_price or hourly_price. sku and location may be '*' to act as a fallback.
+    """
+
+    def __init__(self, keys: np.ndarray, prices: np.ndarray, source: str = ''):
+        order = np.argsort(keys)
+        self.keys = keys[order]
+        self.prices = prices[order]
+        self.source = source
+
+    @classmethod
+    def load(cls, path: str) -> 'PriceSheet':
+        """Load a CSV or Parquet price sheet"""
+        if path.endswith('.parquet'):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("pyarrow is required to read Parquet price sheets: pip install pyarrow")
+            rows = pq.read_table(path).to_pylist()
+        else:
+            with open(path, newline='') as f:
+                rows = [row for row in csv.DictReader(f) if not (row.get('resource_type') or '').startswith('#')]
+
+        types, skus, locations, prices = [], [], [], []
+        for row in rows:
+            monthly = row.get('monthly_price')
+            if monthly in (None, ''):
+                hourly = row.get('hourly_price')
+                if hourly in (None, ''):
+                    continue
+                monthly = float(hourly) * HOURS_PER_MONTH
+            types.append((row.get('resource_type') or '').lower())
+            skus.append(row.get('sku') or WILDCARD)
+            locations.append(row.get('location') or WILDCARD)
+            prices.append(float(monthly))
+
+        return cls(_make_keys(types, skus, locations), np.array(prices, dtype=float), source=path)
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Vectorised exact-match lookup; missing keys return NaN"""
+        result = np.full(len(keys), np.nan)
+        if not len(self.keys) or not len(keys):
+            return result
+        index = np.searchsorted(self.keys, keys)
+        index = np.minimum(index, len(self.keys) - 1)
+        found = self.keys[index] == keys
+        result[found] = self.prices[index[found]]
+        return result
+
+    def estimate(self, types: List[str], skus: List[Optional[str]],
+                 locations: List[Optional[str]]) -> np.ndarray:
+        """
+        Monthly price per resource
+
+        Falls back from (type, sku, location) to (type, sku, *) to (type, *, *).
+        Unpriced resources are NaN.
+        """
+        n = len(types)
+        prices = self.lookup(_make_keys(types, skus, locations))
+        for fallback_skus, fallback_locations in (
+            (skus, [WILDCARD] * n),
+            ([WILDCARD] * n, [WILDCARD] * n)
+        ):
+            missing = np.isnan(prices)
+            if not missing.any():
+                break
+            idx = np.flatnonzero(missing)
+            prices[idx] = self.lookup(_make_keys(
+                [types[i] for i in idx],
+                [fallback_skus[i] for i in idx],
+                [fallback_locations[i] for i in idx]
+            ))
+        return prices
+
+
+def estimate_inventory(sheet: PriceSheet, inventory: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Estimate monthly cost for an inventory in one vectorised pass
+
+    Args:
+        sheet: loaded price sheet
+        inventory: {'vm': [...], 'storage': [...], 'webapp': [...]} lists of resource dicts
+
+    Returns:
+        dict with 'total', 'by_type', 'unpriced' and 'currency'
+    """
+    types, skus, locations = [], [], []
+    for resource_type, resources in inventory.items():
+        sku_field = SKU_FIELDS.get(resource_type, 'sku')
+        for resource in resources:
+            types.append(resource_type)
+            skus.append(resource.get(sku_field))
+            locations.append(resource.get('location'))
+
+    prices = sheet.estimate(types, skus, locations)
+    type_array = np.array(types)
+    priced = ~np.isnan(prices)
+
+    by_type = {}
+    for resource_type in inventory:
+        mask = (type_array == resource_type) & priced
+        by_type[resource_type] = round(float(prices[mask].sum()), 2)
+
+    return {
+        'total': round(float(prices[priced].sum()), 2),
+        'by_type': by_type,
+        'unpriced': int((~priced).sum()),
+        'currency': os.getenv('AZURE_PRICE_SHEET_CURRENCY', 'USD')
+    }
+
+
+_loaded_sheets = {}
+
+
+def get_price_sheet(path: Optional[str] = None) -> Optional[PriceSheet]:
+    """Load the configured price sheet once per process, reloading when the file changes"""
+    path = path or os.getenv('AZURE_PRICE_SHEET', 'price_sheet.csv')
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.path.getmtime(path)
+    cached = _loaded_sheets.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        sheet = PriceSheet.load(path)
+    except Exception as e:
+        logger.error(f"Failed to load price sheet {path}: {e}")
+        return cached[1] if cached else None
+
+    _loaded_sheets[path] = (mtime, sheet)
+    return sheet
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Request Profiling
+Opt-in cProfile + stack sampling for individual web requests, stored as artefacts
+"""
+
+import os
+import re
+import sys
+import hmac
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict, Optional, Any
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_MAX_ARTEFACTS = int(os.getenv('PROFILE_MAX_ARTEFACTS', '50'))
+SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5')) / 1000
+
+
+def profiling_enabled() -> bool:
+    """Profiling requires both the feature flag and an admin token"""
+    return os.getenv('PROFILING_ENABLED', 'False').lower() == 'true' and bool(os.getenv('PROFILING_ADMIN_TOKEN'))
+
+
+def is_admin(token: Optional[str]) -> bool:
+    expected = os.getenv('PROFILING_ADMIN_TOKEN')
+    return bool(expected and token and hmac.compare_digest(token, expected))
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, target_thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """cProfile plus stack sampling for the duration of one request"""
+
+    def __init__(self, label: str):
+        self.label = re.sub(r'[^A-Za-z0-9_-]+', '_', label).strip('_') or 'root'
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.started = time.perf_counter()
+
+    def start(self):
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop profiling and write '<name>.pstats' and '<name>.collapsed' artefacts"""
+        self.profiler.disable()
+        self.sampler.stop()
+        elapsed = time.perf_counter() - self.started
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{self.label}"
+        self.profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.pstats"))
+        with open(os.path.join(PROFILE_DIR, f"{name}.collapsed"), 'w') as f:
+            for stack, count in self.sampler.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        _prune_artefacts()
+        return {'name': name, 'elapsed_seconds': round(elapsed, 4)}
+
+
+def _prune_artefacts():
+    """Keep only the newest PROFILE_MAX_ARTEFACTS profiles"""
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(PROFILE_DIR)
+                    if f.endswith(('.pstats', '.collapsed'))})
+    for name in names[:max(0, len(names) - PROFILE_MAX_ARTEFACTS)]:
+        for suffix in ('.pstats', '.collapsed'):
+            path = os.path.join(PROFILE_DIR, name + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_artefacts() -> List[Dict[str, Any]]:
+    """List stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    artefacts = []
+    for filename in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not filename.endswith('.pstats'):
+            continue
+        name = filename[:-len('.pstats')]
+        path = os.path.join(PROFILE_DIR, filename)
+        stats = pstats.Stats(path)
+        artefacts.append({
+            'name': name,
+            'created': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            'total_seconds': round(stats.total_tt, 4),
+            'files': [filename, f"{name}.collapsed"]
+        })
+    return artefacts
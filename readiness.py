@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Readiness Prober
+Background thread that checks Azure connectivity with backoff and caches the
+result, so health endpoints answer without touching ARM
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+READINESS_INTERVAL = float(os.getenv('READINESS_INTERVAL', '60'))
+READINESS_INITIAL_BACKOFF = float(os.getenv('READINESS_INITIAL_BACKOFF', '5'))
+READINESS_MAX_BACKOFF = float(os.getenv('READINESS_MAX_BACKOFF', '300'))
+
+
+class ReadinessProber(threading.Thread):
+    """
+    Runs check() every READINESS_INTERVAL seconds while it succeeds, and with
+    jittered exponential backoff (up to READINESS_MAX_BACKOFF) while it fails
+    """
+
+    def __init__(self, check: Callable[[], bool], interval: float = READINESS_INTERVAL,
+                 initial_backoff: float = READINESS_INITIAL_BACKOFF, max_backoff: float = READINESS_MAX_BACKOFF):
+        super().__init__(daemon=True, name='readiness-prober')
+        self.check = check
+        self.interval = interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._wake = threading.Event()
+        self._state = {
+            'ready': False,
+            'reason': 'not checked yet',
+            'checked_at': None,
+            'consecutive_failures': 0
+        }
+
+    def run(self):
+        backoff = self.initial_backoff
+        while True:
+            try:
+                ready = bool(self.check())
+                reason = None if ready else 'Azure authentication failed'
+            except Exception as e:
+                ready, reason = False, str(e)
+
+            failures = 0 if ready else self._state['consecutive_failures'] + 1
+            # Replace the whole dict so readers never see a half-updated state
+            self._state = {
+                'ready': ready,
+                'reason': reason,
+                'checked_at': time.time(),
+                'consecutive_failures': failures
+            }
+
+            if ready:
+                backoff = self.initial_backoff
+                delay = self.interval
+            else:
+                delay = backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, self.max_backoff)
+                logger.warning(f"Readiness check failed ({failures} in a row), next check in {delay:.0f}s: {reason}")
+
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def trigger(self):
+        """Re-check now, e.g. after credentials change"""
+        self._wake.set()
+
+    def state(self) -> Dict[str, Any]:
+        """Cached readiness; stale results (no check for 3 intervals) count as not ready"""
+        state = dict(self._state)
+        checked_at = state['checked_at']
+        if checked_at is not None:
+            state['age_seconds'] = round(time.time() - checked_at, 1)
+            if state['ready'] and state['age_seconds'] > 3 * self.interval:
+                state['ready'] = False
+                state['reason'] = 'readiness check is stale'
+        return state
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Registration Token
+Caches AVD host pool registration tokens for every worker in the process,
+refreshing them in the background before they expire
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from azure.mgmt.desktopvirtualization.models import HostPoolPatch, RegistrationInfoPatch
+
+from telemetry import record_cache
+
+logger = logging.getLogger(__name__)
+
+# A token is never handed out with less than this left; registration must finish before it expires
+REFRESH_MARGIN = timedelta(minutes=float(os.getenv('AVD_TOKEN_REFRESH_MARGIN_MINUTES', '60')))
+# Within this much of the margin, callers still get the cached token while a new one is fetched
+REFRESH_AHEAD = timedelta(minutes=float(os.getenv('AVD_TOKEN_REFRESH_AHEAD_MINUTES', '60')))
+# Lifetime of tokens this process renews (AVD allows 1 hour to 27 days)
+TOKEN_VALIDITY = timedelta(hours=float(os.getenv('AVD_TOKEN_VALIDITY_HOURS', '24')))
+
+
+class RegistrationToken:
+    def __init__(self, host_pool: str, token: str, expiration_time: datetime):
+        self.host_pool = host_pool
+        self.token = token
+        self.expiration_time = expiration_time
+
+    def remaining(self) -> timedelta:
+        return self.expiration_time - datetime.now(timezone.utc)
+
+
+def _as_token(host_pool: str, registration_info) -> Optional[RegistrationToken]:
+    """RegistrationToken from an SDK RegistrationInfo, or None if the pool has no token"""
+    if registration_info is None or not registration_info.token or not registration_info.expiration_time:
+        return None
+    expiration_time = registration_info.expiration_time
+    if expiration_time.tzinfo is None:
+        expiration_time = expiration_time.replace(tzinfo=timezone.utc)
+    return RegistrationToken(host_pool, registration_info.token, expiration_time)
+
+
+class RegistrationTokenManager:
+    """
+    Host pool registration tokens shared across threads
+
+    get() returns the cached token while it has more than refresh_margin left.
+    Once it is within refresh_ahead of that, the next get() starts one
+    background refresh and keeps returning the cached token meanwhile, so
+    workers in a long rollout never wait on ARM or receive a token that expires
+    mid-registration. Concurrent misses for the same pool share one fetch.
+
+    A fetch reads the pool's current token and only renews it (a host pool
+    PATCH) when there is none or it is itself about to expire, so tokens are
+    reused across processes too rather than rotated on every run.
+    """
+
+    def __init__(self, avd_client, refresh_margin: timedelta = REFRESH_MARGIN,
+                 refresh_ahead: timedelta = REFRESH_AHEAD, validity: timedelta = TOKEN_VALIDITY):
+        if validity <= refresh_margin + refresh_ahead:
+            raise ValueError("Token validity must be longer than the refresh margin plus refresh-ahead window")
+        self.avd_client = avd_client
+        self.refresh_margin = refresh_margin
+        self.refresh_ahead = refresh_ahead
+        self.validity = validity
+        self._tokens: Dict[Tuple[str, str], RegistrationToken] = {}
+        self._fetch_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.renewals = 0
+
+    def get(self, resource_group: str, host_pool: str) -> RegistrationToken:
+        key = (resource_group.lower(), host_pool.lower())
+        token = self._tokens.get(key)
+        if token is not None and token.remaining() > self.refresh_margin:
+            record_cache('registration_token', True)
+            if token.remaining() <= self.refresh_margin + self.refresh_ahead:
+                self._refresh_in_background(key, resource_group, host_pool)
+            return token
+
+        record_cache('registration_token', False)
+        with self._fetch_lock(key):
+            # Another worker may have fetched it while this one waited
+            token = self._tokens.get(key)
+            if token is not None and token.remaining() > self.refresh_margin:
+                return token
+            return self._fetch(key, resource_group, host_pool)
+
+    def invalidate(self, resource_group: str, host_pool: str):
+        """Forget a token, e.g. after the pool's token was revoked"""
+        self._tokens.pop((resource_group.lower(), host_pool.lower()), None)
+
+    def _fetch_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, key, resource_group: str, host_pool: str) -> RegistrationToken:
+        self.fetches += 1
+        token = _as_token(host_pool, self.avd_client.host_pools.retrieve_registration_token(resource_group, host_pool))
+        if token is None or token.remaining() <= self.refresh_margin + self.refresh_ahead:
+            token = self._renew(resource_group, host_pool)
+        self._tokens[key] = token
+        return token
+
+    def _renew(self, resource_group: str, host_pool: str) -> RegistrationToken:
+        self.renewals += 1
+        logger.info(f"Renewing registration token for host pool {host_pool}")
+        patch = HostPoolPatch(registration_info=RegistrationInfoPatch(
+            expiration_time=datetime.now(timezone.utc) + self.validity,
+            registration_token_operation='Update'
+        ))
+        pool = self.avd_client.host_pools.update(resource_group, host_pool, patch)
+        token = _as_token(host_pool, pool.registration_info)
+        if token is None:
+            raise RuntimeError(f"Host pool {host_pool} returned no registration token after renewal")
+        return token
+
+    def _refresh_in_background(self, key, resource_group: str, host_pool: str):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._fetch_lock(key):
+                    self._fetch(key, resource_group, host_pool)
+            except Exception as e:
+                # The cached token is still valid; the next get() past the margin fetches synchronously
+                logger.warning(f"Background refresh of the {host_pool} registration token failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True, name=f"token-refresh-{host_pool}").start()
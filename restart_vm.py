@@ -1,48 +1,63 @@
 #!/usr/bin/env python3
 """
 Restart VM for AVD Registration
+
+Restarts the VMs together and waits until each one's guest agent reports Ready,
+rather than for a fixed time.
 """
 
-from azure.mgmt.compute import ComputeManagementClient
-from azure.identity import ClientSecretCredential
 import os
-from dotenv import load_dotenv
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from dotenv import load_dotenv
+
+from azure_manager import AzureManager, vm_ready
 
 # Load environment variables
 load_dotenv()
 
-def restart_vm():
+def restart_vm(resource_group='avd-rg', vm_names=('avd-host-01',), timeout=600):
     print("🔄 Restarting VM for AVD Registration...")
     
-    credential = ClientSecretCredential(
-        tenant_id=os.getenv('AZURE_TENANT_ID'),
-        client_id=os.getenv('AZURE_CLIENT_ID'),
-        client_secret=os.getenv('AZURE_CLIENT_SECRET')
-    )
-    
-    compute_client = ComputeManagementClient(credential, os.getenv('AZURE_SUBSCRIPTION_ID'))
+    manager = AzureManager(os.getenv('AZURE_SUBSCRIPTION_ID'))
+    if not manager.authenticate('service_principal'):
+        return False
+    compute_client = manager.get_client("compute")
     
     try:
-        # Restart the VM
-        print("   Restarting avd-host-01...")
-        poller = compute_client.virtual_machines.begin_restart('avd-rg', 'avd-host-01')
+        # Restart the VMs
+        print(f"   Restarting {', '.join(vm_names)}...")
+        start = time.monotonic()
+        pollers = [compute_client.virtual_machines.begin_restart(resource_group, vm_name) for vm_name in vm_names]
         
         print("   VM restarting... (this may take 2-3 minutes)")
-        result = poller.result()
+        # Before the restart completes the VM still reports running and Ready from before it went down
+        with ThreadPoolExecutor(max_workers=len(pollers)) as executor:
+            list(executor.map(lambda poller: poller.result(), pollers))
         
-        print("✅ VM restart completed!")
+        print(f"✅ VM restart completed! ({time.monotonic() - start:.1f}s)")
         
-        # Wait a bit for the VM to fully boot
+        # Wait for the VMs to fully boot
         print("   Waiting for VM to fully boot...")
-        time.sleep(30)
+        def report(key, state):
+            print(f"   {key[1]}: {state['power_state']}, agent {state['agent_status'] or 'not reporting'}")
+        states = manager.wait_for_state([(resource_group, vm_name) for vm_name in vm_names], vm_ready,
+                                        timeout=timeout, on_change=report)
+        
+        not_ready = [key[1] for key, state in states.items() if not state['ready']]
+        if not_ready:
+            print(f"⚠️  Not ready after {timeout}s: {', '.join(not_ready)}")
+            return False
         
         # Check VM status
-        vm = compute_client.virtual_machines.get('avd-rg', 'avd-host-01')
-        print(f"   VM Status: {vm.provisioning_state}")
+        for (_, vm_name), state in states.items():
+            print(f"   {vm_name} Status: {state['provisioning_state']}, agent {state['agent_status']} after {state['seconds']}s")
         
         print(f"\n🎉 AVD Setup Complete!")
-        print(f"   VM: avd-host-01 has been restarted")
+        print(f"   VM: {', '.join(vm_names)} has been restarted")
         print(f"   AVD Agent and Boot Loader are installed")
         print(f"   Registration should complete automatically")
         
@@ -55,9 +70,20 @@ def restart_vm():
         print(f"   Public IP: 172.190.184.16")
         print(f"   Username: {os.getenv('AVD_ADMIN_USERNAME', 'avdadmin')}")
         print(f"   Password: [HIDDEN - Set via AVD_ADMIN_PASSWORD env var]")
+        return True
         
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
+
+@click.command()
+@click.option('--resource-group', default='avd-rg', help='Resource group (default: avd-rg)')
+@click.option('--vm', 'vms', multiple=True, help='VM to restart, repeatable (default: avd-host-01)')
+@click.option('--timeout', default=600, help='Seconds to wait for the VMs to boot (default: 600)')
+def main(resource_group, vms, timeout):
+    """Restart session hosts and wait until they are ready"""
+    if not restart_vm(resource_group, vms or ('avd-host-01',), timeout):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    restart_vm()
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Run Command
+Runs a script on a set of VMs through the VM run command API, many at once, with
+per-VM timeouts and a JSON report that lets a re-run retry only the VMs that failed
+"""
+
+import os
+import json
+import time
+import fnmatch
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import click
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+# Run commands mostly wait on the VM, so a whole host pool can run at once
+DEFAULT_PARALLELISM = 50
+DEFAULT_TIMEOUT = 900
+# Session hosts as named by deploy_vms_sdk.py
+DEFAULT_MATCH = 'avd-host-*'
+
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+
+
+def select_vms(compute_client, resource_group: str, names: Iterable[str] = (), match: Optional[str] = None,
+               tags: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    VM names in resource_group chosen by explicit names, a name glob and/or tags
+
+    With no names and no match, VMs matching DEFAULT_MATCH are chosen. Explicit
+    names alone are returned as given, without listing the resource group.
+    """
+    names = [*names]
+    if names and not match and not tags:
+        return names
+    if not names and not match:
+        match = DEFAULT_MATCH
+    selected = []
+    for vm in compute_client.virtual_machines.list(resource_group):
+        if names and vm.name not in names:
+            continue
+        if match and not fnmatch.fnmatch(vm.name.lower(), match.lower()):
+            continue
+        if tags and any((vm.tags or {}).get(key) != value for key, value in tags.items()):
+            continue
+        selected.append(vm.name)
+    return sorted(selected)
+
+
+def parse_output(result) -> Tuple[str, str]:
+    """(stdout, stderr) from a RunCommandResult, for Windows and Linux command IDs"""
+    stdout, stderr = [], []
+    for status in (result.value or []) if result is not None else []:
+        code = (status.code or '').lower()
+        message = status.message or ''
+        if '/stderr/' in code:
+            stderr.append(message)
+        elif '/stdout/' in code:
+            stdout.append(message)
+        elif '[stdout]' in message:
+            # RunShellScript returns one message with both streams
+            out, _, err = message.partition('[stderr]')
+            stdout.append(out.replace('[stdout]', '', 1))
+            stderr.append(err)
+        else:
+            stdout.append(message)
+    return '\n'.join(stdout).strip(), '\n'.join(stderr).strip()
+
+
+class RunCommandEngine:
+    """
+    Runs one script on many VMs, up to parallelism at a time
+
+    Each VM gets timeout seconds; a VM that takes longer is reported as timed
+    out (Azure can't cancel a run command, so it may still finish on the VM).
+    A VM whose script writes to stderr counts as failed unless fail_on_stderr
+    is off. parameters(vm_name) supplies per-VM script parameters; they are
+    passed to the VM but never written to the report.
+
+    Results are saved to report_file as each VM finishes. A later run of the
+    same script against the same resource group skips VMs that already
+    succeeded, so re-running retries only the failures. Once every selected
+    VM has succeeded their results are dropped (and an empty report deleted),
+    so the next run starts afresh.
+    """
+
+    def __init__(self, compute_client, resource_group: str, script: str, name: str,
+                 command_id: str = 'RunPowerShellScript',
+                 parameters: Optional[Callable[[str], Dict[str, str]]] = None,
+                 parallelism: int = DEFAULT_PARALLELISM, timeout: float = DEFAULT_TIMEOUT,
+                 report_file: Optional[str] = None, fail_on_stderr: bool = True):
+        self.compute_client = compute_client
+        self.resource_group = resource_group
+        self.script = script
+        self.name = name
+        self.command_id = command_id
+        self.parameters = parameters
+        self.parallelism = max(1, parallelism)
+        self.timeout = timeout
+        self.report_file = report_file if report_file is not None else report_path(name, resource_group)
+        self.fail_on_stderr = fail_on_stderr
+        self.fingerprint = {
+            'resource_group': resource_group.lower(),
+            'command_id': command_id,
+            'script_sha256': hashlib.sha256(script.encode()).hexdigest()
+        }
+        self.results: Dict[str, Dict[str, Any]] = {}
+        # VMs the current run() is running the script on
+        self.pending: List[str] = []
+        self._lock = threading.Lock()
+
+    # Report
+
+    def load_report(self) -> Dict[str, Dict[str, Any]]:
+        """Results from a previous run of the same script, or {} if there is none"""
+        if not self.report_file or not os.path.exists(self.report_file):
+            return {}
+        try:
+            with open(self.report_file) as f:
+                report = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable run command report {self.report_file}: {e}")
+            return {}
+        if report.get('version') != REPORT_VERSION or report.get('fingerprint') != self.fingerprint:
+            logger.warning(f"Run command report {self.report_file} is for a different script; running every VM")
+            return {}
+        return report.get('results', {})
+
+    def _save_report(self):
+        if not self.report_file:
+            return
+        report = {'version': REPORT_VERSION, 'name': self.name, 'fingerprint': self.fingerprint,
+                  'results': self.results}
+        directory = os.path.dirname(os.path.abspath(self.report_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.run-command.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(report, f, indent=2)
+            os.replace(tmp_path, self.report_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear_report(self, vm_names: Iterable[str]):
+        """Forget vm_names' results, deleting the report once no results are left"""
+        with self._lock:
+            for vm_name in vm_names:
+                self.results.pop(vm_name, None)
+            if self.results:
+                self._save_report()
+            elif self.report_file and os.path.exists(self.report_file):
+                os.remove(self.report_file)
+
+    # Execution
+
+    def _run_one(self, vm_name: str) -> Dict[str, Any]:
+        result = {'status': FAILED, 'stdout': '', 'stderr': '', 'error': None, 'seconds': None}
+        start = time.perf_counter()
+        try:
+            parameters = self.parameters(vm_name) if self.parameters else {}
+            poller = self.compute_client.virtual_machines.begin_run_command(self.resource_group, vm_name, {
+                'command_id': self.command_id,
+                'script': [self.script],
+                'parameters': [{'name': k, 'value': v} for k, v in parameters.items()]
+            })
+            poller.wait(self.timeout)
+            if not poller.done():
+                result.update(status=TIMED_OUT, error=f"No result after {self.timeout:.0f}s; the script may still be running")
+            else:
+                stdout, stderr = parse_output(poller.result())
+                result.update(stdout=stdout, stderr=stderr)
+                if stderr and self.fail_on_stderr:
+                    result['error'] = stderr.splitlines()[0]
+                else:
+                    result['status'] = SUCCEEDED
+        except Exception as e:
+            # SDK errors repeat the code and message on extra lines; the first line has both
+            result['error'] = str(e).splitlines()[0] if str(e) else repr(e)
+        result['seconds'] = round(time.perf_counter() - start, 2)
+        result['finished_at'] = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self.results[vm_name] = result
+            self._save_report()
+        return result
+
+    def run(self, vm_names: Iterable[str], resume: bool = True,
+            on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run the script on every VM in vm_names not already succeeded in the report
+
+        Returns:
+            VM name -> status, stdout, stderr, error, seconds and finished_at
+            ('skipped': True for VMs that succeeded on an earlier run)
+        """
+        vm_names = [*dict.fromkeys(vm_names)]
+        previous = self.load_report() if resume else {}
+        # Earlier results for VMs outside this selection stay in the report
+        self.results = dict(previous)
+        pending = [vm for vm in vm_names if previous.get(vm, {}).get('status') != SUCCEEDED]
+        self.pending = pending
+        results = {vm: dict(previous[vm], skipped=True) for vm in vm_names if vm not in pending}
+
+        def run(vm_name):
+            result = self._run_one(vm_name)
+            if on_result is not None:
+                on_result(vm_name, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.parallelism, len(pending) or 1),
+                                thread_name_prefix='run-command') as executor:
+            for vm_name, result in zip(pending, executor.map(run, pending)):
+                results[vm_name] = result
+        if all(results[vm]['status'] == SUCCEEDED for vm in vm_names):
+            # Nothing to resume; a later run (e.g. the next password rotation) runs on every VM again
+            self.clear_report(vm_names)
+        return {vm: results[vm] for vm in vm_names}
+
+
+def report_path(name: str, resource_group: str) -> str:
+    return f".run-command-{name}-{resource_group}.json"
+
+
+def print_summary(results: Dict[str, Dict[str, Any]], elapsed: float):
+    ran = {vm: r for vm, r in results.items() if not r.get('skipped')}
+    failed = {vm: r for vm, r in ran.items() if r['status'] != SUCCEEDED}
+    skipped = len(results) - len(ran)
+    note = f" ({skipped} already done)" if skipped else ""
+    if failed:
+        print(f"⚠️  {len(ran) - len(failed)}/{len(ran)} VMs succeeded in {elapsed:.1f}s{note}; failed:")
+        for vm, result in failed.items():
+            print(f"   - {vm} ({result['status']}): {result['error']}")
+        print("   Run the same command again to retry only these VMs")
+    else:
+        print(f"🎉 Script succeeded on all {len(ran)} VMs in {elapsed:.1f}s{note}")
+
+
+def run_on_fleet(engine: RunCommandEngine, vm_names: List[str], resume: bool = True) -> Dict[str, Dict[str, Any]]:
+    """Run engine on vm_names, printing each VM as it finishes and a summary"""
+    print_lock = threading.Lock()
+    done = [0]
+
+    def report(vm_name, result):
+        # VMs report from worker threads; keep each line whole
+        with print_lock:
+            done[0] += 1
+            total = len(engine.pending)
+            icon = '✅' if result['status'] == SUCCEEDED else '❌'
+            detail = f"({result['seconds']}s)" if result['status'] == SUCCEEDED else result['error']
+            print(f"[{done[0]:>{len(str(total))}}/{total}] {vm_name}: {icon} {result['status']} {detail}", flush=True)
+
+    start = time.perf_counter()
+    results = engine.run(vm_names, resume=resume, on_result=report)
+    print_summary(results, time.perf_counter() - start)
+    if engine.report_file and os.path.exists(engine.report_file):
+        print(f"📝 Report: {engine.report_file}")
+    return results
+
+
+def fleet_options(default_timeout: int = DEFAULT_TIMEOUT):
+    """Click options shared by scripts that run a command across session hosts"""
+    def decorator(command):
+        options = [
+            click.option('--resource-group', default='avd-rg', help='Resource group of the VMs (default: avd-rg)'),
+            click.option('--vm', 'vms', multiple=True, help='VM name (repeatable); default: every VM matching --match'),
+            click.option('--match', default=None, help=f'VM name glob (default: {DEFAULT_MATCH} when no --vm is given)'),
+            click.option('--tag', 'tags', multiple=True, help='Only VMs with this tag, as key=value (repeatable)'),
+            click.option('--parallelism', default=DEFAULT_PARALLELISM,
+                         help=f'VMs running the script at once (default: {DEFAULT_PARALLELISM})'),
+            click.option('--timeout', default=default_timeout, help=f'Seconds to wait per VM (default: {default_timeout})'),
+            click.option('--restart', is_flag=True, help='Ignore the previous report and run on every selected VM')
+        ]
+        for option in reversed(options):
+            command = option(command)
+        return command
+    return decorator
+
+
+def parse_tags(tags: Iterable[str]) -> Dict[str, str]:
+    parsed = {}
+    for tag in tags:
+        key, sep, value = tag.partition('=')
+        if not sep:
+            raise click.BadParameter(f"expected key=value, got {tag!r}", param_hint='--tag')
+        parsed[key] = value
+    return parsed
@@ -194,6 +194,33 @@ class AzureDashboard {
         
         // Load saved theme
         this.loadSavedTheme();
+        
+        // Utilisation is fetched separately so it never delays the inventory view
+        this.loadVMMetrics();
+    }
+
+    async loadVMMetrics() {
+        if (!this.resources.virtual_machines?.length) {
+            return;
+        }
+        
+        try {
+            const response = await fetch(`${this.apiBase}/metrics/vms`);
+            const data = await response.json();
+            
+            if (!response.ok) {
+                throw new Error(data.error || 'Failed to load VM metrics');
+            }
+            
+            document.querySelectorAll('.vm-cpu').forEach(el => {
+                const cpu = data.metrics[el.dataset.vmId]?.['Percentage CPU'];
+                if (cpu && cpu.p95 !== null) {
+                    el.textContent = `${cpu.p95.toFixed(1)}% (max ${cpu.max.toFixed(1)}%)`;
+                }
+            });
+        } catch (error) {
+            console.error('VM metrics load failed:', error);
+        }
     }
 
     updateStats(data) {
@@ -202,12 +229,37 @@ class AzureDashboard {
         document.getElementById('webapp-count').textContent = data.web_apps?.length || 0;
         document.getElementById('rg-count').textContent = data.resource_groups?.length || 0;
         
-        // Add estimated cost (placeholder)
+        // Show the price sheet estimate until billed cost arrives from the cost store
         const estimatedCost = this.calculateEstimatedCost(data);
         document.getElementById('cost-display').textContent = `$${estimatedCost}/month`;
+        this.loadCostSummary();
+    }
+
+    async loadCostSummary() {
+        try {
+            const response = await fetch(`${this.apiBase}/costs/summary`);
+            const data = await response.json();
+            
+            if (!response.ok) {
+                throw new Error(data.error || 'Failed to load cost summary');
+            }
+            
+            if (data.last_refresh) {
+                const format = value => value.toLocaleString(undefined, { style: 'currency', currency: data.currency });
+                document.getElementById('cost-display').textContent =
+                    `${format(data.month_to_date)} MTD / ${format(data.forecast_month_end)} forecast`;
+            }
+        } catch (error) {
+            console.error('Cost summary load failed:', error);
+        }
     }
 
     calculateEstimatedCost(data) {
+        // Prefer the server-side price sheet estimate
+        if (data.estimated_cost) {
+            return Math.round(data.estimated_cost.total).toLocaleString();
+        }
+        
         // Simple cost estimation (placeholder)
         let cost = 0;
         cost += (data.virtual_machines?.length || 0) * 50; // $50 per VM
@@ -252,6 +304,7 @@ class AzureDashboard {
                 <p><strong>Size:</strong> ${vm.vm_size}</p>
                 <p><strong>OS:</strong> ${vm.os_type}</p>
                 <p><strong>Status:</strong> <span class="status ${vm.power_state.toLowerCase()}">${vm.power_state}</span></p>
+                <p><strong>CPU (p95):</strong> <span class="vm-cpu" data-vm-id="${vm.id}">-</span></p>
                 <div class="resource-actions">
                     <button onclick="dashboard.startVM('${vm.name}', '${vm.resource_group}')" class="btn-success" ${vm.power_state === 'running' ? 'disabled' : ''}>Start</button>
                     <button onclick="dashboard.stopVM('${vm.name}', '${vm.resource_group}')" class="btn-warning" ${vm.power_state === 'stopped' ? 'disabled' : ''}>Stop</button>
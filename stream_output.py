@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Streaming Output
+Row-at-a-time jsonl/csv/tsv writers for CLI listings, with field projection
+"""
+
+import os
+import sys
+import csv
+import json
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+STREAM_FORMATS = ['jsonl', 'csv', 'tsv']
+
+# Default columns per listing, in display order
+DEFAULT_FIELDS = {
+    'vms': ['name', 'resource_group', 'location', 'vm_size', 'os_type', 'power_state', 'tags', 'id'],
+    'storage': ['name', 'resource_group', 'location', 'sku', 'kind', 'status', 'tags'],
+    'webapps': ['name', 'resource_group', 'location', 'state', 'default_host_name', 'host_names', 'tags'],
+    'resourcegroups': ['name', 'location', 'properties.provisioning_state', 'tags']
+}
+
+
+def parse_fields(fields: Optional[str], kind: str) -> List[str]:
+    if not fields:
+        return DEFAULT_FIELDS[kind]
+    return [f.strip() for f in fields.split(',') if f.strip()]
+
+
+def project(row: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Pick fields from row; dotted names reach into nested dicts (e.g. properties.provisioning_state)"""
+    projected = {}
+    for field in fields:
+        value = row
+        for part in field.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        projected[field] = value
+    return projected
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'), sort_keys=True)
+    return str(value)
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], fmt: str, fields: List[str], out: TextIO = None) -> int:
+    """
+    Write rows as they arrive, flushing after each one so pipes see output immediately
+
+    Returns:
+        number of rows written
+    """
+    out = out or sys.stdout
+    count = 0
+
+    if fmt == 'jsonl':
+        for row in rows:
+            out.write(json.dumps(project(row, fields), default=str) + '\n')
+            out.flush()
+            count += 1
+        return count
+
+    if fmt not in ('csv', 'tsv'):
+        raise ValueError(f"Unknown format: {fmt}")
+    writer = csv.writer(out, delimiter=',' if fmt == 'csv' else '\t', lineterminator='\n')
+    writer.writerow(fields)
+    for row in rows:
+        projected = project(row, fields)
+        writer.writerow([_cell(projected[field]) for field in fields])
+        out.flush()
+        count += 1
+    return count
+
+
+def stream_to_stdout(rows: Iterable[Dict[str, Any]], fmt: str, fields: List[str]) -> int:
+    """write_rows to stdout, exiting quietly if the reader (e.g. head) closes the pipe"""
+    try:
+        return write_rows(rows, fmt, fields)
+    except BrokenPipeError:
+        # Point stdout at devnull so the interpreter's final flush doesn't raise again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(0)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Prometheus Telemetry
+Azure call latency, error/throttle counters, cache ratios and web request latency
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from prometheus_client import (
+    Counter,
+    Histogram,
+    Gauge,
+    CollectorRegistry,
+    REGISTRY,
+    generate_latest,
+    CONTENT_TYPE_LATEST,
+    multiprocess
+)
+
+# ARM calls range from ~50ms reads to multi-second paged listings
+ARM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+ARM_CALL_LATENCY = Histogram(
+    'azure_arm_call_duration_seconds',
+    'Latency of Azure Resource Manager operations',
+    ['operation'],
+    buckets=ARM_LATENCY_BUCKETS
+)
+ARM_CALLS = Counter(
+    'azure_arm_calls_total',
+    'Azure Resource Manager operations by outcome',
+    ['operation', 'outcome']
+)
+ARM_THROTTLED_RESPONSES = Counter(
+    'azure_arm_throttled_responses_total',
+    'HTTP 429 responses received from ARM, including ones retried by the SDK'
+)
+CACHE_REQUESTS = Counter(
+    'azure_cache_requests_total',
+    'Cache lookups by cache and result (hit/miss)',
+    ['cache', 'result']
+)
+SNAPSHOT_AGE = Gauge(
+    'azure_snapshot_age_seconds',
+    'Age of locally stored Azure data',
+    ['source'],
+    multiprocess_mode='livemin'
+)
+HTTP_REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Web request latency by route',
+    ['route', 'method', 'status']
+)
+
+
+@contextmanager
+def arm_call(operation: str):
+    """Time an ARM operation and count its outcome (ok, error or throttled)"""
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except HttpResponseError as e:
+        outcome = 'throttled' if e.status_code == 429 else 'error'
+        raise
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        ARM_CALL_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        ARM_CALLS.labels(operation, outcome).inc()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class ThrottleCountingPolicy(SansIOHTTPPolicy):
+    """Pipeline policy that counts every 429, before the retry policy hides it"""
+
+    def on_response(self, request, response):
+        if response.http_response.status_code == 429:
+            ARM_THROTTLED_RESPONSES.inc()
+
+
+def render_metrics():
+    """
+    Render metrics for a scrape
+
+    Under gunicorn, PROMETHEUS_MULTIPROC_DIR makes every worker write to shared
+    files, and the scrape aggregates all of them.
+
+    Returns:
+        tuple of (body, content type)
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+VM Performance Metrics
+Concurrent Azure Monitor metric collection with NumPy window aggregation
+"""
+
+import time
+import logging
+import warnings
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Any, Tuple
+
+import numpy as np
+
+from telemetry import arm_call, record_cache
+
+# Platform metrics requested for every VM in a single metrics.list call
+DEFAULT_METRICS = [
+    'Percentage CPU',
+    'Network In Total',
+    'Network Out Total',
+    'Disk Read Bytes',
+    'Disk Write Bytes'
+]
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire after a fixed number of seconds"""
+
+    def __init__(self, ttl_seconds: float = 300, name: str = 'ttl'):
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+                self.hits += 1
+                record_cache(self.name, True)
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            record_cache(self.name, False)
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """(key, age in seconds, value) for every unexpired entry; does not count as hits or misses"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, now - stored_at, value) for key, (stored_at, value) in self._entries.items()
+                    if now - stored_at < self.ttl_seconds]
+
+
+def aggregate_windows(series: np.ndarray, points_per_window: int) -> Dict[str, np.ndarray]:
+    """
+    Downsample a (vms x points) matrix into fixed windows
+
+    Missing samples are NaN and ignored. The trailing partial window is kept.
+
+    Returns:
+        dict with 'p50', 'p95' and 'max' arrays shaped (vms x windows)
+    """
+    n_vms, n_points = series.shape
+    n_windows = max(1, -(-n_points // points_per_window))
+    padded = np.full((n_vms, n_windows * points_per_window), np.nan)
+    padded[:, :n_points] = series
+    windows = padded.reshape(n_vms, n_windows, points_per_window)
+
+    # All-NaN windows legitimately produce NaN; silence numpy's warning for them
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        p50, p95 = np.nanpercentile(windows, [50, 95], axis=2)
+        peak = np.nanmax(windows, axis=2)
+
+    return {'p50': p50, 'p95': p95, 'max': peak}
+
+
+class VMMetricsCollector:
+    """Fetches VM platform metrics concurrently and aggregates them per window"""
+
+    def __init__(self, monitor_client, ttl_seconds: float = 300, max_workers: int = 16):
+        self.monitor_client = monitor_client
+        self.cache = TTLCache(ttl_seconds, name='vm_metrics')
+        self.max_workers = max_workers
+        self.arm_calls = 0
+        self.vms_fetched = 0
+        self._stats_lock = threading.Lock()
+
+    def _fetch_vm(self, vm_id: str, timespan: str, interval: str,
+                  metric_names: List[str]) -> Dict[str, List[Tuple[datetime, Optional[float]]]]:
+        """Fetch all requested metrics for one VM in a single ARM call"""
+        with self._stats_lock:
+            self.arm_calls += 1
+
+        with arm_call("metrics.list"):
+            response = self.monitor_client.metrics.list(
+                vm_id,
+                timespan=timespan,
+                interval=interval,
+                metricnames=','.join(metric_names),
+                aggregation='Average'
+            )
+
+        samples = {}
+        for metric in response.value:
+            points = []
+            for series in metric.timeseries or []:
+                for point in series.data or []:
+                    points.append((point.time_stamp, point.average))
+            samples[metric.name.value] = points
+        return samples
+
+    def collect(self, vm_ids: List[str], hours: int = 1, interval_minutes: int = 1,
+                window_minutes: int = 15,
+                metric_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Collect and aggregate metrics for many VMs
+
+        Args:
+            vm_ids: full ARM resource IDs of the virtual machines
+            hours: length of the lookback period
+            interval_minutes: sample granularity requested from Azure Monitor
+            window_minutes: aggregation window for p50/p95/max
+            metric_names: metrics to fetch, defaults to DEFAULT_METRICS
+
+        Returns:
+            dict keyed by VM ID with per-metric window statistics
+        """
+        metric_names = metric_names or DEFAULT_METRICS
+        cache_key = (tuple(sorted(vm_ids)), hours, interval_minutes, window_minutes, tuple(metric_names))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        start = end - timedelta(hours=hours)
+        timespan = f"{start.isoformat()}/{end.isoformat()}"
+        interval = f"PT{interval_minutes}M"
+        n_points = hours * 60 // interval_minutes
+        points_per_window = max(1, window_minutes // interval_minutes)
+
+        raw = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                vm_id: executor.submit(self._fetch_vm, vm_id, timespan, interval, metric_names)
+                for vm_id in vm_ids
+            }
+            for vm_id, future in futures.items():
+                try:
+                    raw[vm_id] = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to fetch metrics for {vm_id}: {e}")
+                    raw[vm_id] = {}
+
+        with self._stats_lock:
+            self.vms_fetched += len(vm_ids)
+
+        window_starts = [
+            (start + timedelta(minutes=i * points_per_window * interval_minutes)).isoformat()
+            for i in range(max(1, -(-n_points // points_per_window)))
+        ]
+        results = {vm_id: {'windows': window_starts, 'metrics': {}} for vm_id in vm_ids}
+
+        # One matrix per metric so each aggregation is a single vectorised pass over every VM
+        for name in metric_names:
+            series = np.full((len(vm_ids), n_points), np.nan)
+            for row, vm_id in enumerate(vm_ids):
+                for stamp, value in raw[vm_id].get(name, []):
+                    if value is None or stamp is None:
+                        continue
+                    col = int((stamp - start).total_seconds() // (interval_minutes * 60))
+                    if 0 <= col < n_points:
+                        series[row, col] = value
+
+            stats = aggregate_windows(series, points_per_window)
+            for row, vm_id in enumerate(vm_ids):
+                results[vm_id]['metrics'][name] = {
+                    key: [None if np.isnan(v) else round(float(v), 2) for v in stats[key][row]]
+                    for key in ('p50', 'p95', 'max')
+                }
+
+        self.cache.set(cache_key, results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Collector counters, including ARM calls spent per 1,000 VMs"""
+        with self._stats_lock:
+            per_1000 = (self.arm_calls / self.vms_fetched * 1000) if self.vms_fetched else 0
+            return {
+                'arm_calls': self.arm_calls,
+                'vms_fetched': self.vms_fetched,
+                'arm_calls_per_1000_vms': round(per_1000, 1),
+                'cache_hits': self.cache.hits,
+                'cache_misses': self.cache.misses
+            }
+
+
+def latest_summary(results: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Reduce collected results to the most recent populated window per VM and metric"""
+    summary = {}
+    for vm_id, data in results.items():
+        vm_summary = {}
+        for name, stats in data['metrics'].items():
+            latest = None
+            for i in range(len(stats['p95']) - 1, -1, -1):
+                if stats['p95'][i] is not None:
+                    latest = {key: stats[key][i] for key in ('p50', 'p95', 'max')}
+                    break
+            vm_summary[name] = latest
+        summary[vm_id] = vm_summary
+    return summary